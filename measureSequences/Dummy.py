@@ -55,10 +55,17 @@ class Dummy_Functions:
         print(f"message_to_user :: message = {message}")
 
 
-class Dummy(Sequence_runner, Dummy_Functions):
+class Dummy(Dummy_Functions, Sequence_runner):
     """docstring for Dummy"""
 
     def __init__(self, filename="", **kwargs):
+        # the random readings never settle, give up after 10 s
+        kwargs.setdefault(
+            "settle_criteria",
+            dict(
+                Temp=dict(timeout=10), Field=dict(timeout=10), Position=dict(timeout=10)
+            ),
+        )
         if filename:
 
             parser = Sequence_parser(sequence_file=filename)
@@ -5,6 +5,7 @@ Classes:
     Window_ChangeDataFile
     Window_waiting
     Window_Tscan
+    SequenceReader: parses a sequence file in a worker thread
     Sequence_builder: sequence editor class
         currently it just displays the parsed sequence
         could be enhanced to enable writing sequences
@@ -17,21 +18,29 @@ from PyQt5 import QtWidgets
 from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtCore import pyqtSlot
 from PyQt5.QtCore import QTimer
-from PyQt5.uic import loadUi
+from PyQt5.QtCore import QThread
+from PyQt5.QtCore import QFileSystemWatcher
 
 from copy import deepcopy
 import sys
+import time
 import threading
 from os import path
 
 from .util import Window_ui
 from .util import ExceptionHandling
+from .util import handle_exception
+from .uicache import ui_file
+from .uicache import load_ui
 from .Sequence_parsing import Sequence_parser
 
-from .qlistmodel import SequenceListModel
 from .qlistmodel import ScanListModel
+from .qtreemodel import SequenceTreeModel
+from .frozen import freeze
+from .frozen import FrozenSequence
+from .qlive import LiveRelay
+from .live import describe_position
 
-import pkg_resources
 import logging
 
 logger = logging.getLogger("measureSequences.Sequence_builder")
@@ -46,13 +55,11 @@ class Window_ChangeDataFile(QtWidgets.QDialog):
 
     def __init__(
         self,
-        ui_file=pkg_resources.resource_filename(
-            __name__, ".\\configurations\\Sequence_change_datafile.ui"
-        ),
+        ui_file=ui_file("Sequence_change_datafile.ui"),
     ):
         """build ui, build dict, connect to signals"""
         super().__init__()
-        loadUi(ui_file, self)
+        load_ui(ui_file, self)
 
         self.conf = dict(
             typ="change datafile", new_file_data="", mode="", DisplayText=""
@@ -99,13 +106,11 @@ class Window_waiting(QtWidgets.QDialog):
 
     def __init__(
         self,
-        ui_file=pkg_resources.resource_filename(
-            __name__, ".\\configurations\\sequence_waiting.ui"
-        ),
+        ui_file=ui_file("sequence_waiting.ui"),
     ):
         """build ui, build dict, connect to signals"""
         super().__init__()
-        loadUi(ui_file, self)
+        load_ui(ui_file, self)
 
         self.conf = dict(typ="Wait", Temp=False, Field=False, Delay=0)
         self.check_Temp.toggled.connect(lambda value: self.setValue("Temp", value))
@@ -139,15 +144,9 @@ class Window_Tscan(QtWidgets.QDialog):
     sig_reject = pyqtSignal()
     sig_updateScanListModel = pyqtSignal(dict)
 
-    def __init__(
-        self,
-        ui_file=pkg_resources.resource_filename(
-            __name__, "configurations\\sequence_scan_temperature.ui"
-        ),
-        **kwargs
-    ):
+    def __init__(self, ui_file=ui_file("Sequence_scan_temperature.ui"), **kwargs):
         super().__init__(**kwargs)
-        loadUi(ui_file, self)
+        load_ui(ui_file, self)
 
         QTimer.singleShot(0, self.initialisations)
         self.dictlock = threading.Lock()
@@ -164,11 +163,21 @@ class Window_Tscan(QtWidgets.QDialog):
         self.putin_Size = False
         self.model = ScanListModel(self, 0, 0, 0, 0)
         self.listTemperatures.setModel(self.model)
+        # only the visible rows are rendered
+        self.listTemperatures.setUniformItemSizes(True)
 
         self._LCD_stepsize = 0
         self._LCD_Nsteps = 0
         self.update_lcds()
 
+        # rapid edits of the spin boxes recompute the scan at most
+        # once per interval, the last edit is always included
+        self._update_pending = [None, None]
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(150)
+        self._update_timer.timeout.connect(self.update_list_pending)
+
         self.buttonOK.clicked.connect(self.acc)
         self.buttonCANCEL.clicked.connect(self.close)
 
@@ -205,6 +214,17 @@ class Window_Tscan(QtWidgets.QDialog):
         self.model.sig_stepsize.connect(lambda value: self.setLCDstepsize(value))
         # self.model.sig_stepsize.connect(self.spinSetSizeSteps.setValue)
 
+    def schedule_update(self, Nsteps=None, SizeSteps=None):
+        """update the list of points soon (throttled)"""
+        if Nsteps or SizeSteps:
+            self._update_pending = [Nsteps, SizeSteps]
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def update_list_pending(self):
+        self.update_list(*self._update_pending)
+        self._update_pending = [None, None]
+
     def update_list(self, Nsteps, SizeSteps):
         if not (self.putin_start and self.putin_end):
             return
@@ -227,32 +247,38 @@ class Window_Tscan(QtWidgets.QDialog):
             self.__scanconf["start"] = Tstart
         self.putin_start = True
         self.conf.update(self.__scanconf)
+        self.schedule_update()
 
     def setTend(self, Tend):
         with self.dictlock:
             self.__scanconf["end"] = Tend
         self.putin_end = True
         self.conf.update(self.__scanconf)
+        self.schedule_update()
 
     def setN(self, N):
         with self.dictlock:
             self.__scanconf["Nsteps"] = N
         # self.putin_N = True
         self.conf.update(self.__scanconf)
+        self.schedule_update(Nsteps=1)
 
     def setSizeSteps(self, stepsize):
         with self.dictlock:
             self.__scanconf["SizeSteps"] = stepsize
         # self.putin_Size = True
         self.conf.update(self.__scanconf)
+        self.schedule_update(SizeSteps=1)
 
     def setLCDstepsize(self, value):
         self._LCD_stepsize = value
         self.__scanconf["SizeSteps"] = value
+        self.update_lcds()
 
     def setLCDNsteps(self, value):
         self._LCD_Nsteps = value
         self.__scanconf["Nsteps"] = value
+        self.update_lcds()
 
     @staticmethod
     def printing(message):
@@ -275,12 +301,8 @@ class Window_Tscan(QtWidgets.QDialog):
             self.conf["SweepRate"] = value
 
     def update_lcds(self):
-        try:
-            self.lcdStepsize.display(self._LCD_stepsize)
-            self.lcdNsteps.display(self._LCD_Nsteps)
-            # self.listTemperatures.repaint()
-        finally:
-            QTimer.singleShot(1e2, self.update_lcds)
+        self.lcdStepsize.display(self._LCD_stepsize)
+        self.lcdNsteps.display(self._LCD_Nsteps)
 
     def acc(self):
         """if not rejected, emit signal with configuration and accept"""
@@ -291,37 +313,107 @@ class Window_Tscan(QtWidgets.QDialog):
         self.accept()
 
 
+class SequenceReader(QThread):
+    """parse a sequence file in a worker thread
+
+    parser: the Sequence_parser whose methods are used (not to be used
+        by anyone else while reading)
+    the top-level commands are frozen, and emitted in batches (at most
+    every interval seconds) together with the progress in percent, the
+    whole sequence once the file is read. Reading stops, without
+    sig_finished, as soon as an interruption is requested.
+    """
+
+    sig_parsed = pyqtSignal(object, int)
+    sig_finished = pyqtSignal(object, object)
+    sig_failed = pyqtSignal(str)
+
+    def __init__(self, parser, sequence_file: str, interval: float = 0.05):
+        super().__init__()
+        self.parser = parser
+        self.sequence_file = sequence_file
+        self.interval = interval
+        self._logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+
+    def run(self):
+        commands, batch = [], []
+        last = time.monotonic()
+        try:
+            for dic, line, lines in self.parser.iter_sequence(self.sequence_file):
+                if self.isInterruptionRequested():
+                    return
+                dic = freeze(dic)
+                commands.append(dic)
+                batch.append(dic)
+                if time.monotonic() - last >= self.interval:
+                    self.sig_parsed.emit(batch, 100 * (line + 1) // lines)
+                    batch = []
+                    last = time.monotonic()
+        except Exception as e:
+            # an exception escaping run() would abort the whole process
+            try:
+                handle_exception(self, self.run, e)
+            except Exception:
+                logger.exception("reading %s failed", self.sequence_file)
+            finally:
+                self.sig_failed.emit(str(e))
+            return
+        self.sig_parsed.emit(batch, 100)
+        self.sig_finished.emit(
+            FrozenSequence(commands), self.parser.build_textsequence(commands)
+        )
+
+
 class Sequence_builder(Window_ui, Sequence_parser):
     """docstring for sequence_builder"""
 
-    sig_runSequence = pyqtSignal(list)
+    # the (frozen) sequence is passed by reference
+    sig_runSequence = pyqtSignal(object)
     sig_abortSequence = pyqtSignal()
     sig_assertion = pyqtSignal(str)
     sig_readSequence = pyqtSignal()
+    sig_readProgress = pyqtSignal(int)
     sig_clearedSequence = pyqtSignal()
 
+    # reading a sequence file in the background, see initialize_sequence
+    _reader = None
+    # watching the sequence file for changes (display_only)
+    watcher = None
+    # showing the execution position of a runner, see follow()
+    _position_relay = None
+
     def __init__(self, display_only=False, **kwargs):
         # self.__name__ = 'Sequence_builder'
         self._logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
         self.display_only = display_only
-        if display_only:
-            ui_file = pkg_resources.resource_filename(
-                __name__, "configurations\\sequence_observer.ui"
-            )
-        else:
-            ui_file = pkg_resources.resource_filename(
-                __name__, "configurations\\sequence.ui"
-            )
-        super().__init__(ui_file=ui_file, **kwargs)
+        super().__init__(
+            ui_file=ui_file("sequence_observer.ui" if display_only else "sequence.ui"),
+            **kwargs,
+        )
 
         # self.listSequence.sig_dropped.connect(lambda value: self.dropreact(value))
 
-        self.model = SequenceListModel()
+        self.model = SequenceTreeModel(self.data)
         self.listSequence.setModel(self.model)
 
-        if not display_only:
-            QTimer.singleShot(0, self.initialize_all_windows)
+        # dialogs are created on first use, see the respective properties
+        self._window_waiting = None
+        self._window_Tscan = None
+        self._Window_ChangeDataFile = None
+
+        self.sig_closing.connect(self.cancel_reading)
+
+        if display_only:
+            # an observed file is parsed again whenever it is changed
+            self.watcher = QFileSystemWatcher(self)
+            self.watcher.fileChanged.connect(self.file_changed)
+            self._update_timer = QTimer(self)
+            self._update_timer.setSingleShot(True)
+            self._update_timer.setInterval(200)
+            self._update_timer.timeout.connect(lambda: self.update_sequence())
+            self.watch_file(self.sequence_file)
 
+        if not display_only:
             self.treeOptions.itemDoubleClicked["QTreeWidgetItem*", "int"].connect(
                 lambda value: self.addItem_toSequence(value)
             )
@@ -345,7 +437,7 @@ class Sequence_builder(Window_ui, Sequence_parser):
     @ExceptionHandling
     @pyqtSlot()
     def running_sequence(self):
-        self.sig_runSequence.emit(deepcopy(self.data))
+        self.sig_runSequence.emit(self.data)
         if not self.display_only:
             self.Button_AbortSequence.setEnabled(True)
 
@@ -421,21 +513,40 @@ class Sequence_builder(Window_ui, Sequence_parser):
 
     @ExceptionHandling
     def initialize_all_windows(self):
+        """create all dialogs right away, instead of on first use"""
         self.initialise_window_waiting()
         self.initialise_window_Tscan()
         self.initialise_window_ChangeDataFile()
 
+    @property
+    def window_waiting(self):
+        if self._window_waiting is None:
+            self.initialise_window_waiting()
+        return self._window_waiting
+
+    @property
+    def window_Tscan(self):
+        if self._window_Tscan is None:
+            self.initialise_window_Tscan()
+        return self._window_Tscan
+
+    @property
+    def Window_ChangeDataFile(self):
+        if self._Window_ChangeDataFile is None:
+            self.initialise_window_ChangeDataFile()
+        return self._Window_ChangeDataFile
+
     def initialise_window_waiting(self):
-        self.window_waiting = Window_waiting()
-        self.window_waiting.sig_accept.connect(lambda value: self.addWaiting(value))
+        self._window_waiting = Window_waiting()
+        self._window_waiting.sig_accept.connect(lambda value: self.addWaiting(value))
 
     def initialise_window_Tscan(self):
-        self.window_Tscan = Window_Tscan()
-        self.window_Tscan.sig_accept.connect(lambda value: self.addTscan(value))
+        self._window_Tscan = Window_Tscan()
+        self._window_Tscan.sig_accept.connect(lambda value: self.addTscan(value))
 
     def initialise_window_ChangeDataFile(self):
-        self.Window_ChangeDataFile = Window_ChangeDataFile()
-        self.Window_ChangeDataFile.sig_accept.connect(
+        self._Window_ChangeDataFile = Window_ChangeDataFile()
+        self._Window_ChangeDataFile.sig_accept.connect(
             lambda value: self.addChangeDataFile(value)
         )
 
@@ -449,6 +560,7 @@ class Sequence_builder(Window_ui, Sequence_parser):
         if not self.display_only:
             self.lineFileLocation_serialised.setText(self.sequence_file_json)
         self.sequence_file_p = self.sequence_file_json[:-4] + "pkl"
+        self.sequence_file_mseq = self.sequence_file_json[:-4] + "mseq"
 
     # @ExceptionHandling
     @pyqtSlot()
@@ -467,13 +579,151 @@ class Sequence_builder(Window_ui, Sequence_parser):
 
     @ExceptionHandling
     def initialize_sequence(self, sequence_file):
-        """build & run the sequence parsing, add items to the display model"""
+        """build & run the sequence parsing, add items to the display model
+
+        a file is parsed in a worker thread (SequenceReader), the model is
+        populated while the top-level commands are parsed. sig_readSequence
+        is emitted once the whole file was read, and self.data is set.
+        Reading a previous file is cancelled.
+        """
         logger.debug("initialising/parsing sequence: {}".format(sequence_file))
-        super().initialize_sequence(sequence_file)
-        for command in self.textsequence:
-            self.model.addItem(command)
+        self.cancel_reading()
+        if self.watcher is not None:
+            self.watch_file(sequence_file)
+        # while the parser is initialised, the model does not exist yet
+        if not sequence_file or not hasattr(self, "model"):
+            super().initialize_sequence(sequence_file)
+            # frozen once, then shared with the model and the runner
+            self.data = freeze(self.data)
+            if hasattr(self, "model"):
+                self.model.set_sequence(self.data)
+            if sequence_file:
+                self.sig_readSequence.emit()
+            return
+        self.change_file_location(sequence_file)
+        self.data = FrozenSequence()
+        self.textsequence = []
+        self.model.set_sequence([])
+        self._reader = reader = SequenceReader(self, sequence_file)
+        reader.sig_parsed.connect(
+            lambda commands, progress: self.sequence_parsed(reader, commands, progress)
+        )
+        reader.sig_finished.connect(
+            lambda data, textsequence: self.sequence_read(reader, data, textsequence)
+        )
+        reader.sig_failed.connect(lambda message: self.sequence_failed(reader))
+        reader.start()
+
+    @ExceptionHandling
+    def update_sequence(self, sequence_file=None):
+        """parse the changed sequence file again, patch the model
+
+        only the changed top-level commands are parsed and replaced (see
+        Sequence_parser.reparse_sequence), the rest of the model, and
+        with it the scroll position, is kept
+        """
+        if self._reader is not None and self._reader.isRunning():
+            # not completely read yet, start over
+            self.initialize_sequence(sequence_file or self.sequence_file)
+            return
+        patch = self.reparse_sequence(sequence_file)
+        self.data = freeze(self.data)
+        if patch is None:
+            return
+        first, removed, commands = patch
+        logger.debug(
+            f"{self.sequence_file}: replaced {removed} by {len(commands)} commands at {first}"
+        )
+        self.model.replace_rows(
+            first, removed, self.data[first : first + len(commands)]
+        )
+        self.sig_readSequence.emit()
+
+    def watch_file(self, sequence_file):
+        """watch (only) sequence_file for changes"""
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
         if sequence_file:
-            self.sig_readSequence.emit()
+            self.watcher.addPath(sequence_file)
+
+    def file_changed(self, sequence_file):
+        """the watched file changed, update after a short delay
+
+        files are often replaced instead of changed in place, which ends
+        their watching, they are watched again if they still exist
+        """
+        if sequence_file not in self.watcher.files() and path.exists(sequence_file):
+            self.watcher.addPath(sequence_file)
+        self._update_timer.start()
+
+    def follow(self, publisher, rate: float = 10):
+        """show the execution position published by a PositionPublisher
+
+        the current command is highlighted, and the progress shown in the
+        window title, updated at most rate times per second
+        """
+        self.unfollow()
+        self._position_relay = LiveRelay(publisher, rate=rate, parent=self)
+        self._position_relay.sig_update.connect(self.show_position)
+        self._position_relay.start()
+
+    def unfollow(self):
+        """stop showing the execution position"""
+        if self._position_relay is None:
+            return
+        self._position_relay.stop()
+        self._position_relay.deleteLater()
+        self._position_relay = None
+        self.model.set_current(None)
+        if self.sequence_file:
+            self.setWindowTitle(path.basename(self.sequence_file))
+
+    def show_position(self, position: dict):
+        """highlight the command being executed, show the progress"""
+        # within chained sequences, the path refers to another file
+        index = self.model.set_current(
+            None if position["chained"] else position["path"]
+        )
+        if index.isValid():
+            self.listSequence.scrollTo(index)
+        self.setWindowTitle(
+            "{} - {}".format(
+                path.basename(self.sequence_file), describe_position(position)
+            )
+        )
+
+    def cancel_reading(self):
+        """stop reading a sequence file in the background"""
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.requestInterruption()
+            reader.wait()
+
+    def sequence_parsed(self, reader, commands, progress):
+        """add freshly parsed top-level commands to the model"""
+        if reader is not self._reader:
+            return
+        self.model.extend(commands)
+        self.setWindowTitle(
+            "{} (reading {} %)".format(path.basename(reader.sequence_file), progress)
+        )
+        self.sig_readProgress.emit(progress)
+
+    def sequence_read(self, reader, data, textsequence):
+        """the whole file was read"""
+        if reader is not self._reader:
+            return
+        self.data = data
+        self.textsequence = textsequence
+        self.setWindowTitle(path.basename(reader.sequence_file))
+        self.sig_readSequence.emit()
+
+    def sequence_failed(self, reader):
+        """the file could not be parsed, show the (empty) data"""
+        if reader is not self._reader:
+            return
+        self.model.set_sequence(self.data)
+        self.setWindowTitle(path.basename(reader.sequence_file))
 
 
 if __name__ == "__main__":
@@ -17,9 +17,13 @@ Author: bklebel (Benjamin Klebel)
 import pickle
 import os
 import re
+import bisect
 import json
 import logging
 
+from . import mseq
+from .frozen import thaw
+
 logger = logging.getLogger("measureSequences.Sequence_parser")
 logger.addHandler(logging.NullHandler())
 
@@ -82,16 +86,24 @@ class Sequence_parser:
         self.initialize_sequence(self.sequence_file)
 
     def saving(self) -> None:
-        """save serialised versions of a sequence"""
+        """save serialised versions of a sequence
+
+        pickle and JSON hold plain lists and dicts (the data is thawed
+        first), so that they can be read without this package. The binary
+        .mseq file (see mseq.py) can be loaded with mseq.load
+        """
+        data = thaw(self.data)
         with open(self.sequence_file_p, "wb") as output:
-            pickle.dump(self.data, output, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, output, pickle.HIGHEST_PROTOCOL)
         with open(self.sequence_file_json, "w") as output:
-            output.write(json.dumps(self.data))
+            output.write(json.dumps(data))
+        mseq.dump(self.data, self.sequence_file_mseq)
 
     def change_file_location(self, fname: str) -> None:
         self.sequence_file = os.path.splitext(fname)[0] + ".seq"
         self.sequence_file_p = os.path.splitext(self.sequence_file)[0] + ".pkl"
         self.sequence_file_json = os.path.splitext(self.sequence_file)[0] + ".json"
+        self.sequence_file_mseq = os.path.splitext(self.sequence_file)[0] + ".mseq"
 
     @staticmethod
     def construct_pattern(expressions: list) -> str:
@@ -104,47 +116,150 @@ class Sequence_parser:
         """parse a complete file of instructions"""
         if sequence_file:
             self.change_file_location(sequence_file)
-
-            exp = [
-                r"TMP TEMP(.*?)$",
-                r"FLD FIELD(.*?)$",
-                r"SCAN(.*?)$",
-                r"WAITFOR(.*?)$",
-                r"CHN(.*?)$",
-                r"CDF(.*?)$",
-                r"DFC(.*?)$",
-                r"LPI(.*?)$",
-                r"SHT(.*?)DOWN",
-                r"EN(.*?)EOS$",
-                r"RES(.*?)$",
-                r"BEP BEEP(.*?)$",
-                r"CMB CHAMBER(.*?)$",
-                r"REM(.*?)$",
-                r"MVP MOVE(.*?)$",
-                r"MES(.*?)$",
-            ]
-            self.p = re.compile(
-                self.construct_pattern(exp), re.DOTALL | re.M
-            )  # '(.*?)[^\S]* EOS'
-
             self.data, self.textsequence = self.read_sequence(sequence_file)
 
         else:
             self.textsequence = []
             self.data = []
             self.sequence_file = ""
+            self.lines = []
+            self.spans = []
+
+    def compile_pattern(self) -> None:
+        """compile the pattern recognising the commands of a sequence file"""
+        exp = [
+            r"TMP TEMP(.*?)$",
+            r"FLD FIELD(.*?)$",
+            r"SCAN(.*?)$",
+            r"WAITFOR(.*?)$",
+            r"CHN(.*?)$",
+            r"CDF(.*?)$",
+            r"DFC(.*?)$",
+            r"LPI(.*?)$",
+            r"SHT(.*?)DOWN",
+            r"EN(.*?)EOS$",
+            r"RES(.*?)$",
+            r"BEP BEEP(.*?)$",
+            r"CMB CHAMBER(.*?)$",
+            r"REM(.*?)$",
+            r"MVP MOVE(.*?)$",
+            r"MES(.*?)$",
+        ]
+        self.p = re.compile(
+            self.construct_pattern(exp), re.DOTALL | re.M
+        )  # '(.*?)[^\S]* EOS'
 
     def read_sequence(self, file: str) -> (list, list):
         """read the whole sequence from a file"""
+        commands = [dic for dic, _, _ in self.iter_sequence(file)]
+        return commands, self.build_textsequence(commands)
+
+    def build_textsequence(self, commands: list) -> list:
+        """build the un-nested list of displayed commands of a sequence"""
+        textsequence = []
+        for dic in commands:
+            if dic.get("typ") != "EOS":
+                textsequence.append(dic)
+                self.add_text(textsequence, dic)
+        return textsequence
+
+    def iter_sequence(self, file: str):
+        """parse a sequence from a file, one top-level command at a time
+
+        the lines of the file, and the index of the first line of every
+        top-level command (self.spans) are kept for reparse_sequence
+        yields: (command, index of its line, number of lines in the file)
+        """
         with open(file, "r") as f:
             data = f.readlines()  # .replace('\n', '')
 
+        self.lines = data
+        self.spans = []
         # preparing variables
+        self.compile_pattern()
         self.jumping_count = [0, 0]
         self.nesting_level = 0
         # parse sequence
-        commands, textsequence = self.parse_nesting(data, -1)
-        return commands, textsequence
+        for dic, line_index in self.iter_nesting(data, -1):
+            self.spans.append(line_index)
+            yield dic, line_index, len(data)
+
+    def reparse_sequence(self, file: str = None):
+        """parse a sequence file again after it changed, as far as necessary
+
+        the new lines are compared to the previous ones, parsing starts at
+        the top-level command before the first changed line, and stops as
+        soon as it reaches the start of a command after the last changed
+        line (where the old and new file end alike), from where on the
+        previous commands are kept.
+        returns: (first, removed, commands), meaning that the top-level
+            commands data[first:first + removed] were replaced by commands,
+            or None if no command changed
+        """
+        file = file or self.sequence_file
+        with open(file, "r") as f:
+            lines = f.readlines()
+
+        # the lines between the common beginning and end changed
+        common = min(len(self.lines), len(lines))
+        first_changed = next(
+            (ct for ct in range(common) if self.lines[ct] != lines[ct]), common
+        )
+        if first_changed == len(self.lines) == len(lines):
+            return None
+        tail = 0
+        while (
+            tail < common - first_changed and self.lines[-1 - tail] == lines[-1 - tail]
+        ):
+            tail += 1
+        last_changed_new = len(lines) - tail
+        shift = len(lines) - len(self.lines)
+
+        # the command before the first changed line could extend into it
+        first = max(bisect.bisect_right(self.spans, first_changed - 1) - 1, 0)
+        start = min(self.spans[first], first_changed) if self.spans else 0
+        old_starts = {line: ct for ct, line in enumerate(self.spans)}
+
+        self.compile_pattern()
+        self.jumping_count = [0, 0]
+        self.nesting_level = 0
+        resume = len(self.spans)
+        commands, spans = [], []
+        for dic, line_index in self.iter_nesting(lines, start - 1):
+            if line_index >= last_changed_new and line_index - shift in old_starts:
+                # back in step with the previous version
+                resume = old_starts[line_index - shift]
+                break
+            commands.append(dic)
+            spans.append(line_index)
+
+        # commands which did not change are kept
+        old = self.data[first:resume]
+        head = 0
+        while head < min(len(old), len(commands)) and old[head] == commands[head]:
+            head += 1
+        tail = 0
+        while (
+            tail < min(len(old), len(commands)) - head
+            and old[-1 - tail] == commands[-1 - tail]
+        ):
+            tail += 1
+        removed = len(old) - head - tail
+        inserted = commands[head : len(commands) - tail]
+
+        self.lines = lines
+        self.spans = (
+            self.spans[:first] + spans + [line + shift for line in self.spans[resume:]]
+        )
+        self.data = (
+            list(self.data[: first + head])
+            + inserted
+            + list(self.data[first + head + removed :])
+        )
+        self.textsequence = self.build_textsequence(self.data)
+        if not removed and not inserted:
+            return None
+        return first + head, removed, inserted
 
     def parse_nesting(self, lines_file: int, lines_index: int) -> (list, list):
         """parse a nested command structure"""
@@ -153,6 +268,15 @@ class Sequence_parser:
             textsequence = []
         else:
             textsequence = None
+        for dic_loop, _ in self.iter_nesting(lines_file, lines_index):
+            commands.append(dic_loop)
+            if lines_index == -1 and dic_loop.get("typ") != "EOS":
+                textsequence.append(dic_loop)
+                self.add_text(textsequence, dic_loop)
+        return commands, textsequence
+
+    def iter_nesting(self, lines_file: int, lines_index: int):
+        """parse a nested command structure, yield (command, line index)"""
         for ct, line_further in enumerate(lines_file[lines_index + 1:]):
             if self.jumping_count[self.nesting_level + 1] > 0:
                 self.jumping_count[self.nesting_level + 1] -= 1
@@ -170,15 +294,11 @@ class Sequence_parser:
                     typ="EOS",
                     DisplayText=self.textnesting * (self.nesting_level) + "EOS",
                 )
-                commands.append(dic_loop)
+                yield dic_loop, lines_index + 1 + ct
                 break
             if dic_loop is not None:
-                commands.append(dic_loop)
-                if lines_index == -1:
-                    textsequence.append(dic_loop)
-                    self.add_text(textsequence, dic_loop)
+                yield dic_loop, lines_index + 1 + ct
         del self.jumping_count[-1]
-        return commands, textsequence
 
     def add_text(self, text_list: list, dic: dict) -> None:
         """build the un-nested list of displayed commands"""
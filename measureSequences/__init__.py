@@ -3,3 +3,5 @@ from .Sequence_parsing import Sequence_parser
 from .Sequence_editor import Sequence_builder
 from .Dummy import Dummy
 from .Sequence_parsing import searchf_number
+from .estimator import Sequence_estimator
+from .simulation import Sequence_simulator
@@ -0,0 +1,153 @@
+"""Module containing the adaptive refinement of scans
+
+an adaptive scan starts with the coarse grid of its spacing code. After
+every point, the slopes of the measured quantity over the intervals to the
+neighbouring measured points are compared to the median slope of the
+previous intervals. If one exceeds it by more than a threshold, extra
+points are inserted into that very interval, until the point budget is
+used up, or the points would be closer than the minimum spacing. The scan
+then goes back to fill the interval (in the direction of the scan) before
+it continues with the coarse grid. Sweeps cannot go back, they cannot be
+refined.
+
+an adaptive scan is configured by an 'adaptive' dict in the scan entry:
+    channel: key of the measured value (e.g. 'res1')
+    statistic: which merged statistic to use ('mean', 'median', 'stddev')
+    budget: maximum number of inserted points
+    min_spacing: minimum distance between points
+    threshold: slope ratio (to the median slope) above which to refine
+    max_insert: maximum number of points inserted into one interval
+
+Classes:
+    AdaptiveGrid: iterator over the points of an adaptive scan
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import math
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("measureSequences.adaptive")
+logger.addHandler(logging.NullHandler())
+
+
+class AdaptiveGrid:
+    """iterator over the points of a scan, refined by the measured values
+
+    grid: the coarse grid, in the order of the scan
+    after every yielded point, record() should be called with
+    the values measured at that point
+    """
+
+    def __init__(
+        self,
+        grid,
+        channel: str,
+        statistic: str = "mean",
+        budget: int = 10,
+        min_spacing: float = 0.0,
+        threshold: float = 2.0,
+        max_insert: int = 4,
+    ):
+        super().__init__()
+        self.grid = [float(value) for value in grid]
+        self.channel = channel
+        self.statistic = statistic
+        self.budget = int(budget)
+        self.min_spacing = min_spacing
+        self.threshold = threshold
+        self.max_insert = int(max_insert)
+        self.direction = -1 if self.grid and self.grid[-1] < self.grid[0] else 1
+        self.pending = deque(self.grid)
+        self.used = []
+        self.measured = []
+        self.slopes = []
+        self.changes = []
+        self.inserted = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> float:
+        if not self.pending:
+            raise StopIteration
+        value = self.pending.popleft()
+        self.used.append(value)
+        return value
+
+    def record(self, value: float, measured: dict) -> None:
+        """record the values measured at a point, refine adjacent intervals
+
+        the intervals to the neighbouring measured points on both sides
+        are judged, unless there are still pending points within them
+        measured: merged values as stored by Sequence_runner.execute_res_measure
+        """
+        try:
+            y = float(measured[self.statistic][self.channel])
+        except (KeyError, TypeError, ValueError):
+            return
+        neighbours = (self._neighbour(value, -1), self._neighbour(value, 1))
+        self.measured.append((value, y))
+        reference = np.median(self.slopes) if self.slopes else None
+        # the slopes of short (refined) intervals are dominated by noise,
+        # the change over an interval needs to exceed the threshold as well
+        change_limit = self.threshold * np.median(self.changes) if self.changes else 0
+        steep = []
+        for neighbour in neighbours:
+            if neighbour is None:
+                continue
+            x, y_neighbour = neighbour
+            change = abs(y - y_neighbour)
+            slope = change / abs(value - x)
+            self.slopes.append(slope)
+            self.changes.append(change)
+            if reference is None or change < change_limit:
+                continue
+            if reference > 0:
+                ratio = slope / reference
+            else:
+                ratio = math.inf if slope > 0 else 0
+            if ratio >= self.threshold:
+                steep.append((x, ratio))
+        # points are inserted in front of the pending ones, the interval
+        # preceding the value (if steep) is scanned first
+        for x, ratio in reversed(steep):
+            start, end = sorted((x, value), key=lambda x: x * self.direction)
+            self._subdivide(start, end, ratio)
+
+    def _neighbour(self, value: float, side: int):
+        """the nearest measured point preceding (side -1) or following
+        (side 1) the value in the direction of the scan
+
+        returns: (x, y), None if there is none or a pending point lies
+            in between
+        """
+        direction = side * self.direction
+        beyond = [
+            point for point in self.measured if (point[0] - value) * direction > 0
+        ]
+        if not beyond:
+            return None
+        point = min(beyond, key=lambda point: (point[0] - value) * direction)
+        distance = (point[0] - value) * direction
+        if any(0 < (x - value) * direction < distance for x in self.pending):
+            return None
+        return point
+
+    def _subdivide(self, start: float, end: float, ratio: float) -> None:
+        """insert points between start and end, to be scanned next"""
+        count = min(self.budget - self.inserted, self.max_insert)
+        if ratio < math.inf:
+            count = min(count, math.ceil(ratio) - 1)
+        if self.min_spacing > 0:
+            count = min(count, math.floor(abs(end - start) / self.min_spacing) - 1)
+        if count <= 0:
+            return
+        points = np.linspace(start, end, count + 2)[1:-1]
+        self.pending.extendleft(reversed(points.tolist()))
+        self.inserted += count
+        logger.debug(f"inserted {count} points between {start} and {end}")
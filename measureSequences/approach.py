@@ -0,0 +1,128 @@
+"""Module containing the approach planner for the "No O'Shoot" mode
+
+to reach a target without overshooting it, the target is approached in
+sub-steps getting smaller towards the target. The remaining distance
+shrinks geometrically, until the last step is small enough that its
+(expected) overshoot stays within the allowed margin. The number of
+sub-steps therefore only depends on the distance from the point where the
+approach starts (last setpoint or current reading) to the target.
+
+Classes:
+    ApproachPlan: the sub-steps of one approach, and its planned ramp time
+    ApproachPlanner: creates plans, with settings per quantity
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import math
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("measureSequences.approach")
+logger.addHandler(logging.NullHandler())
+
+
+# per quantity:
+#   margin: allowed overshoot (units of the quantity)
+#   overshoot: expected overshoot of a step, as fraction of the step size
+#   ratio: factor by which the remaining distance shrinks with every step
+#   max_steps: maximum number of sub-steps
+APPROACH_SETTINGS_DEFAULT = dict(
+    Temp=dict(margin=0.02, overshoot=0.1, ratio=0.5, max_steps=10),
+    Field=dict(margin=1e-4, overshoot=0.01, ratio=0.5, max_steps=10),
+)
+
+
+class ApproachPlan:
+    """the sub-steps of an approach
+
+    start: value the approach starts from
+    target: final value
+    steps: numpy array of the sub-step setpoints, the last one is the target
+    ramp_time: planned time in seconds to ramp through all steps (without
+        any settling), None if no rate was given
+    rate: ramp rate in units per minute, None if not given
+    """
+
+    def __init__(
+        self,
+        start: float,
+        target: float,
+        steps,
+        ramp_time: float = None,
+        rate: float = None,
+    ):
+        super().__init__()
+        self.start = start
+        self.target = target
+        self.steps = steps
+        self.ramp_time = ramp_time
+        self.rate = rate
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def step_ramp_times(self):
+        """planned ramp time in seconds of every step, zero without a rate"""
+        if not self.rate:
+            return np.zeros(len(self.steps))
+        return np.abs(np.diff(self.steps, prepend=self.start)) / self.rate * 60
+
+    def __repr__(self) -> str:
+        return (
+            f"ApproachPlan({self.start} -> {self.target}, {len(self.steps)} steps, "
+            f"ramp time {self.ramp_time} s)"
+        )
+
+
+class ApproachPlanner:
+    """plan approaches to targets without overshooting
+
+    settings: dict, per quantity overrides of APPROACH_SETTINGS_DEFAULT
+    """
+
+    def __init__(self, settings: dict = None):
+        super().__init__()
+        self.settings = {
+            quantity: dict(values)
+            for quantity, values in APPROACH_SETTINGS_DEFAULT.items()
+        }
+        for quantity, values in (settings or {}).items():
+            self.settings.setdefault(quantity, {}).update(values)
+
+    def plan(
+        self, quantity: str, start: float, target: float, rate: float = None
+    ) -> ApproachPlan:
+        """plan the approach of quantity from start to target
+
+        rate: ramp rate in units per minute, to calculate the ramp time
+        returns: ApproachPlan
+        """
+        settings = self.settings[quantity]
+        distance = abs(target - start)
+        # the last step may be this large without overshooting the margin
+        step_final = settings["margin"] / settings["overshoot"]
+        if distance <= step_final:
+            steps = np.array([target], dtype=float)
+        else:
+            count = 1 + math.ceil(
+                math.log(distance / step_final) / math.log(1 / settings["ratio"])
+            )
+            count = min(count, settings["max_steps"])
+            # remaining distance after every step, the last one is zero
+            remaining = distance * settings["ratio"] ** np.arange(1, count)
+            steps = np.append(
+                target - math.copysign(1, target - start) * remaining, target
+            )
+
+        ramp_time = None
+        if rate:
+            ramp_time = distance / rate * 60
+        return ApproachPlan(
+            start=start, target=target, steps=steps, ramp_time=ramp_time, rate=rate
+        )
@@ -0,0 +1,527 @@
+"""Benchmarks of the framework overhead of the Sequence_runner
+
+all instrument hooks are zero-latency stubs, every measured second is
+spent in the runner itself. Further benchmarks cover the editor and
+the file formats of parsed sequences. Results can be saved as JSON baselines and
+compared to a later run (on the same machine):
+
+    python -m measureSequences.benchmarks --output baseline.json
+    python -m measureSequences.benchmarks --compare baseline.json
+
+Classes:
+    Benchmark_runner: Sequence_runner with zero-latency instrument stubs
+
+Functions:
+    run_benchmarks: run all (or selected) benchmarks, return the results
+    compare: compare results to a baseline
+    main: command line interface
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import argparse
+import subprocess
+import tempfile
+import threading
+import statistics
+import logging
+from itertools import repeat
+
+from .runSequences import Sequence_runner
+from .Sequence_parsing import Sequence_parser
+from . import mseq
+from .frozen import freeze
+from .frozen import thaw
+
+logger = logging.getLogger("measureSequences.benchmarks")
+logger.addHandler(logging.NullHandler())
+
+
+class Benchmark_runner(Sequence_runner):
+    """Sequence_runner whose instrument hooks return immediately"""
+
+    def __init__(self, sequence: list = None, **kwargs):
+        kwargs.setdefault("preflight_mandatory", False)
+        super().__init__(sequence=[] if sequence is None else sequence, **kwargs)
+
+    def message_to_user(self, message: str) -> None:
+        pass
+
+    def scan_T_programSweep(self, **kwargs) -> None:
+        pass
+
+    def scan_H_programSweep(self, **kwargs) -> None:
+        pass
+
+    def scan_P_programSweep(self, **kwargs) -> None:
+        pass
+
+    def setField(self, field: float, EndMode: str = None) -> None:
+        pass
+
+    def setFieldEndMode(self, EndMode: str) -> bool:
+        return True
+
+    def setTemperature(self, temperature: float) -> None:
+        pass
+
+    def setPosition(self, position: float, speedindex: int) -> None:
+        pass
+
+    def getTemperature(self) -> float:
+        return self._setpoint_temp
+
+    def getField(self) -> float:
+        return self._setpoint_field
+
+    def getPosition(self) -> float:
+        return self._setpoint_pos
+
+    def getChamber(self):
+        return self._setpoint_chamber
+
+    def checkStable_Temp(self, temp: float, **kwargs) -> bool:
+        return True
+
+    def checkField(self, field: float, **kwargs) -> bool:
+        return True
+
+    def checkPosition(self, position: float, **kwargs) -> bool:
+        return True
+
+    def Shutdown(self) -> None:
+        pass
+
+    def chamber_purge(self) -> bool:
+        return True
+
+    def chamber_vent(self) -> bool:
+        return True
+
+    def chamber_seal(self) -> bool:
+        return True
+
+    def chamber_continuous(self, action) -> bool:
+        return True
+
+    def chamber_high_vacuum(self) -> bool:
+        return True
+
+    def res_measure(self, dataflags: dict, bridge_conf: dict) -> dict:
+        return dict(res1=5.0, exc1=10.0, res2=8.0, exc2=10.0)
+
+    def measuring_store_data(self, data: dict, datafile: str) -> None:
+        pass
+
+    def res_datafilecomment(self, comment: str, datafile: str) -> None:
+        pass
+
+    def res_change_datafile(self, datafile: str, mode: str) -> None:
+        pass
+
+
+# ------------------------- sequences ------------------------------------------
+
+
+def _measure(reading_count: int = 1) -> dict:
+    return dict(
+        typ="res_measure",
+        reading_count=reading_count,
+        dataflags={},
+        bridge_conf={},
+        DisplayText="measure",
+    )
+
+
+def _scan_T(Nsteps: int, commands: list) -> dict:
+    return dict(
+        typ="scan_T",
+        start=2,
+        end=300,
+        Nsteps=Nsteps,
+        SweepRate=1,
+        SpacingCode="uniform",
+        ApproachMode="Fast",
+        commands=commands,
+        DisplayText="scan_T",
+    )
+
+
+def _scan_H(Nsteps: int, commands: list) -> dict:
+    return dict(
+        typ="scan_H",
+        start=0,
+        end=9,
+        Nsteps=Nsteps,
+        SweepRate=1,
+        SpacingCode="uniform",
+        ApproachMode="Linear",
+        EndMode="driven",
+        commands=commands,
+        DisplayText="scan_H",
+    )
+
+
+def _flat(N: int) -> list:
+    """flat list of cheap commands"""
+    return [
+        dict(typ="res_datafilecomment", comment=str(i), DisplayText="comment")
+        for i in range(N)
+    ]
+
+
+def _nested(depth: int, Nsteps: int) -> list:
+    """depth nested scans (alternating T and H) around one measurement"""
+    commands = [_measure()]
+    for level in range(depth):
+        scan = _scan_T if level % 2 else _scan_H
+        commands = [scan(Nsteps, commands)]
+    return commands
+
+
+def _executed(runner: Sequence_runner) -> int:
+    """number of commands executed by the runner"""
+    return sum(h["count"] for h in runner.metrics.snapshot()["commands"].values())
+
+
+def _median_time(func, repetitions: int) -> float:
+    times = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _run_threaded(runner: Sequence_runner) -> threading.Thread:
+    thread = threading.Thread(target=runner.running, daemon=True)
+    thread.start()
+    return thread
+
+
+# ------------------------- benchmarks -----------------------------------------
+
+
+def bench_commands_flat(scale: float) -> dict:
+    """commands/s through execute_sequence_entry, flat list"""
+    N = int(10000 * scale)
+    runner = Benchmark_runner(_flat(N))
+    duration = _median_time(runner.running, 3)
+    return dict(commands_flat_per_s=N / duration)
+
+
+def bench_commands_nested(scale: float) -> dict:
+    """commands/s through execute_sequence_entry, deeply nested scans"""
+    results = {}
+    for depth, Nsteps in ((2, int(100 * scale**0.5)), (4, int(10 * scale**0.25))):
+        runner = Benchmark_runner(_nested(depth, max(Nsteps, 2)))
+        runner.running()
+        executed = _executed(runner)
+        runner.metrics.reset()
+        duration = _median_time(runner.running, 3)
+        results[f"commands_nested_depth{depth}_per_s"] = executed / duration
+    return results
+
+
+def bench_res_measure(scale: float) -> dict:
+    """per-reading cost of execute_res_measure"""
+    results = {}
+    runner = Benchmark_runner()
+    for reading_count in (1, 10, 100, 1000):
+        repetitions = max(int(1000 * scale / reading_count), 3)
+        duration = _median_time(
+            lambda: runner.execute_res_measure(
+                dataflags={}, reading_count=reading_count, bridge_conf={}
+            ),
+            repetitions,
+        )
+        results[f"res_measure_{reading_count}_per_reading_s"] = duration / reading_count
+    return results
+
+
+def bench_stop_latency(scale: float) -> dict:
+    """seconds from stop() to the return of running(), while waiting"""
+    latencies = []
+    for _ in range(max(int(5 * scale), 3)):
+        runner = Benchmark_runner([dict(typ="Wait", Delay=3600, DisplayText="Wait")])
+        thread = _run_threaded(runner)
+        time.sleep(0.05)
+        start = time.perf_counter()
+        runner.stop()
+        thread.join()
+        latencies.append(time.perf_counter() - start)
+    return dict(
+        stop_latency_median_s=statistics.median(latencies),
+        stop_latency_max_s=max(latencies),
+    )
+
+
+def bench_pause_latency(scale: float) -> dict:
+    """seconds from pause() to the last started command,
+    and from continue_() to the next started command
+    """
+    pause_latencies = []
+    continue_latencies = []
+    for _ in range(max(int(5 * scale), 3)):
+        starts = []
+        # endless sequence
+        runner = Benchmark_runner(repeat(_flat(1)[0]))
+        runner.add_hook("command_start", lambda **kw: starts.append(kw["timestamp"]))
+        thread = _run_threaded(runner)
+        time.sleep(0.05)
+
+        t_pause = runner.clock.monotonic()
+        runner.pause()
+        time.sleep(0.2)
+        pause_latencies.append(max(starts[-1] - t_pause, 0))
+
+        executed = len(starts)
+        t_continue = runner.clock.monotonic()
+        runner.continue_()
+        while len(starts) == executed:
+            time.sleep(0.001)
+        continue_latencies.append(starts[executed] - t_continue)
+
+        runner.stop()
+        thread.join()
+    return dict(
+        pause_latency_median_s=statistics.median(pause_latencies),
+        continue_latency_median_s=statistics.median(continue_latencies),
+    )
+
+
+def bench_chain(scale: float) -> dict:
+    """setup cost of chaining a sequence (parsing included)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for lines in (1, 100):
+            filename = os.path.join(directory, f"chained_{lines}.seq")
+            with open(filename, "w") as f:
+                f.write("".join(f"REM remark {i}\n" for i in range(lines)))
+            runner = Benchmark_runner(
+                [
+                    dict(
+                        typ="chain sequence",
+                        new_file_seq=filename + "\n",
+                        DisplayText="chain",
+                    )
+                ]
+            )
+            duration = _median_time(runner.running, max(int(50 * scale), 3))
+            results[f"chain_{lines}_lines_s"] = duration
+    return results
+
+
+_EDITOR_STARTUP = """
+import sys
+import time
+start = time.perf_counter()
+from PyQt5 import QtWidgets
+app = QtWidgets.QApplication(sys.argv)
+from measureSequences.Sequence_editor import Sequence_builder
+Sequence_builder()
+print(time.perf_counter() - start)
+"""
+
+
+def bench_editor_startup(scale: float) -> dict:
+    """cold start of the sequence editor (imports, ui, construction),
+    each in a fresh interpreter, and construction in a running application
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + env.get("PYTHONPATH", "").split(os.pathsep)
+    )
+    cold = []
+    for _ in range(max(int(3 * scale), 3)):
+        output = subprocess.run(
+            [sys.executable, "-c", _EDITOR_STARTUP],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        cold.append(float(output.split()[-1]))
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+    from .Sequence_editor import Sequence_builder
+
+    # the application only needs to exist while the editors are constructed
+    _app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    construct = _median_time(Sequence_builder, max(int(10 * scale), 3))
+    del _app
+    return dict(
+        editor_cold_start_s=statistics.median(cold),
+        editor_construct_s=construct,
+    )
+
+
+_RES = "RES 255 {} 2 100 1000 0 0 95 2 100 1000 0 0 95 0 1 10 0 0 9 0 1 10 1 1 9\n"
+
+
+def bench_sequence_format(scale: float) -> dict:
+    """saving and loading a parsed sequence: pickle and JSON (as saved by
+    Sequence_parser.saving), and the binary .mseq format, opened lazily
+    (memory-mapped) and decoded completely; plus the file sizes
+    """
+    lines = []
+    for i in range(int(1000 * scale)):
+        lines += [
+            f"REM block {i}\n",
+            f"SCANT {300 - i % 290} {2 + i % 7} 2 50 0 0\n",
+            _RES.format(1 + i % 5),
+            f"SCANH 0 {1 + i % 9} 0.5 5 0 0 0\n",
+            _RES.format(5),
+            "ENDSCAN EOS\n",
+            "ENDSCAN EOS\n",
+            f"TMP TEMP {10 + i % 100} 5 0\n",
+        ]
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "sequence.seq")
+        with open(filename, "w") as f:
+            f.writelines(lines)
+        # frozen, as held by the editor
+        data = freeze(Sequence_parser(sequence_file=filename).data)
+        files = dict(
+            pickle=os.path.join(directory, "sequence.pkl"),
+            json=os.path.join(directory, "sequence.json"),
+            mseq=os.path.join(directory, "sequence.mseq"),
+        )
+
+        def save_pickle():
+            with open(files["pickle"], "wb") as output:
+                pickle.dump(thaw(data), output, pickle.HIGHEST_PROTOCOL)
+
+        def save_json():
+            with open(files["json"], "w") as output:
+                output.write(json.dumps(thaw(data)))
+
+        def load_pickle():
+            with open(files["pickle"], "rb") as f:
+                return pickle.load(f)
+
+        def load_json():
+            with open(files["json"]) as f:
+                return json.load(f)
+
+        repetitions = max(int(5 * scale), 3)
+        for name, func in (
+            ("pickle_save", save_pickle),
+            ("json_save", save_json),
+            ("mseq_save", lambda: mseq.dump(data, files["mseq"])),
+            ("pickle_load", load_pickle),
+            ("json_load", load_json),
+            ("mseq_open", lambda: mseq.load(files["mseq"])[0]),
+            ("mseq_load", lambda: mseq.load(files["mseq"], lazy=False)),
+        ):
+            results[f"format_{name}_s"] = _median_time(func, repetitions)
+        for name, file in files.items():
+            results[f"format_{name}_bytes"] = os.path.getsize(file)
+    return results
+
+
+BENCHMARKS = dict(
+    commands_flat=bench_commands_flat,
+    commands_nested=bench_commands_nested,
+    res_measure=bench_res_measure,
+    stop_latency=bench_stop_latency,
+    pause_latency=bench_pause_latency,
+    chain=bench_chain,
+    editor_startup=bench_editor_startup,
+    sequence_format=bench_sequence_format,
+)
+
+
+def run_benchmarks(names: list = None, scale: float = 1.0) -> dict:
+    """run the benchmarks
+
+    names: which benchmarks to run (keys of BENCHMARKS), default all
+    scale: factor for the problem sizes/repetitions
+    returns: dict(meta=dict(...), results=dict(name=value))
+        names ending in '_per_s' are rates (higher is better),
+        in '_bytes' file sizes, everything else are times in seconds
+        (lower is better)
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        logger.info(f"running benchmark {name}")
+        results.update(BENCHMARKS[name](scale))
+    return dict(
+        meta=dict(
+            timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            machine=platform.machine(),
+            processor=platform.processor(),
+            scale=scale,
+        ),
+        results=results,
+    )
+
+
+def compare(results: dict, baseline: dict) -> str:
+    """compare results to a baseline, return a printable table
+
+    the change is given such that a positive number is an improvement
+    """
+    lines = [f"{'benchmark':45} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for name, value in results["results"].items():
+        try:
+            old = baseline["results"][name]
+        except KeyError:
+            lines.append(f"{name:45} {'-':>12} {value:12.4g}")
+            continue
+        if name.endswith("_per_s"):
+            change = value / old - 1
+        else:
+            change = old / value - 1 if value else 0
+        lines.append(f"{name:45} {old:12.4g} {value:12.4g} {change:+8.1%}")
+    if results["meta"]["machine"] != baseline["meta"].get("machine"):
+        lines.append("WARNING: the baseline was recorded on a different machine")
+    return "\n".join(lines)
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="measure the framework overhead of the Sequence_runner"
+    )
+    parser.add_argument("--output", help="save the results as JSON baseline")
+    parser.add_argument("--compare", help="compare to a JSON baseline")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="factor for problem sizes"
+    )
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="benchmarks to run, default: all of {}".format(", ".join(BENCHMARKS)),
+    )
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    results = run_benchmarks(args.benchmarks, scale=args.scale)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)))
+    else:
+        for name, value in results["results"].items():
+            print(f"{name:45} {value:12.4g}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
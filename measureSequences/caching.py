@@ -0,0 +1,199 @@
+"""Module containing caching layers between the Sequence_runner and instruments
+
+Classes:
+    ReadingCache: cache for instrument readings ('get*' hooks)
+        every quantity has a maximum age, readings which are younger than that
+        are served from the cache, concurrent readers of the same quantity
+        are coalesced into a single instrument read
+
+    SetpointCache: write-through record of commanded instrument state
+        used to skip commands which would not change the instrument state
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger("measureSequences.caching")
+logger.addHandler(logging.NullHandler())
+
+
+class _PendingRead:
+    """an instrument read which is currently in progress"""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadingCache:
+    """Thread-safe cache for instrument readings
+
+    quantities are identified by name (e.g. 'Temp', 'Field', 'Position',
+    'Chamber' as used in the Sequence_runner), every quantity can have its own
+    maximum age in seconds:
+        max_age = 0: every request goes to the instrument, however requests
+            which arrive while a read is in progress share its result
+
+    the cache never talks to an instrument on its own, the reading function
+    is supplied by the caller in get()
+    """
+
+    def __init__(self, max_age: dict = None, clock=time.monotonic):
+        super().__init__()
+        self.max_age = {} if max_age is None else dict(max_age)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._readings = {}
+        self._pending = {}
+
+    def get(self, quantity: str, readfunc, max_age: float = None):
+        """return a reading of quantity, calling readfunc only if necessary
+
+        if a valid reading is in the cache, it is returned directly,
+        if another thread is currently reading the same quantity, wait for
+        that read to finish and return its value (or raise its exception),
+        otherwise call readfunc() and store the result
+        """
+        if max_age is None:
+            max_age = self.max_age.get(quantity, 0)
+        with self._lock:
+            reading = self._readings.get(quantity)
+            # strictly younger: a reading as old as max_age is read anew, so
+            # polling every max_age seconds always gets a fresh reading
+            if reading is not None and self.clock() - reading[1] < max_age:
+                return reading[0]
+            pending = self._pending.get(quantity)
+            owner = pending is None
+            if owner:
+                pending = self._pending[quantity] = _PendingRead()
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = readfunc()
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                if pending.error is None:
+                    self._readings[quantity] = (pending.value, self.clock())
+                del self._pending[quantity]
+            pending.event.set()
+        return pending.value
+
+    def update(self, quantity: str, value) -> None:
+        """store a reading which was obtained elsewhere"""
+        with self._lock:
+            self._readings[quantity] = (value, self.clock())
+
+    def invalidate(self, *quantities) -> None:
+        """discard cached readings, all of them if no quantity is given"""
+        with self._lock:
+            if not quantities:
+                self._readings.clear()
+            for quantity in quantities:
+                self._readings.pop(quantity, None)
+
+    def snapshot(self) -> dict:
+        """return all cached readings without touching any instrument
+
+        returns: dict, quantity: dict(value=value, age=age in seconds)
+        """
+        now = self.clock()
+        with self._lock:
+            readings = dict(self._readings)
+        return {
+            quantity: dict(value=value, age=now - timestamp)
+            for quantity, (value, timestamp) in readings.items()
+        }
+
+
+class SetpointCache:
+    """Write-through record of the state commanded to the instruments
+
+    for every quantity (e.g. 'Temp', 'Field', 'Position', 'EndMode'),
+    the last commanded value and mode (e.g. the EndMode of a field) is kept.
+    A new command is redundant if the mode is the same and the value lies
+    within the tolerance of the respective quantity.
+
+    whenever the instrument state might have been changed outside of the
+    commands recorded here (sweeps, manual intervention, ...), the respective
+    quantities need to be invalidated
+
+    skipped commands are counted and logged in a bounded list
+    """
+
+    def __init__(
+        self, tolerances: dict = None, log_length: int = 1000, clock=time.time
+    ):
+        super().__init__()
+        self.tolerances = {} if tolerances is None else dict(tolerances)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._commanded = {}
+        self.skipped = deque(maxlen=log_length)
+        self.skipped_count = {}
+
+    def is_redundant(self, quantity: str, value, mode=None) -> bool:
+        """check whether commanding value (and mode) would change nothing
+
+        if it would not, the skipped command is recorded
+        """
+        with self._lock:
+            try:
+                value_commanded, mode_commanded = self._commanded[quantity]
+            except KeyError:
+                return False
+            if mode != mode_commanded:
+                return False
+            if value != value_commanded:
+                try:
+                    if abs(value - value_commanded) > self.tolerances.get(quantity, 0):
+                        return False
+                except TypeError:
+                    return False
+            self.skipped.append(
+                dict(quantity=quantity, value=value, mode=mode, time=self.clock())
+            )
+            self.skipped_count[quantity] = self.skipped_count.get(quantity, 0) + 1
+        logger.debug(f"skipped redundant command: {quantity} = {value}, {mode}")
+        return True
+
+    def get(self, quantity: str) -> tuple:
+        """return (value, mode) last commanded, (None, None) if unknown"""
+        with self._lock:
+            return self._commanded.get(quantity, (None, None))
+
+    def commanded(self, quantity: str, value, mode=None) -> None:
+        """record that value (and mode) was sent to the instrument"""
+        with self._lock:
+            self._commanded[quantity] = (value, mode)
+
+    def invalidate(self, *quantities) -> None:
+        """forget the commanded state, of all quantities if none is given"""
+        with self._lock:
+            if not quantities:
+                self._commanded.clear()
+            for quantity in quantities:
+                self._commanded.pop(quantity, None)
+
+    def snapshot(self) -> dict:
+        """return the commanded state, quantity: dict(value=value, mode=mode)"""
+        with self._lock:
+            return {
+                quantity: dict(value=value, mode=mode)
+                for quantity, (value, mode) in self._commanded.items()
+            }
@@ -0,0 +1,189 @@
+"""Module containing the clocks used by the Sequence_runner
+
+all time reads, sleeps and timers of the Sequence_runner go through a clock,
+so that a sequence can be run either in real time, or on a virtual clock
+which is advanced manually (tests, simulations, estimations)
+
+Classes:
+    RealClock: wall clock, real sleeps, threading.Timer
+    ManualClock: virtual clock which only advances when slept on,
+        timers fire (synchronously, one at a time) once their deadline
+        is passed
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import time
+import heapq
+import threading
+import logging
+from itertools import count
+
+logger = logging.getLogger("measureSequences.clock")
+logger.addHandler(logging.NullHandler())
+
+
+class RealClock:
+    """the real clock, as used when running a sequence on instruments"""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def wait_until(self, deadline: float, keep_waiting=None, step: float = 0.01):
+        """sleep until monotonic() reaches deadline
+
+        keep_waiting: callable, checked every step, the waiting is cut short
+            as soon as it returns False
+        returns: True if the deadline was reached
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            if keep_waiting is not None and not keep_waiting():
+                return False
+            time.sleep(min(step, remaining))
+
+    def timer(self, interval: float, function, args=None, kwargs=None):
+        """return a (not yet started) timer calling function after interval"""
+        return threading.Timer(interval, function, args=args, kwargs=kwargs)
+
+
+class _ManualTimer:
+    """timer of a ManualClock, same interface as threading.Timer"""
+
+    def __init__(self, clock, interval: float, function, args, kwargs):
+        super().__init__()
+        self.clock = clock
+        self.interval = interval
+        self.function = function
+        self.args = args if args is not None else []
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.deadline = None
+        self.finished = False
+
+    def start(self) -> None:
+        self.deadline = self.clock.monotonic() + self.interval
+        self.clock._schedule(self)
+
+    def cancel(self) -> None:
+        self.finished = True
+
+    def is_alive(self) -> bool:
+        return self.deadline is not None and not self.finished
+
+    def join(self, timeout: float = None) -> None:
+        """advance the clock until the timer has fired (or until timeout)"""
+        if not self.is_alive():
+            return
+        deadline = self.deadline
+        if timeout is not None:
+            deadline = min(deadline, self.clock.monotonic() + timeout)
+        self.clock.wait_until(deadline)
+
+    def fire(self) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        self.function(*self.args, **self.kwargs)
+
+
+class ManualClock:
+    """virtual clock, which only advances when it is slept on or advanced
+
+    sleeping does not take any real time, a week-long sequence takes as long
+    as its commands need to execute. Timers fire synchronously, in the thread
+    advancing the clock, in the order of their deadlines. Timers do not
+    interrupt each other: if the clock is advanced while a timer is firing,
+    the timers becoming due meanwhile fire after it returned (late, as if
+    they had been waiting for a single worker thread).
+
+    start: initial value of monotonic()
+    epoch: value of time() when monotonic() is 0
+    """
+
+    def __init__(self, start: float = 0.0, epoch: float = None):
+        super().__init__()
+        self._now = start
+        self.epoch = time.time() if epoch is None else epoch
+        self._lock = threading.RLock()
+        self._timers = []
+        self._order = count()
+        self._firing = False
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def perf_counter(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self.epoch + self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """advance the clock, firing all timers which become due"""
+        self._advance_to(self._now + max(seconds, 0))
+
+    def wait_until(self, deadline: float, keep_waiting=None, step: float = 0.01):
+        """advance to deadline, unless keep_waiting returns False
+
+        keep_waiting is checked initially and after every fired timer,
+        since nothing else can change while virtual time passes
+        returns: True if the deadline was reached
+        """
+        while self._now < deadline:
+            if keep_waiting is not None and not keep_waiting():
+                return False
+            self._advance_to(deadline, single=True)
+        return True
+
+    def timer(self, interval: float, function, args=None, kwargs=None):
+        """return a (not yet started) timer calling function after interval"""
+        return _ManualTimer(self, interval, function, args, kwargs)
+
+    def _schedule(self, timer: _ManualTimer) -> None:
+        with self._lock:
+            heapq.heappush(self._timers, (timer.deadline, next(self._order), timer))
+
+    def _advance_to(self, target: float, single: bool = False) -> bool:
+        """advance to target, firing due timers on the way
+
+        single: stop after the first fired timer
+        returns: True if a timer was fired
+        """
+        fired = False
+        while True:
+            with self._lock:
+                if (
+                    self._firing
+                    or not self._timers
+                    # including timers deferred while the last one was firing
+                    or self._timers[0][0] > max(target, self._now)
+                ):
+                    self._now = max(self._now, target)
+                    return fired
+                deadline, _, timer = heapq.heappop(self._timers)
+                self._now = max(self._now, deadline)
+                if timer.finished:
+                    continue
+                self._firing = True
+            try:
+                timer.fire()
+            finally:
+                self._firing = False
+            fired = True
+            if single:
+                return fired
@@ -0,0 +1,90 @@
+"""Module containing stop conditions for scans
+
+a scan entry may carry a list of 'stop_conditions': python expressions
+which are evaluated after every point of the scan, e.g.
+
+    "res1 < 0.01"
+    "abs(res1 - res2) > 0.5 and value > 2"
+
+As soon as one of them is true, the scan ends, and the sequence continues
+with the next command. Within the expressions, the following names are
+available:
+    the mean values measured at this point (e.g. res1, exc1, ...)
+    mean, median, stddev: dicts of the respective merged values
+    value: the current value of the scan (temperature, field, ...)
+    abs, min, max, np
+Expressions are compiled once. If a name is not available (e.g. nothing
+has been measured at this point), the expression counts as false.
+
+Functions:
+    compile_condition: compile the expression of a stop condition
+
+Classes:
+    StopConditions: compiled stop conditions of a scan
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("measureSequences.conditions")
+logger.addHandler(logging.NullHandler())
+
+
+_GLOBALS = dict(__builtins__={}, abs=abs, min=min, max=max, np=np)
+
+
+def compile_condition(expression: str):
+    """compile an expression, raises SyntaxError if it is invalid"""
+    return compile(expression, f"<stop condition {expression!r}>", "eval")
+
+
+class StopConditions:
+    """stop conditions of a scan
+
+    conditions: expressions (str), or callables taking the namespace
+        of the evaluation as only argument
+    """
+
+    def __init__(self, conditions: list = None):
+        super().__init__()
+        self.conditions = []
+        for condition in conditions or ():
+            self.add(condition)
+
+    def __bool__(self) -> bool:
+        return bool(self.conditions)
+
+    def add(self, condition, name: str = None) -> None:
+        """add an expression, or a callable taking the namespace"""
+        if callable(condition):
+            self.conditions.append((name or repr(condition), condition))
+            return
+        code = compile_condition(condition)
+        self.conditions.append(
+            (name or condition, lambda namespace: eval(code, _GLOBALS, namespace))
+        )
+
+    def check(self, measured: dict, value=None) -> str:
+        """evaluate the conditions in order
+
+        measured: merged values as stored by Sequence_runner.execute_res_measure
+        returns: the name of the first condition which is met, None otherwise
+        """
+        namespace = dict(measured.get("mean", {}))
+        namespace.update(
+            mean=measured.get("mean", {}),
+            median=measured.get("median", {}),
+            stddev=measured.get("stddev", {}),
+            value=value,
+        )
+        for name, condition in self.conditions:
+            try:
+                if condition(namespace):
+                    return name
+            except (NameError, KeyError, TypeError, ZeroDivisionError) as e:
+                logger.debug(f"stop condition {name!r} not evaluable: {e}")
+        return None
@@ -0,0 +1,650 @@
+"""Module containing an offline estimator for the duration of sequences
+
+the sequence is executed by a Sequence_runner, whose instrument hooks
+are replaced by a model of the instruments running on a ManualClock:
+temperature, field and position follow linear ramps determined by the
+SweepRate (or speedindex) and the distance between consecutive setpoints,
+waiting for a value advances the virtual clock to the point in time
+the ramp reaches that value. Settling, measuring and chamber operations
+take configurable amounts of time. The commands of a scan which do not
+change the instrument state (e.g. measurements) are executed at its first
+point only, at all further points their duration is repeated.
+Measured values are not modelled: stop conditions never end a scan early,
+and adaptive scans are not refined, the estimate is then only a bound.
+
+Classes:
+    Ramp: piecewise linear trajectory of one quantity over virtual time
+    EstimateReport: result of an estimation
+    Sequence_estimator: Sequence_runner on a virtual clock
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from .runSequences import Sequence_runner
+from .util import no_exception_wrapping
+from .clock import ManualClock
+
+logger = logging.getLogger("measureSequences.estimator")
+logger.addHandler(logging.NullHandler())
+
+
+# durations in seconds
+DURATIONS_DEFAULT = dict(
+    # after a temperature has been reached, until it is stable
+    settle_Temp=60.0,
+    # after the field has been reached (not in Sweep mode)
+    settle_Field=5.0,
+    # switching the magnet into/out of persistent mode
+    persistent_switch=0.0,
+    # per reading of res_measure
+    reading=1.0,
+    # storing one data point / one datafile operation
+    store=0.01,
+    # chamber operations
+    chamber_seal=5.0,
+    chamber_purge=300.0,
+    chamber_vent=60.0,
+    chamber_continuous=1.0,
+    chamber_high_vacuum=600.0,
+    # until a sequence message is cleared by the user
+    message=0.0,
+    # executing a python script
+    python=0.0,
+)
+
+# rates used if a command does not specify one
+RATES_DEFAULT = dict(
+    # K/min
+    Temp=10.0,
+    # T/min
+    Field=0.5,
+    # degree/s at speedindex 0, divided by (speedindex + 1)
+    Position=5.0,
+)
+
+INITIAL_DEFAULT = dict(Temp=300.0, Field=0.0, Position=0.0)
+
+# commands which do not change the state of the (modelled) instruments,
+# their duration is the same at every point of a scan
+_STATELESS = {
+    "remark",
+    "beep",
+    "res_measure",
+    "res_change_datafile",
+    "res_datafilecomment",
+    "res_scan_excitation",
+    "EOS",
+}
+
+
+class Ramp:
+    """piecewise linear trajectory of one quantity over virtual time
+
+    points: list of (time, value), the value stays constant after the last one
+    """
+
+    def __init__(self, value: float, time: float = 0.0):
+        super().__init__()
+        self.points = [(time, value)]
+
+    @property
+    def target(self) -> float:
+        return self.points[-1][1]
+
+    @property
+    def end(self) -> float:
+        return self.points[-1][0]
+
+    def value(self, t: float) -> float:
+        """value at time t"""
+        points = self.points
+        if t >= points[-1][0]:
+            return points[-1][1]
+        if t <= points[0][0]:
+            return points[0][1]
+        for (t0, v0), (t1, v1) in zip(points, points[1:]):
+            if t <= t1:
+                return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+    def ramp(self, now: float, *segments) -> None:
+        """start ramping at time now, through segments of (target, rate)
+
+        rate in units per second, rate <= 0 means instantaneous
+        """
+        self.points = [(now, self.value(now))]
+        for target, rate in segments:
+            self.extend(target, rate)
+
+    def extend(self, target: float, rate: float) -> None:
+        """continue ramping from the last point to target"""
+        t, value = self.points[-1]
+        if rate > 0:
+            t += abs(target - value) / rate
+        self.points.append((t, target))
+
+    def delay(self, duration: float) -> None:
+        """hold the last value for an additional duration before it is reached"""
+        t, value = self.points[-1]
+        self.points.append((t + duration, value))
+
+    def reaching(self, value: float, now: float, tolerance: float = 1e-9) -> float:
+        """first time (not before now) at which the trajectory reaches value
+
+        if it never does, the end of the trajectory is returned
+        """
+        points = self.points
+        for (t0, v0), (t1, v1) in zip(points, points[1:]):
+            if t1 < now:
+                continue
+            if min(v0, v1) - tolerance <= value <= max(v0, v1) + tolerance:
+                if v1 == v0:
+                    return max(t0, now)
+                return max(t0 + (t1 - t0) * (value - v0) / (v1 - v0), now)
+        return max(points[-1][0], now)
+
+
+class EstimateReport:
+    """result of the estimation of a sequence
+
+    total: estimated duration in seconds
+    commands: per command type: dict(count, inclusive, exclusive),
+        exclusive times do not contain the time spent in nested commands
+        the exclusive times add up to the total
+    entries: per top-level entry: dict(index, typ, DisplayText, start, duration)
+    trajectory: time-ordered list of setpoints:
+        dict(time, quantity, value, mode)
+    messages: messages which would have been shown to the user
+    warnings: parts of the sequence which could not be estimated faithfully
+    result: return value of Sequence_runner.running()
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0.0
+        self.commands = {}
+        self.entries = []
+        self.trajectory = []
+        self.messages = []
+        self.warnings = []
+        self.result = None
+
+    def summary(self) -> str:
+        """human readable summary of the report"""
+        lines = [f"{self.result} estimated duration: {_format_duration(self.total)}"]
+        for typ, times in sorted(
+            self.commands.items(), key=lambda item: -item[1]["exclusive"]
+        ):
+            lines.append(
+                "{:25} {:6d}x {:>16} ({:>16} incl. nested)".format(
+                    typ,
+                    times["count"],
+                    _format_duration(times["exclusive"]),
+                    _format_duration(times["inclusive"]),
+                )
+            )
+        for warning in self.warnings:
+            lines.append(f"WARNING: {warning}")
+        return "\n".join(lines)
+
+
+def _format_duration(seconds: float) -> str:
+    return str(timedelta(seconds=round(seconds)))
+
+
+class Sequence_estimator(Sequence_runner):
+    """Sequence_runner estimating the duration of a sequence
+
+    the instrument hooks are implemented by a model of the instruments
+    on a virtual clock (ManualClock), the sequence is run through
+    as fast as possible
+
+    initial: dict, initial values of Temp, Field, Position
+    durations: dict, overrides for DURATIONS_DEFAULT
+    rates: dict, overrides for RATES_DEFAULT
+    """
+
+    def __init__(
+        self,
+        sequence: list,
+        initial: dict = None,
+        durations: dict = None,
+        rates: dict = None,
+        **kwargs,
+    ):
+        if kwargs.get("clock") is None:
+            kwargs["clock"] = ManualClock()
+        super().__init__(sequence=sequence, **kwargs)
+        self.initial = dict(INITIAL_DEFAULT, **(initial or {}))
+        self.durations = dict(DURATIONS_DEFAULT, **(durations or {}))
+        self.rates = dict(RATES_DEFAULT, **(rates or {}))
+        self.reset()
+
+    def reset(self) -> None:
+        """reset the virtual clock and instruments to their initial state"""
+        self._t0 = self.now
+        self.ramps = {
+            quantity: Ramp(value, self._t0) for quantity, value in self.initial.items()
+        }
+        self.stable = dict(Temp=self._t0, Field=self._t0)
+        self.report = EstimateReport()
+        self._child_times = []
+        # per scan body (by id): (commands, duration, report delta)
+        self._replays = {}
+        # scan entries (by id) already warned about measured values
+        self._warned_measured = set()
+        self.invalidate_setpoints()
+
+    def estimate(self, sequence: list = None) -> EstimateReport:
+        """run through the sequence on the virtual clock
+
+        returns: EstimateReport
+        """
+        if sequence is not None:
+            self.sequence = sequence
+        self.reset()
+        self._isRunning = True
+        self._isPaused = False
+        self.report.result = self.running()
+        self.report.total = self.elapsed
+        return self.report
+
+    # ------------------------- virtual clock ------------------------------
+
+    @property
+    def now(self) -> float:
+        return self.clock.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """virtual seconds since the last reset"""
+        return self.clock.monotonic() - self._t0
+
+    def _advance(self, duration: float) -> None:
+        self.clock.sleep(max(duration, 0))
+
+    def _advance_to(self, t: float) -> None:
+        self.clock.sleep(max(t - self.now, 0))
+
+    def _rate(self, quantity: str) -> float:
+        """ramp rate in units per second of the currently executed command"""
+        entry = self._entries[-1] if self._entries else None
+        rate = None
+        if entry is not None:
+            rate = entry.get("SweepRate")
+        if not rate:
+            rate = self.rates[quantity]
+        return rate / 60
+
+    def _position_rate(self, speedindex) -> float:
+        return self.rates["Position"] / (int(speedindex) + 1)
+
+    def _record(self, quantity: str, value, mode=None) -> None:
+        self.report.trajectory.append(
+            dict(time=self.elapsed, quantity=quantity, value=value, mode=mode)
+        )
+
+    def _warn(self, message: str) -> None:
+        self._logger.warning(message)
+        self.report.warnings.append(f"{tuple(self._path)}: {message}")
+
+    # ------------------------- bookkeeping --------------------------------
+
+    def _warn_measured(self, entry: dict) -> None:
+        """warn once per scan which depends on measured values"""
+        if id(entry) in self._warned_measured:
+            return
+        self._warned_measured.add(id(entry))
+        if entry.get("stop_conditions"):
+            self._warn(
+                f"{entry['typ']}: stop_conditions are not evaluated, "
+                "the estimate is an upper bound for this scan"
+            )
+        if entry.get("adaptive"):
+            budget = entry["adaptive"].get("budget", 10)
+            self._warn(
+                f"{entry['typ']}: adaptive points are not inserted, "
+                f"the estimate is a lower bound (up to {budget} more points)"
+            )
+
+    @no_exception_wrapping
+    def execute_sequence_entry(self, entry: dict) -> None:
+        if entry["typ"].startswith("scan_") and (
+            entry.get("stop_conditions") or entry.get("adaptive")
+        ):
+            self._warn_measured(entry)
+        start = self.now
+        self._child_times.append(0.0)
+        try:
+            super().execute_sequence_entry(entry)
+        finally:
+            duration = self.now - start
+            nested = self._child_times.pop()
+            times = self.report.commands.setdefault(
+                entry["typ"], dict(count=0, inclusive=0.0, exclusive=0.0)
+            )
+            times["count"] += 1
+            times["inclusive"] += duration
+            times["exclusive"] += duration - nested
+            if self._child_times:
+                self._child_times[-1] += duration
+            else:
+                self.report.entries.append(
+                    dict(
+                        index=self._path[-1],
+                        typ=entry["typ"],
+                        DisplayText=entry.get("DisplayText", ""),
+                        start=start - self._t0,
+                        duration=duration,
+                    )
+                )
+
+    # ------------------------- scans --------------------------------------
+
+    def _replayable(self, commands: list) -> bool:
+        """whether commands take the same time at every point of a scan
+
+        they must not change the instrument state: stateless commands,
+        pure delays, and time scans of such commands
+        """
+        for entry in commands:
+            typ = entry["typ"]
+            if typ in _STATELESS:
+                continue
+            if typ == "Wait" and not any(
+                entry.get(quantity)
+                for quantity in ("Temp", "Field", "Position", "Chamber")
+            ):
+                continue
+            if (
+                typ == "scan_time"
+                and not self.scan_time_force
+                and not entry.get("stop_conditions")
+                and self._replayable(entry["commands"])
+            ):
+                continue
+            return False
+        return True
+
+    @no_exception_wrapping
+    def _execute_scan_point(
+        self, point: int, value, commands: list, conditions=None
+    ) -> bool:
+        """execute the commands for one point of a scan
+
+        the commands of a scan are the same at every point, if they do not
+        change the instrument state, they take the same time as well: they
+        are executed at the first point only, for every further point the
+        virtual clock is advanced by their duration, and their share of the
+        report is added again. The cost of an estimate grows with the number
+        of scan points (setpoints), not with the number of executed commands.
+        """
+        if any(self._hooks.values()):
+            return super()._execute_scan_point(point, value, commands, conditions)
+        try:
+            _, duration, delta = self._replays[id(commands)]
+        except KeyError:
+            pass
+        else:
+            self._advance(duration)
+            self._child_times[-1] += duration
+            for typ, (count, inclusive, exclusive) in delta.items():
+                times = self.report.commands.setdefault(
+                    typ, dict(count=0, inclusive=0.0, exclusive=0.0)
+                )
+                times["count"] += count
+                times["inclusive"] += inclusive
+                times["exclusive"] += exclusive
+            # measured values are not modelled
+            return self._stop_condition_met(conditions, value, {})
+        if not self._replayable(commands):
+            return super()._execute_scan_point(point, value, commands, conditions)
+
+        start = self.now
+        before = {typ: dict(times) for typ, times in self.report.commands.items()}
+        warnings = len(self.report.warnings)
+        stop = super()._execute_scan_point(point, value, commands, conditions)
+        if len(self.report.warnings) == warnings:
+            delta = {}
+            for typ, times in self.report.commands.items():
+                previous = before.get(typ, dict(count=0, inclusive=0.0, exclusive=0.0))
+                if times["count"] != previous["count"]:
+                    delta[typ] = tuple(
+                        times[key] - previous[key]
+                        for key in ("count", "inclusive", "exclusive")
+                    )
+            # commands is kept, so that its id is not reused
+            self._replays[id(commands)] = (commands, self.now - start, delta)
+        return stop
+
+    # ------------------------- waiting ------------------------------------
+
+    @no_exception_wrapping
+    def wait_for(self, getfunc, target, threshold=0.1, **kwargs) -> None:
+        """advance to the time the respective ramp reaches the target"""
+        quantity = getattr(getfunc, "__name__", "").replace("_get", "")
+        if quantity in self.ramps:
+            self._advance_to(
+                self.ramps[quantity].reaching(target, self.now, tolerance=threshold)
+            )
+
+    @no_exception_wrapping
+    def wait_settled(
+        self,
+        quantity: str,
+        target: float,
+        getfunc,
+        approach: bool = False,
+        ramp_time: float = 0.0,
+        timeout: float = None,
+    ) -> bool:
+        """advance to the time the ramp reaches the target,
+        plus the settle window if it needs to be settled
+
+        ramp_time and timeout are not needed, the modelled ramp
+        determines the time
+        """
+        criteria = self.settling.criteria_for(quantity, target)
+        self._advance_to(
+            self.ramps[quantity].reaching(target, self.now, criteria["approach"])
+        )
+        if not approach:
+            self._advance(self.settling.criteria[quantity]["window"])
+        return True
+
+    def execute_scan_time(
+        self, time_total: float, Nsteps: int, SpacingCode: str, commands: list, **kwargs
+    ) -> None:
+        """a scan with time_total 0 would run until stopped, run it once"""
+        if np.isclose(time_total, 0):
+            self._warn("scan_time with time_total 0 runs until stopped, counted once")
+            self._execute_scan_point(0, 0, commands)
+            return
+        super().execute_scan_time(
+            time_total=time_total,
+            Nsteps=Nsteps,
+            SpacingCode=SpacingCode,
+            commands=commands,
+            **kwargs,
+        )
+
+    # ------------------------- others -------------------------------------
+
+    def execute_beep(self, length: float, frequency: float, **kwargs) -> None:
+        self._advance(length)
+
+    def execute_python_single(self, file: str, **kwargs) -> None:
+        self._warn(f"python script {file} is not executed")
+        self._advance(self.durations["python"])
+
+    def _execute_sequence_message(self, message_direct: str = "", **kwargs) -> None:
+        self.message_to_user(f"sequence message: {message_direct}")
+        self._advance(self.durations["message"])
+
+    def message_to_user(self, message: str) -> None:
+        self.report.messages.append((self.elapsed, message))
+
+    # ------------------------- temperature --------------------------------
+
+    def setTemperature(self, temperature: float) -> None:
+        ramp = self.ramps["Temp"]
+        ramp.ramp(self.now, (temperature, self._rate("Temp")))
+        self.stable["Temp"] = ramp.end + self.durations["settle_Temp"]
+        self._record("Temp", temperature)
+
+    def getTemperature(self) -> float:
+        return self.ramps["Temp"].value(self.now)
+
+    def checkStable_Temp(
+        self,
+        temp: float,
+        direction: int = 0,
+        ApproachMode: str = "Sweep",
+        timeout=0,
+        **kwargs,
+    ) -> bool:
+        ramp = self.ramps["Temp"]
+        tolerance = self.thresholds_waiting["Temp"]
+        if ApproachMode == "Sweep":
+            reached = ramp.reaching(temp, self.now, tolerance)
+        elif abs(temp - ramp.target) <= tolerance:
+            reached = max(ramp.end, self.stable["Temp"])
+        else:
+            reached = ramp.reaching(temp, self.now, tolerance)
+        if timeout:
+            return reached <= self.now + timeout
+        self._advance_to(reached)
+        return True
+
+    def scan_T_programSweep(
+        self, start: float, end: float, SweepRate: float, **kwargs
+    ) -> None:
+        ramp = self.ramps["Temp"]
+        ramp.ramp(self.now, (start, self.rates["Temp"] / 60))
+        ramp.delay(self.durations["settle_Temp"])
+        ramp.extend(end, SweepRate / 60)
+        self.stable["Temp"] = ramp.end
+        self._record("Temp", end, mode=f"Sweep {SweepRate} K/min")
+
+    # ------------------------- field --------------------------------------
+
+    def setField(self, field: float, EndMode: str = None) -> None:
+        ramp = self.ramps["Field"]
+        ramp.ramp(self.now, (field, self._rate("Field")))
+        if EndMode == "persistent":
+            ramp.delay(self.durations["persistent_switch"])
+        self.stable["Field"] = ramp.end + self.durations["settle_Field"]
+        self._record("Field", field, mode=EndMode)
+
+    def setFieldEndMode(self, EndMode: str) -> bool:
+        if EndMode == "persistent":
+            self._advance_to(self.ramps["Field"].end)
+            self._advance(self.durations["persistent_switch"])
+        self._record("EndMode", EndMode)
+        return True
+
+    def getField(self) -> float:
+        return self.ramps["Field"].value(self.now)
+
+    def checkField(
+        self, field: float, direction: int = 0, ApproachMode: str = "Sweep"
+    ) -> bool:
+        self._advance_to(
+            self.ramps["Field"].reaching(
+                field, self.now, self.thresholds_waiting["Field"]
+            )
+        )
+        return True
+
+    def scan_H_programSweep(
+        self, start: float, end: float, SweepRate: float, EndMode: str, **kwargs
+    ) -> None:
+        self.ramps["Field"].ramp(
+            self.now,
+            (start, self.rates["Field"] / 60),
+            (end, SweepRate / 60),
+        )
+        self._record("Field", end, mode=f"Sweep {SweepRate} T/min, {EndMode}")
+
+    # ------------------------- position -----------------------------------
+
+    def setPosition(self, position: float, speedindex: int) -> None:
+        self.ramps["Position"].ramp(
+            self.now, (position, self._position_rate(speedindex))
+        )
+        self._record("Position", position, mode=f"speedindex {speedindex}")
+
+    def getPosition(self) -> float:
+        return self.ramps["Position"].value(self.now)
+
+    def checkPosition(
+        self, position: float, direction: int = 0, ApproachMode: str = "Sweep"
+    ) -> bool:
+        self._advance_to(
+            self.ramps["Position"].reaching(
+                position, self.now, self.thresholds_waiting["Position"]
+            )
+        )
+        return True
+
+    def scan_P_programSweep(
+        self, start: float, end: float, speedindex: int, **kwargs
+    ) -> None:
+        rate = self._position_rate(speedindex)
+        self.ramps["Position"].ramp(
+            self.now, (start, self._position_rate(0)), (end, rate)
+        )
+        self._record("Position", end, mode=f"Sweep speedindex {speedindex}")
+
+    # ------------------------- chamber ------------------------------------
+
+    def getChamber(self):
+        return self._setpoint_chamber
+
+    def chamber_purge(self) -> bool:
+        self._record("Chamber", "purge")
+        self._advance(self.durations["chamber_purge"])
+        return True
+
+    def chamber_vent(self) -> bool:
+        self._record("Chamber", "vent")
+        self._advance(self.durations["chamber_vent"])
+        return True
+
+    def chamber_seal(self) -> bool:
+        self._record("Chamber", "seal")
+        self._advance(self.durations["chamber_seal"])
+        return True
+
+    def chamber_continuous(self, action) -> bool:
+        self._record("Chamber", action)
+        self._advance(self.durations["chamber_continuous"])
+        return True
+
+    def chamber_high_vacuum(self) -> bool:
+        self._record("Chamber", "high vacuum")
+        self._advance(self.durations["chamber_high_vacuum"])
+        return True
+
+    # ------------------------- measuring ----------------------------------
+
+    def res_measure(self, dataflags: dict, bridge_conf: dict) -> dict:
+        self._advance(self.durations["reading"])
+        return {}
+
+    def measuring_store_data(self, data: dict, datafile: str) -> None:
+        self._advance(self.durations["store"])
+
+    def res_datafilecomment(self, comment: str, datafile: str) -> None:
+        self._advance(self.durations["store"])
+
+    def res_change_datafile(self, datafile: str, mode: str) -> None:
+        self._advance(self.durations["store"])
+
+    def Shutdown(self) -> None:
+        self._record("Shutdown", None)
@@ -0,0 +1,118 @@
+"""Module containing the immutable containers for parsed sequences
+
+a parsed sequence can be large, and is handed between the editor, the
+models and the Sequence_runner (across threads). Instead of deep-copying it
+at every handoff, it is frozen once and then passed by reference:
+
+    FrozenSequence: tuple of entries
+    FrozenEntry: dict which cannot be changed, nested 'commands' are
+        FrozenSequences themselves
+
+The rule is: a frozen sequence is never changed by anyone, so it can be
+shared freely (deepcopy returns the very same object). Whoever needs to
+change it calls thaw(), which returns a private mutable copy (lists and
+dicts), and freezes that again before handing it on.
+
+Both containers are subclasses of tuple and dict respectively, so that
+json, pickle, and the Sequence_runner (entry["typ"], **entry) work with
+them just as with the plain parsed data.
+
+Classes:
+    FrozenEntry: immutable dict
+    FrozenSequence: immutable list of entries
+
+Functions:
+    freeze: frozen version of a sequence (no copy if it is frozen already)
+    thaw: mutable deep copy of a (frozen) sequence
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import logging
+from collections.abc import Sequence
+
+logger = logging.getLogger("measureSequences.frozen")
+logger.addHandler(logging.NullHandler())
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError(
+        f"{self.__class__.__name__} cannot be changed, use thaw() for a mutable copy"
+    )
+
+
+class FrozenEntry(dict):
+    """dict which cannot be changed after its creation"""
+
+    __slots__ = ()
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __ior__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+class FrozenSequence(tuple):
+    """tuple of FrozenEntries, equal to lists with the same entries"""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrozenSequence(tuple.__getitem__(self, index))
+        return tuple.__getitem__(self, index)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(obj):
+    """return a frozen version of obj
+
+    lists/tuples become FrozenSequences, dicts FrozenEntries (recursively),
+    anything else is returned as it is. Already frozen objects are
+    returned without copying them.
+    """
+    if isinstance(obj, (FrozenSequence, FrozenEntry)):
+        return obj
+    if isinstance(obj, (list, tuple)):
+        return FrozenSequence([freeze(item) for item in obj])
+    if isinstance(obj, dict):
+        return FrozenEntry({key: freeze(value) for key, value in obj.items()})
+    return obj
+
+
+def thaw(obj):
+    """return a mutable deep copy of obj (lists and dicts)"""
+    if isinstance(obj, Sequence) and not isinstance(obj, (str, bytes)):
+        return [thaw(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: thaw(value) for key, value in obj.items()}
+    return obj
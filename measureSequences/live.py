@@ -0,0 +1,270 @@
+"""Module containing live views of a running sequence
+
+the Sequence_runner executes in its own thread. A PositionPublisher is
+attached to its execution hooks, and keeps the latest execution position
+(command path, scan points, last measured values) in a deque of length
+one: the runner only ever replaces it, a consumer in another thread (e.g.
+the Qt relay in qlive) takes it whenever it wants to update, at its own
+rate. Appending to and popping from a deque are atomic, so neither side
+ever waits for the other, and updates in between are coalesced.
+
+the measured values are published by a LiveDataFeed, decimated to a fixed
+number of min/max buckets per channel, so that a live plot costs the same
+after a few minutes as after days. The full data still goes to
+measuring_store_data.
+
+If no publisher is attached, the runner does not do any of this.
+
+Classes:
+    PositionPublisher: publishes the execution position of a runner
+    MinMaxBuffer: fixed-size min/max decimation of one channel
+    LiveDataFeed: publishes the decimated measured values of a runner
+
+Functions:
+    describe_position: short text describing a published position
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import math
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("measureSequences.live")
+logger.addHandler(logging.NullHandler())
+
+
+class PositionPublisher:
+    """publishes the execution position of a Sequence_runner
+
+    the published position is a dict:
+        path: index on every nesting level of the current command
+        command: the current command (sequence entry)
+        scans: tuple of (path, point, value) of the running scans,
+            outermost first
+        measured: merged values of the last measurement
+        chained: files of the chained sequences being executed,
+            'path' refers to the innermost one
+        length: number of top-level commands of the sequence
+        timestamp: runner.clock.monotonic() of the update
+    """
+
+    _events = ("command_start", "command_end", "scan_iteration")
+
+    def __init__(self, runner):
+        super().__init__()
+        self.runner = runner
+        self._latest = deque(maxlen=1)
+        self._scans = {}
+        self._attached = False
+
+    def attach(self) -> None:
+        """start publishing, by registering with the runner hooks"""
+        if self._attached:
+            return
+        for event in self._events:
+            self.runner.add_hook(event, getattr(self, "_" + event))
+        self._attached = True
+
+    def detach(self) -> None:
+        """stop publishing, the runner is left without any overhead"""
+        if not self._attached:
+            return
+        for event in self._events:
+            self.runner.remove_hook(event, getattr(self, "_" + event))
+        self._attached = False
+        self._scans.clear()
+
+    def take(self):
+        """the latest position if it changed since the last call, else None
+
+        never blocks, may be called from any thread
+        """
+        try:
+            return self._latest.popleft()
+        except IndexError:
+            return None
+
+    def _publish(self, command, path: tuple, timestamp: float) -> None:
+        chained = self.runner.chained_files
+        self._latest.append(
+            dict(
+                path=path,
+                command=command,
+                scans=tuple(
+                    (scan_path, point, value)
+                    for (scan_chained, scan_path), (point, value) in sorted(
+                        self._scans.items(),
+                        key=lambda item: (len(item[0][0]), len(item[0][1])),
+                    )
+                    if scan_chained == chained[: len(scan_chained)]
+                ),
+                measured=self.runner.last_measured,
+                chained=chained,
+                length=len(self.runner.sequence),
+                timestamp=timestamp,
+            )
+        )
+
+    def _command_start(self, command, path, timestamp, **kwargs) -> None:
+        self._publish(command, path, timestamp)
+
+    def _command_end(self, command, path, t_end, **kwargs) -> None:
+        # a scan which ended has no current point anymore
+        self._scans.pop((self.runner.chained_files, path), None)
+        self._publish(command, path, t_end)
+
+    def _scan_iteration(self, command, path, point, value, timestamp, **kwargs):
+        self._scans[(self.runner.chained_files, path)] = (point, value)
+        self._publish(command, path, timestamp)
+
+
+class MinMaxBuffer:
+    """fixed-size min/max decimation of one channel
+
+    every bucket holds the minimum and maximum of 'span' consecutive
+    values, and the x (e.g. time) of its first value. Once all 'size'
+    buckets are filled, neighbouring buckets are merged, and the span
+    doubles: the buffer always covers the whole run, with constant memory.
+    'generation' counts the merges, buckets before a merge are invalid.
+    """
+
+    def __init__(self, size: int = 1000):
+        super().__init__()
+        self.size = size - size % 2
+        self.x = np.empty(self.size)
+        self.low = np.empty(self.size)
+        self.high = np.empty(self.size)
+        self.count = 0
+        self.span = 1
+        self.generation = 0
+        self.partial = None
+        self._partial_count = 0
+
+    def add(self, x: float, y: float) -> None:
+        if self.partial is None:
+            self.partial = [x, y, y]
+            self._partial_count = 0
+        else:
+            self.partial[1] = min(self.partial[1], y)
+            self.partial[2] = max(self.partial[2], y)
+        self._partial_count += 1
+        if self._partial_count < self.span:
+            return
+        if self.count == self.size:
+            self._merge()
+            # the partial bucket is filled up to the doubled span
+            return
+        self.x[self.count], self.low[self.count], self.high[self.count] = self.partial
+        self.count += 1
+        self.partial = None
+
+    def _merge(self) -> None:
+        """merge neighbouring buckets, halving the resolution"""
+        half = self.size // 2
+        self.x[:half] = self.x[0::2]
+        self.low[:half] = np.minimum(self.low[0::2], self.low[1::2])
+        self.high[:half] = np.maximum(self.high[0::2], self.high[1::2])
+        self.count = half
+        self.span *= 2
+        self.generation += 1
+
+    def buckets(self, start: int = 0) -> dict:
+        """copies of the completed buckets from start on, and the partial one"""
+        return dict(
+            x=self.x[start : self.count].copy(),
+            low=self.low[start : self.count].copy(),
+            high=self.high[start : self.count].copy(),
+            partial=None if self.partial is None else tuple(self.partial),
+        )
+
+
+class LiveDataFeed:
+    """publishes the decimated measured values of a Sequence_runner
+
+    every value of the chosen statistic of every measurement is added to
+    the MinMaxBuffer of its channel, with the time of the measurement
+    (runner.clock.time()). take() returns what changed since its last
+    call, per channel: dict(reset, x, low, high, partial)
+        reset: True if the buffer was merged (or not taken yet), x, low
+            and high are then all buckets, and replace earlier ones,
+            otherwise they are the buckets to be appended
+        partial: (x, low, high) of the bucket being filled, or None
+    """
+
+    def __init__(self, runner, size: int = 1000, statistic: str = "mean"):
+        super().__init__()
+        self.runner = runner
+        self.size = size
+        self.statistic = statistic
+        self.buffers = {}
+        # per channel: (generation, number of buckets) already taken
+        self._taken = {}
+        self._changed = set()
+        self._lock = threading.Lock()
+        self._attached = False
+
+    def attach(self) -> None:
+        """start publishing, by registering with the runner hooks"""
+        if not self._attached:
+            self.runner.add_hook("measured", self._measured)
+            self._attached = True
+
+    def detach(self) -> None:
+        """stop publishing, the runner is left without any overhead"""
+        if self._attached:
+            self.runner.remove_hook("measured", self._measured)
+            self._attached = False
+
+    def _measured(self, data: dict, timestamp: float, **kwargs) -> None:
+        values = data.get(self.statistic, {})
+        with self._lock:
+            for channel, value in values.items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                if not math.isfinite(value):
+                    continue
+                try:
+                    buffer = self.buffers[channel]
+                except KeyError:
+                    buffer = self.buffers[channel] = MinMaxBuffer(self.size)
+                buffer.add(timestamp, value)
+                self._changed.add(channel)
+
+    def take(self):
+        """the changes per channel since the last call, None if there are none
+
+        may be called from any thread
+        """
+        with self._lock:
+            if not self._changed:
+                return None
+            deltas = {}
+            for channel in self._changed:
+                buffer = self.buffers[channel]
+                generation, taken = self._taken.get(channel, (None, 0))
+                reset = generation != buffer.generation
+                deltas[channel] = buffer.buckets(0 if reset else taken)
+                deltas[channel]["reset"] = reset
+                self._taken[channel] = (buffer.generation, buffer.count)
+            self._changed.clear()
+        return deltas
+
+
+def describe_position(position: dict) -> str:
+    """short text describing a published position, e.g. for a title bar"""
+    path = position["path"]
+    text = "command {}/{}".format(path[0] + 1, position["length"])
+    if position["chained"]:
+        text = "{} in {}".format(
+            ".".join(str(index + 1) for index in path), position["chained"][-1]
+        )
+    for _, point, value in position["scans"]:
+        text += ", point {} ({:g})".format(point + 1, value)
+    return text
@@ -0,0 +1,205 @@
+"""Module containing timing metrics for the Sequence_runner
+
+Classes:
+    Histogram: cumulative latency histogram with fixed buckets
+    RunnerMetrics: call counts and latency histograms for executed commands
+        and instrument hooks, plus the total time spent in phases like
+        waiting, settling, measuring and storing
+    MetricsExporter: thread which periodically writes the metrics to a file,
+        either in the Prometheus text format or as JSON
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import os
+import time
+import json
+import threading
+import logging
+from bisect import bisect_left
+
+logger = logging.getLogger("measureSequences.metrics")
+logger.addHandler(logging.NullHandler())
+
+# bucket upper bounds in seconds
+BUCKETS_DEFAULT = (
+    1e-4,
+    1e-3,
+    1e-2,
+    0.1,
+    1.0,
+    10.0,
+    60.0,
+    600.0,
+    3600.0,
+    float("inf"),
+)
+
+# which phase the time spent in an instrument hook is attributed to
+HOOK_PHASES = dict(
+    checkStable_Temp="settling",
+    checkField="settling",
+    checkPosition="settling",
+    res_measure="measuring",
+    measuring_store_data="storing",
+    res_datafilecomment="storing",
+)
+
+
+class Histogram:
+    """latency histogram, counts are kept per bucket (not cumulative)"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: tuple = BUCKETS_DEFAULT):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return dict(
+            count=self.count,
+            sum=self.sum,
+            buckets=dict(zip((_format_bound(b) for b in self.buckets), cumulative)),
+        )
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class RunnerMetrics:
+    """Thread-safe collection of timing metrics of a Sequence_runner
+
+    commands: per command type ('typ' of a sequence entry)
+    hooks: per instrument hook (e.g. 'setTemperature', 'res_measure')
+    phases: total seconds spent waiting, settling, measuring, storing
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS_DEFAULT, clock=time.perf_counter):
+        super().__init__()
+        self.buckets = buckets
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """discard all collected metrics"""
+        with self._lock:
+            self._commands = {}
+            self._hooks = {}
+            self._phases = dict(waiting=0.0, settling=0.0, measuring=0.0, storing=0.0)
+
+    def observe_command(self, typ: str, duration: float) -> None:
+        """record the execution of one sequence command"""
+        with self._lock:
+            try:
+                histogram = self._commands[typ]
+            except KeyError:
+                histogram = self._commands[typ] = Histogram(self.buckets)
+            histogram.observe(duration)
+
+    def observe_hook(self, name: str, duration: float) -> None:
+        """record one call to an instrument hook"""
+        phase = HOOK_PHASES.get(name)
+        with self._lock:
+            try:
+                histogram = self._hooks[name]
+            except KeyError:
+                histogram = self._hooks[name] = Histogram(self.buckets)
+            histogram.observe(duration)
+            if phase is not None:
+                self._phases[phase] += duration
+
+    def add_phase(self, phase: str, duration: float) -> None:
+        """add time spent in a certain phase"""
+        with self._lock:
+            self._phases[phase] = self._phases.get(phase, 0.0) + duration
+
+    def snapshot(self) -> dict:
+        """return all metrics as a (json-serialisable) dict"""
+        with self._lock:
+            return dict(
+                commands={k: v.to_dict() for k, v in self._commands.items()},
+                hooks={k: v.to_dict() for k, v in self._hooks.items()},
+                phases=dict(self._phases),
+            )
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self, prefix: str = "measureSequences") -> str:
+        """render the metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for kind, label in (("commands", "command"), ("hooks", "hook")):
+            name = f"{prefix}_{label}_duration_seconds"
+            lines.append(f"# HELP {name} duration of executed {kind}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in snapshot[kind].items():
+                for bound, count in histogram["buckets"].items():
+                    lines.append(
+                        f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'{name}_sum{{{label}="{key}"}} {histogram["sum"]}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {histogram["count"]}')
+        name = f"{prefix}_phase_seconds_total"
+        lines.append(f"# HELP {name} time spent in the respective phase")
+        lines.append(f"# TYPE {name} counter")
+        for phase, duration in snapshot["phases"].items():
+            lines.append(f'{name}{{phase="{phase}"}} {duration}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename: str) -> None:
+        """write the metrics to a file, as JSON if it ends with '.json',
+        in the Prometheus text format otherwise
+
+        the file is replaced atomically, readers never see a partial file
+        """
+        if filename.endswith(".json"):
+            text = self.to_json()
+        else:
+            text = self.to_prometheus()
+        with open(filename + ".tmp", "w") as output:
+            output.write(text)
+        os.replace(filename + ".tmp", filename)
+
+
+class MetricsExporter(threading.Thread):
+    """periodically write RunnerMetrics to a file, until stopped"""
+
+    def __init__(self, metrics: RunnerMetrics, filename: str, interval: float = 60):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.filename = filename
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.export()
+
+    def export(self) -> None:
+        try:
+            self.metrics.write(self.filename)
+        except OSError as e:
+            logger.error(f"could not write metrics to {self.filename}: {e}")
+
+    def stop(self) -> None:
+        """stop the periodic export, write the final state once more"""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.export()
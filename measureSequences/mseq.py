@@ -0,0 +1,365 @@
+"""Module containing the binary file format for parsed sequences (.mseq)
+
+a parsed sequence is a list of command dicts, holding numbers, strings,
+booleans, nested dicts (e.g. dataflags), lists of dicts (bridge_conf,
+the commands of scans) and lists of numbers. The format stores these
+structures in flat, typed tables, which can be memory-mapped and decoded
+lazily, one command at a time:
+
+    header: magic b"MSEQ", version (uint16), number of sections (uint16),
+        index of the top-level list (uint32),
+        then (offset, size in bytes) for every section (uint64 each)
+    sections, all little-endian, in this order:
+        string_offsets  uint64, start of every string (plus the end)
+        strings         utf-8 encoded text of all distinct strings
+        floats          float64
+        ints            int64
+        fields          (key: string index uint32, tag uint8, value uint32)
+        items           (tag uint8, value uint32)
+        dicts           (first field uint32, count uint32)
+        lists           (first item/float uint32, count uint32)
+
+every value is given by a tag and a value: the index into the table of
+its type (strings, floats, ints, dicts, lists), or nothing for None and
+booleans. The fields of a dict, and the items of a list are contiguous,
+so the commands of a scan are found by their offset in the items table.
+Lists which only hold floats are stored as ranges of the floats table.
+Repeated values (e.g. the dataflags of every measurement) are stored once.
+
+Files of a higher version than VERSION are refused. Readers are supposed
+to accept files with additional sections (appended after the known ones).
+
+Functions:
+    dump: write a sequence to a file
+    load: read a sequence from a file, lazily (memory-mapped) or completely
+
+Classes:
+    MappedSequence: list of a memory-mapped file, decoded on access
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import os
+import mmap
+import struct
+import logging
+from collections.abc import Sequence
+
+import numpy as np
+
+from .frozen import FrozenEntry
+from .frozen import FrozenSequence
+
+logger = logging.getLogger("measureSequences.mseq")
+logger.addHandler(logging.NullHandler())
+
+
+MAGIC = b"MSEQ"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHI")
+_SECTION = struct.Struct("<QQ")
+
+# value tags
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STRING = 5
+_DICT = 6
+_LIST = 7
+_FLOATS = 8
+
+_SECTIONS = (
+    ("string_offsets", np.dtype("<u8")),
+    ("strings", np.dtype("u1")),
+    ("floats", np.dtype("<f8")),
+    ("ints", np.dtype("<i8")),
+    ("fields", np.dtype([("key", "<u4"), ("tag", "u1"), ("value", "<u4")])),
+    ("items", np.dtype([("tag", "u1"), ("value", "<u4")])),
+    ("dicts", np.dtype([("first", "<u4"), ("count", "<u4")])),
+    ("lists", np.dtype([("first", "<u4"), ("count", "<u4")])),
+)
+
+
+class _Encoder:
+    """collects the tables of a sequence"""
+
+    def __init__(self):
+        super().__init__()
+        # (tag, value) of everything already stored, by content
+        self.stored = {}
+        self.string_index = {}
+        self.strings = []
+        self.floats = []
+        self.ints = []
+        self.fields = []
+        self.items = []
+        self.dicts = []
+        self.lists = []
+
+    def string(self, text: str) -> int:
+        try:
+            return self.string_index[text]
+        except KeyError:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+            return index
+
+    def value(self, obj) -> (int, int):
+        """tag and value of obj, adding it to the tables"""
+        # the common types first, without conversions
+        cls = type(obj)
+        if cls is str:
+            return _STRING, self.string(obj)
+        if cls is float and obj:
+            try:
+                return self.stored[(_FLOAT, obj)]
+            except KeyError:
+                return self.store((_FLOAT, obj), self.floats, obj)
+        if cls is bool:
+            return (_TRUE if obj else _FALSE), 0
+
+        if obj is None:
+            return _NONE, 0
+        if isinstance(obj, (bool, np.bool_)):
+            return (_TRUE if obj else _FALSE), 0
+        if isinstance(obj, (int, np.integer)):
+            return self.store((_INT, int(obj)), self.ints, int(obj))
+        if isinstance(obj, (float, np.floating)):
+            # 0.0 == -0.0, both are kept
+            key = (_FLOAT, float(obj)) if obj else (_FLOAT, repr(float(obj)))
+            return self.store(key, self.floats, float(obj))
+        if isinstance(obj, str):
+            return _STRING, self.string(obj)
+        if isinstance(obj, dict):
+            string, value = self.string, self.value
+            fields = tuple((string(key),) + value(item) for key, item in obj.items())
+            return self.store((_DICT, fields), self.dicts, self.fields, fields)
+        if isinstance(obj, Sequence):
+            if obj and all(isinstance(item, (float, np.floating)) for item in obj):
+                numbers = tuple(float(item) for item in obj)
+                return self.store((_FLOATS, numbers), self.lists, self.floats, numbers)
+            return _LIST, self.list(obj)
+        raise TypeError(f"cannot store {obj!r} ({type(obj).__name__})")
+
+    def list(self, obj) -> int:
+        """store a list as items (never as floats), return its index"""
+        items = tuple(self.value(item) for item in obj)
+        return self.store((_LIST, items), self.lists, self.items, items)[1]
+
+    def store(self, key: tuple, table: list, *contents) -> (int, int):
+        """store a value, unless the same one is stored already
+
+        contents: the value for the table, or the list the elements
+            go to, and the elements, for a range in table
+        returns: tag and index
+        """
+        try:
+            return self.stored[key]
+        except KeyError:
+            pass
+        if len(contents) == 1:
+            table.append(contents[0])
+        else:
+            elements, new = contents
+            table.append((len(elements), len(new)))
+            elements.extend(new)
+        self.stored[key] = key[0], len(table) - 1
+        return self.stored[key]
+
+    def sections(self) -> list:
+        encoded = [text.encode("utf-8") for text in self.strings]
+        string_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(text) for text in encoded], out=string_offsets[1:])
+        tables = dict(
+            string_offsets=string_offsets,
+            strings=np.frombuffer(b"".join(encoded), dtype="u1"),
+            floats=self.floats,
+            ints=self.ints,
+            fields=self.fields,
+            items=self.items,
+            dicts=self.dicts,
+            lists=self.lists,
+        )
+        return [
+            np.array(tables[name], dtype=dtype).tobytes() for name, dtype in _SECTIONS
+        ]
+
+
+def dump(sequence: list, path: str) -> None:
+    """write a (parsed, possibly frozen) sequence to the file at path
+
+    the file is replaced atomically
+    """
+    encoder = _Encoder()
+    root = encoder.list(sequence)
+    sections = encoder.sections()
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for data in sections:
+        offset += -offset % 8  # aligned for the numeric tables
+        directory.append((offset, len(data)))
+        offset += len(data)
+
+    with open(path + ".tmp", "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(sections), root))
+        for entry in directory:
+            f.write(_SECTION.pack(*entry))
+        for (offset, _), data in zip(directory, sections):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+class _MappedFile:
+    """the tables of a .mseq file, as views on the mapped (or read) file"""
+
+    def __init__(self, path: str, lazy: bool = True):
+        super().__init__()
+        with open(path, "rb") as f:
+            if lazy:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.buffer = f.read()
+        try:
+            magic, version, count, self.root = _HEADER.unpack_from(self.buffer, 0)
+        except struct.error:
+            magic = None
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sequence file (.mseq)")
+        if version > VERSION:
+            raise ValueError(
+                f"{path} has format version {version}, "
+                + f"only versions up to {VERSION} are supported"
+            )
+        if count < len(_SECTIONS):
+            raise ValueError(f"{path} is incomplete, {count} sections")
+        for ct, (name, dtype) in enumerate(_SECTIONS):
+            offset, size = _SECTION.unpack_from(
+                self.buffer, _HEADER.size + ct * _SECTION.size
+            )
+            table = np.frombuffer(
+                self.buffer, dtype=dtype, count=size // dtype.itemsize, offset=offset
+            )
+            setattr(self, name, table if lazy else table.tolist())
+        self._strings = {}
+        # decoded dicts and lists: they are immutable, and stored only
+        # once in the file, so they are decoded only once as well
+        self._decoded = {}
+
+    def string(self, index: int) -> str:
+        try:
+            return self._strings[index]
+        except KeyError:
+            start, end = self.string_offsets[index : index + 2]
+            text = self._strings[index] = bytes(
+                self.strings[int(start) : int(end)]
+            ).decode("utf-8")
+            return text
+
+    def value(self, tag: int, value: int, lazy: bool):
+        if tag == _STRING:
+            return self.string(value)
+        if tag == _FLOAT:
+            return float(self.floats[value])
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            return int(self.ints[value])
+        try:
+            return self._decoded[tag, value]
+        except KeyError:
+            pass
+        if tag == _DICT:
+            decoded = self.dict(value, lazy)
+        elif tag == _LIST:
+            decoded = MappedSequence(self, value) if lazy else self.list(value)
+        elif tag == _FLOATS:
+            first, count = self.lists[value]
+            decoded = FrozenSequence(
+                float(number) for number in self.floats[first : first + count]
+            )
+        else:
+            raise ValueError(f"unknown tag {tag}")
+        self._decoded[tag, value] = decoded
+        return decoded
+
+    def dict(self, index: int, lazy: bool) -> FrozenEntry:
+        first, count = self.dicts[index]
+        fields = self.fields[first : first + count]
+        if lazy:
+            fields = fields.tolist()
+        return FrozenEntry(
+            {
+                self.string(key): self.value(tag, value, lazy)
+                for key, tag, value in fields
+            }
+        )
+
+    def list(self, index: int) -> FrozenSequence:
+        first, count = self.lists[index]
+        return FrozenSequence(
+            [
+                self.value(tag, value, False)
+                for tag, value in self.items[first : first + count]
+            ]
+        )
+
+
+class MappedSequence(Sequence):
+    """list of a memory-mapped .mseq file, its items are decoded on access
+
+    the commands of scans are MappedSequences themselves. Decoded
+    entries are FrozenEntries, use frozen.thaw() for a mutable copy.
+    """
+
+    def __init__(self, mapped: _MappedFile, index: int):
+        super().__init__()
+        self._mapped = mapped
+        self._first, self._count = (int(x) for x in mapped.lists[index])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrozenSequence(self[ct] for ct in range(self._count)[index])
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("MappedSequence index out of range")
+        tag, value = self._mapped.items[self._first + index].tolist()
+        return self._mapped.value(tag, value, True)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, MappedSequence)):
+            return len(self) == len(other) and all(
+                mine == theirs for mine, theirs in zip(self, other)
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<MappedSequence of {self._count} items>"
+
+
+def load(path: str, lazy: bool = True):
+    """read a sequence from a .mseq file
+
+    lazy: memory-map the file, and return a MappedSequence, which decodes
+        commands only when they are accessed (opening is instantaneous),
+        otherwise read and decode everything into a FrozenSequence
+    """
+    mapped = _MappedFile(path, lazy=lazy)
+    if lazy:
+        return MappedSequence(mapped, mapped.root)
+    return mapped.list(mapped.root)
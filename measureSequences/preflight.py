@@ -0,0 +1,492 @@
+"""Module containing the pre-flight check of parsed sequences
+
+before a sequence is run (which may take days), it is checked whether
+the runner will be able to execute it from start to end:
+    every command type is known and its parameters match the
+        signature of the respective execute-method
+    parameters are valid (number of steps, spacing codes, approach modes)
+    every instrument hook needed by the sequence is implemented
+    chained sequences can be parsed (and do not chain themselves)
+    python scripts to be executed exist
+In addition, the number of setpoints and instrument operations is
+reported per command type
+
+Functions:
+    check_sequence: check a sequence for a certain runner
+
+Classes:
+    PreflightReport: the result of a check
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import os
+import inspect
+import logging
+
+from .Sequence_parsing import Sequence_parser
+from .approach import APPROACH_SETTINGS_DEFAULT
+from .adaptive import AdaptiveGrid
+from .conditions import compile_condition
+
+logger = logging.getLogger("measureSequences.preflight")
+logger.addHandler(logging.NullHandler())
+
+
+# spacing codes implemented by the scans
+SPACINGCODES = dict(
+    scan_T=("uniform", "1/T", "logT"),
+    scan_H=("uniform", "H*H", "logH", "1/H", "H^1/2"),
+    scan_time=("uniform", "ln(t)"),
+)
+
+# approach modes implemented by the scans and set-commands
+APPROACHMODES = dict(
+    scan_T=("Fast", "No O'Shoot", "Sweep"),
+    scan_H=("Linear", "No O'Shoot", "Sweep"),
+    scan_position=("Pause", "Sweep"),
+    set_T=("Fast", "No O'Shoot"),
+    set_Field=("Fast", "Linear", "No O'Shoot"),
+)
+
+CHAMBER_HOOKS = {
+    "seal immediate": ("chamber_seal",),
+    "purge then seal": ("chamber_purge", "chamber_seal"),
+    "vent then seal": ("chamber_vent", "chamber_seal"),
+    "pump continuous": ("chamber_continuous",),
+    "vent continuous": ("chamber_continuous",),
+    "high vacuum": ("chamber_high_vacuum",),
+}
+
+
+class PreflightReport:
+    """result of the pre-flight check of a sequence
+
+    errors: list of (path, message), the sequence cannot be run properly
+    warnings: list of (path, message)
+    operations: per command type: dict(commands=number of executions,
+        setpoints=number of setpoints sent to instruments,
+        operations=number of instrument operations)
+    hooks_required: set of instrument hooks the sequence needs
+    hooks_missing: set of those required hooks which are not implemented
+
+    paths are tuples, starting with the names of the (chained) sequence files
+    followed by the index on every nesting level
+    numbers of executions are multiplied by the number of points of
+    all enclosing scans
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+        self.warnings = []
+        self.operations = {}
+        self.hooks_required = set()
+        self.hooks_missing = set()
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def error(self, path: tuple, message: str) -> None:
+        self.errors.append((path, message))
+
+    def warning(self, path: tuple, message: str) -> None:
+        self.warnings.append((path, message))
+
+    def count(self, typ: str, commands: int, setpoints: int, operations: int) -> None:
+        counts = self.operations.setdefault(
+            typ, dict(commands=0, setpoints=0, operations=0)
+        )
+        counts["commands"] += commands
+        counts["setpoints"] += setpoints
+        counts["operations"] += operations
+
+    def summary(self) -> str:
+        """human readable summary of the report"""
+        lines = []
+        for path, message in self.errors:
+            lines.append(f"ERROR   {_format_path(path)}: {message}")
+        for path, message in self.warnings:
+            lines.append(f"WARNING {_format_path(path)}: {message}")
+        if self.hooks_missing:
+            lines.append(
+                "not implemented hooks: {}".format(
+                    ", ".join(sorted(self.hooks_missing))
+                )
+            )
+        for typ, counts in sorted(self.operations.items()):
+            lines.append(
+                "{}: {commands} commands, {setpoints} setpoints, {operations} instrument operations".format(
+                    typ, **counts
+                )
+            )
+        return "\n".join(lines)
+
+
+def _format_path(path: tuple) -> str:
+    return "/".join(str(p) for p in path)
+
+
+def _signature(runner, name: str):
+    """signature of a method of the runner (instance or class) without self"""
+    signature = inspect.signature(getattr(runner, name))
+    if isinstance(runner, type):
+        parameters = list(signature.parameters.values())[1:]
+        signature = signature.replace(parameters=parameters)
+    return signature
+
+
+def _is_implemented(runner, name: str) -> bool:
+    method = getattr(runner, name, None)
+    return method is not None and not getattr(method, "abstract_hook", False)
+
+
+class _Checker:
+    """walks through a sequence, filling a PreflightReport"""
+
+    def __init__(self, runner, report: PreflightReport):
+        super().__init__()
+        self.runner = runner
+        self.report = report
+        self.signatures = {}
+
+    def approach_substeps(self, quantity: str) -> int:
+        """maximum number of sub-steps per point in "No O'Shoot" mode"""
+        planner = getattr(self.runner, "approach_planner", None)
+        settings = planner.settings if planner else APPROACH_SETTINGS_DEFAULT
+        return settings[quantity]["max_steps"]
+
+    def require(self, *hooks) -> None:
+        self.report.hooks_required.update(hooks)
+
+    def check_parameters(self, path: tuple, method: str, *args, **kwargs) -> bool:
+        try:
+            signature = self.signatures[method]
+        except KeyError:
+            signature = self.signatures[method] = _signature(self.runner, method)
+        try:
+            signature.bind(*args, **kwargs)
+        except TypeError as e:
+            self.report.error(path, f"parameters do not match {method}: {e}")
+            return False
+        return True
+
+    def check_choice(self, path: tuple, entry: dict, parameter: str, choices) -> bool:
+        value = entry.get(parameter)
+        if value == "Oscillate":
+            self.report.error(path, f"{entry['typ']}: {value} is not implemented")
+            return False
+        if value not in choices:
+            self.report.error(path, f"{entry['typ']}: unknown {parameter} {value!r}")
+            return False
+        return True
+
+    def check_steps(self, path: tuple, entry: dict) -> int:
+        """return the number of points of a scan, 0 if invalid"""
+        try:
+            Nsteps = int(entry["Nsteps"])
+        except (KeyError, TypeError, ValueError):
+            # missing parameters are reported by check_parameters
+            return 0
+        if Nsteps < 2:
+            self.report.error(path, f"{entry['typ']}: Nsteps must be >= 2!")
+            return 0
+        return Nsteps
+
+    def check_adaptive(self, path: tuple, entry: dict) -> int:
+        """return the maximum number of points inserted by an adaptive scan"""
+        adaptive = entry.get("adaptive")
+        if not adaptive:
+            return 0
+        if entry.get("ApproachMode") == "Sweep":
+            self.report.error(
+                path, f"{entry['typ']}: Sweeps cannot go back to refine adaptively!"
+            )
+            return 0
+        try:
+            inspect.signature(AdaptiveGrid).bind((), **adaptive)
+        except TypeError as e:
+            self.report.error(path, f"{entry['typ']}: invalid adaptive settings: {e}")
+            return 0
+        budget = adaptive.get("budget", 10)
+        min_spacing = adaptive.get("min_spacing", 0)
+        if not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in (budget, min_spacing)
+        ):
+            self.report.error(
+                path,
+                f"{entry['typ']}: adaptive budget and min_spacing must be numbers!",
+            )
+            return 0
+        if budget < 0 or min_spacing < 0:
+            self.report.error(
+                path, f"{entry['typ']}: adaptive budget and min_spacing must be >= 0!"
+            )
+            return 0
+        return int(budget)
+
+    def check_stop_conditions(self, path: tuple, entry: dict) -> None:
+        if not entry["typ"].startswith("scan_"):
+            self.report.warning(
+                path, f"{entry['typ']}: stop_conditions only apply to scans"
+            )
+        for expression in entry["stop_conditions"]:
+            try:
+                compile_condition(expression)
+            except SyntaxError as e:
+                self.report.error(
+                    path, f"{entry['typ']}: invalid stop condition {expression!r}: {e}"
+                )
+
+    def walk(self, commands: list, path: tuple, multiplier: int, chain: tuple) -> None:
+        for index, entry in enumerate(commands):
+            self.check_entry(entry, path + (index,), multiplier, chain)
+
+    def check_entry(self, entry: dict, path: tuple, m: int, chain: tuple) -> None:
+        report = self.report
+        try:
+            typ = entry["typ"]
+        except (KeyError, TypeError):
+            report.error(path, f"command without a type: {entry!r}")
+            return
+
+        if typ == "EOS":
+            return
+        if typ == "Shutdown":
+            self.require("Shutdown")
+            report.count(typ, m, 0, m)
+            return
+        if typ == "remark":
+            self.require("message_to_user")
+            self.check_parameters(path, "execute_remark", entry.get("text"))
+            report.count(typ, m, 0, 0)
+            return
+        if typ not in self.runner.command_methods:
+            report.error(path, f"unknown command type {typ!r}")
+            return
+        method = self.runner.command_methods[typ]
+        if method is None:
+            report.warning(path, f"{typ} is not implemented, it will be skipped")
+            return
+        if not self.check_parameters(path, method, **entry):
+            return
+        if entry.get("stop_conditions"):
+            self.check_stop_conditions(path, entry)
+
+        checker = getattr(self, "check_" + typ.replace(" ", "_"), None)
+        if checker is None:
+            report.count(typ, m, 0, 0)
+        else:
+            checker(entry, path, m, chain)
+
+    # ------------------------- scans --------------------------------------
+
+    def check_scan_T(self, entry, path, m, chain):
+        points = self.check_steps(path, entry)
+        if not entry.get("temperatures_forced"):
+            self.check_choice(path, entry, "SpacingCode", SPACINGCODES["scan_T"])
+        else:
+            points = len(entry["temperatures_forced"])
+        points += self.check_adaptive(path, entry)
+        if not self.check_choice(path, entry, "ApproachMode", APPROACHMODES["scan_T"]):
+            return
+        mode = entry["ApproachMode"]
+        if mode == "Sweep":
+            self.require("scan_T_programSweep", "checkStable_Temp")
+            self.report.count("scan_T", m, m, m + 2 * m * points)
+        elif mode == "Fast":
+            self.require("setTemperature", "checkStable_Temp")
+            self.report.count("scan_T", m, m * points, 2 * m * points)
+        else:
+            self.require("setTemperature", "getTemperature", "checkStable_Temp")
+            setpoints = m * points * self.approach_substeps("Temp")
+            self.report.count("scan_T", m, setpoints, 2 * setpoints + m * points)
+        self.walk(entry.get("commands", []), path, m * max(points, 1), chain)
+
+    def check_scan_H(self, entry, path, m, chain):
+        points = self.check_steps(path, entry)
+        points += self.check_adaptive(path, entry)
+        self.check_choice(path, entry, "SpacingCode", SPACINGCODES["scan_H"])
+        if not self.check_choice(path, entry, "ApproachMode", APPROACHMODES["scan_H"]):
+            return
+        mode = entry["ApproachMode"]
+        self.require("setFieldEndMode")
+        if mode == "Sweep":
+            self.require("scan_H_programSweep", "checkField")
+            self.report.count("scan_H", m, m, 2 * m + m * points)
+        elif mode == "Linear":
+            self.require("setField")
+            self.report.count("scan_H", m, m * points, m * points + m)
+        else:
+            self.require("setField", "getField")
+            setpoints = m * points * self.approach_substeps("Field")
+            self.report.count("scan_H", m, setpoints, 2 * setpoints + m)
+        self.walk(entry.get("commands", []), path, m * max(points, 1), chain)
+
+    def check_scan_position(self, entry, path, m, chain):
+        points = self.check_steps(path, entry)
+        if not self.check_choice(
+            path, entry, "ApproachMode", APPROACHMODES["scan_position"]
+        ):
+            return
+        if entry["ApproachMode"] == "Sweep":
+            self.require("scan_P_programSweep", "checkPosition")
+            self.report.count("scan_position", m, m, m + m * points)
+        else:
+            self.require("setPosition", "getPosition")
+            self.report.count("scan_position", m, m * points, 2 * m * points)
+        self.walk(entry.get("commands", []), path, m * max(points, 1), chain)
+
+    def check_scan_time(self, entry, path, m, chain):
+        points = self.check_steps(path, entry)
+        self.check_choice(path, entry, "SpacingCode", SPACINGCODES["scan_time"])
+        if entry.get("time_total") == 0:
+            self.report.warning(
+                path, "scan_time with time_total 0 repeats until stopped"
+            )
+            points = 1
+        else:
+            points = max(points - 1, 0)
+        self.report.count("scan_time", m, 0, 0)
+        self.walk(entry.get("commands", []), path, m * points, chain)
+
+    # ------------------------- set commands -------------------------------
+
+    def check_set_T(self, entry, path, m, chain):
+        if not self.check_choice(path, entry, "ApproachMode", APPROACHMODES["set_T"]):
+            return
+        if entry["ApproachMode"] == "Fast":
+            self.require("setTemperature")
+            self.report.count("set_T", m, m, m)
+        else:
+            self.require("setTemperature", "checkStable_Temp", "getTemperature")
+            setpoints = 2 * m * self.approach_substeps("Temp")
+            self.report.count("set_T", m, setpoints, 2 * setpoints + 3 * m)
+
+    def check_set_Field(self, entry, path, m, chain):
+        if not self.check_choice(
+            path, entry, "ApproachMode", APPROACHMODES["set_Field"]
+        ):
+            return
+        if entry["ApproachMode"] in ("Fast", "Linear"):
+            self.require("setField")
+            self.report.count("set_Field", m, m, m)
+        else:
+            self.require("setField", "getField", "setFieldEndMode")
+            setpoints = 2 * m * self.approach_substeps("Field")
+            self.report.count("set_Field", m, setpoints, 2 * setpoints + 2 * m)
+
+    def check_set_P(self, entry, path, m, chain):
+        if entry.get("Mode") != "move to position":
+            self.report.error(path, f"Mode {entry.get('Mode')!r} is not implemented")
+            return
+        self.require("setPosition")
+        self.report.count(entry["typ"], m, m, m)
+
+    check_set_Position = check_set_P
+
+    # ------------------------- others -------------------------------------
+
+    def check_Wait(self, entry, path, m, chain):
+        hooks = dict(
+            Temp="checkStable_Temp",
+            Field="getField",
+            Position="getPosition",
+            Chamber="getChamber",
+        )
+        needed = [hook for flag, hook in hooks.items() if entry.get(flag)]
+        self.require(*needed)
+        self.report.count("Wait", m, 0, m * len(needed))
+
+    def check_chamber_operation(self, entry, path, m, chain):
+        try:
+            hooks = CHAMBER_HOOKS[entry["operation"]]
+        except KeyError:
+            self.report.error(
+                path, f"unknown chamber operation {entry.get('operation')!r}"
+            )
+            return
+        self.require(*hooks)
+        self.report.count("chamber_operation", m, m, m * len(hooks))
+
+    def check_res_measure(self, entry, path, m, chain):
+        self.require("res_measure", "measuring_store_data")
+        try:
+            readings = int(entry["reading_count"])
+        except (TypeError, ValueError):
+            self.report.error(path, "res_measure: invalid reading_count")
+            return
+        if readings < 1:
+            self.report.error(path, "res_measure: reading_count must be >= 1")
+        self.report.count("res_measure", m, 0, m * (readings + 1))
+
+    def check_res_datafilecomment(self, entry, path, m, chain):
+        self.require("res_datafilecomment")
+        self.report.count("res_datafilecomment", m, 0, m)
+
+    def check_res_change_datafile(self, entry, path, m, chain):
+        self.require("res_change_datafile")
+        self.report.count("res_change_datafile", m, 0, m)
+
+    def check_sequence_message(self, entry, path, m, chain):
+        self.require("message_to_user")
+        self.report.count("sequence_message", m, 0, 0)
+
+    def check_beep(self, entry, path, m, chain):
+        self.report.count("beep", m, 0, 0)
+
+    def check_exec_python(self, entry, path, m, chain):
+        default_path = getattr(self.runner, "python_default_path", None)
+        if isinstance(default_path, str):
+            if not os.path.isfile(default_path + entry["file"]):
+                self.report.error(path, f"python file not found: {entry['file']}")
+        self.report.count("exec python", m, 0, 0)
+
+    def check_exec_python_multiple(self, entry, path, m, chain):
+        self.report.count("exec python multiple", m, 0, 0)
+        self.walk(entry.get("commands", []), path, m, chain)
+
+    def check_chain_sequence(self, entry, path, m, chain):
+        self.report.count("chain sequence", m, 0, 0)
+        # the runner strips the last character (the line break)
+        sequence_file = entry["new_file_seq"][:-1]
+        if sequence_file in chain:
+            self.report.error(path, f"sequence chains itself: {sequence_file}")
+            return
+        try:
+            commands = Sequence_parser(sequence_file=sequence_file).data
+        except Exception as e:
+            self.report.error(path, f"chained sequence {sequence_file}: {e!r}")
+            return
+        self.walk(commands, (sequence_file,), m, chain + (sequence_file,))
+
+
+def check_sequence(
+    runner, sequence: list = None, sequence_file: str = ""
+) -> PreflightReport:
+    """check whether the runner is able to execute the sequence
+
+    runner: Sequence_runner (sub-)class or instance,
+        for instances, injected hooks are recognised as implemented,
+        and the existence of python files is checked
+    sequence: parsed sequence, defaults to runner.sequence
+    sequence_file: the file the sequence was read from, to detect
+        the sequence chaining itself
+
+    returns PreflightReport
+    """
+    if sequence is None:
+        sequence = runner.sequence
+    report = PreflightReport()
+    checker = _Checker(runner, report)
+    root = (sequence_file,) if sequence_file else ()
+    checker.walk(sequence, root, 1, root)
+    report.hooks_missing = {
+        hook for hook in report.hooks_required if not _is_implemented(runner, hook)
+    }
+    for hook in sorted(report.hooks_missing):
+        report.error((), f"{hook} is needed, but was not overridden/injected")
+    return report
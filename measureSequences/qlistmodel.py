@@ -2,17 +2,17 @@ from PyQt5 import QtWidgets
 
 # , QtCore, uic
 import sys
-from copy import deepcopy
 
-# import numpy as np
+import numpy as np
+
 # from pickle import dumps, load, loads
-from PyQt5.QtCore import QTimer
 from PyQt5 import QtCore
 
 # import math
 import logging
 
 from .util import ScanningN
+from .frozen import freeze
 
 # needed for the stepsize
 from .util import ScanningSize
@@ -20,7 +20,7 @@ from .util import ScanningSize
 
 class SequenceListModel(QtCore.QAbstractListModel):
 
-    sig_send = QtCore.pyqtSignal(list)
+    sig_send = QtCore.pyqtSignal(object)
 
     def __init__(self, sequence=None, parent=None):
         QtCore.QAbstractListModel.__init__(self, parent)
@@ -29,13 +29,6 @@ class SequenceListModel(QtCore.QAbstractListModel):
 
         # self.countinserted = 0
         # self.root = Node(dict(DisplayText='specialnode', arbdata='weha'))
-        # self.debug_running()
-
-    def debug_running(self):
-        try:
-            print(self.__sequence)
-        finally:
-            QTimer.singleShot(2 * 1e3, self.debug_running)
 
     @staticmethod
     def headerData(section, orientation, role):
@@ -80,28 +73,35 @@ class SequenceListModel(QtCore.QAbstractListModel):
     # =====================================================#
 
     def addItem(self, item):
-        parent = QtCore.QModelIndex()
-        # print(item, self.rowCount(), self.__sequence)
-        self.beginInsertRows(parent, self.rowCount(), self.rowCount())
-        self.__sequence.append(item)
+        self.extend([item])
+
+    def extend(self, items):
+        """append several items, with a single ranged insert"""
+        items = list(items)
+        if not items:
+            return
+        first = self.rowCount()
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(items) - 1)
+        self.__sequence.extend(items)
         self.endInsertRows()
-        # print(item, self.rowCount(), self.__sequence)
-        self.dataChanged.emit(parent, parent)
+
+    def set_sequence(self, sequence):
+        """replace all items, with a single model reset"""
+        self.beginResetModel()
+        self.__sequence = list(sequence)
+        self.endResetModel()
 
     def clear_all(self):
-        parent = QtCore.QModelIndex()
-        self.beginRemoveRows(parent, self.rowCount(), self.rowCount())
-        self.__sequence = []
-        self.endRemoveRows()
-        self.dataChanged.emit(parent, parent)
+        self.set_sequence([])
 
     # -------------------  passing to Gui and writing to file --------------
 
     def pass_data(self):
         # print(self.__sequence)
         # important for sequence!
-        self.sig_send.emit(deepcopy(self.__sequence))
-        return deepcopy(self.__sequence)
+        sequence = freeze(self.__sequence)
+        self.sig_send.emit(sequence)
+        return sequence
 
     # ------------------------    drag'n'drop
 
@@ -174,7 +174,7 @@ class SequenceListModel(QtCore.QAbstractListModel):
 
 class ScanListModel(QtCore.QAbstractListModel):
 
-    sig_send = QtCore.pyqtSignal(list)
+    sig_send = QtCore.pyqtSignal(object)
     sig_stepsize = QtCore.pyqtSignal(float)
     sig_Nsteps = QtCore.pyqtSignal(int)
 
@@ -191,61 +191,54 @@ class ScanListModel(QtCore.QAbstractListModel):
         self._logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
 
         self.signalreceiver = signalreceiver
-        self.__sequence = []
+        # the points are held as numpy array, rows are only
+        # rendered in data(), when they are displayed
+        self.__sequence = np.array([], dtype=float)
         self.dic = dict(start=start, end=end, Nsteps=Nsteps, SizeSteps=SizeSteps)
         self.updateData(self.dic)
         self.signalreceiver.sig_updateScanListModel.connect(self.updateData)
 
-        self.dataChanged.emit(QtCore.QModelIndex(), QtCore.QModelIndex())
         # self.countinserted = 0
         # self.root = Node(dict(DisplayText='specialnode', arbdata='weha'))
-        # self.debug_running()
 
     def updateData(self, dic):
         if dic["SizeSteps"]:
-            self.__sequence = self.Build_Scan_Size(
-                dic["start"], dic["end"], dic["SizeSteps"]
-            )
+            sequence = self.Build_Scan_Size(dic["start"], dic["end"], dic["SizeSteps"])
         elif dic["Nsteps"]:
-            self.__sequence = self.Build_Scan_N(dic["start"], dic["end"], dic["Nsteps"])
-        self.debug_running()
+            sequence = self.Build_Scan_N(dic["start"], dic["end"], dic["Nsteps"])
+        else:
+            return
+        self.beginResetModel()
+        self.__sequence = sequence
+        self.endResetModel()
 
     def Build_Scan_N(self, start, end, N):
         seq, stepsize = ScanningN(start, end, N)
         # self.sig_Nsteps.emit(N-1)
-        self.sig_stepsize.emit(deepcopy(stepsize))
-        self.dataChanged.emit(QtCore.QModelIndex(), QtCore.QModelIndex())
+        self.sig_stepsize.emit(stepsize)
         return seq
 
     def Build_Scan_Size(self, start, end, parameter):
         seq, N = ScanningSize(start, end, parameter)
-        self.sig_Nsteps.emit(deepcopy(N))
+        self.sig_Nsteps.emit(N)
         # self.sig_stepsize.emit(stepsize)
-        self.dataChanged.emit(QtCore.QModelIndex(), QtCore.QModelIndex())
         return seq
 
     def pass_data(self):
-        # print(self.__sequence)
         # important for sequence!
-        self.sig_send.emit(deepcopy(self.__sequence))
-        return deepcopy(self.__sequence)
-
-    def debug_running(self):
-        try:
-            print(self.__sequence)
-        finally:
-            pass
-        #     QTimer.singleShot(2*1e3,self.debug_running)
+        sequence = freeze(self.__sequence.tolist())
+        self.sig_send.emit(sequence)
+        return sequence
 
     def data(self, index, role):
         row = index.row()
         if role == QtCore.Qt.EditRole:
-            return self.__sequence[row]
+            return float(self.__sequence[row])
         if role == QtCore.Qt.ToolTipRole:
             return row
         if role == QtCore.Qt.DisplayRole:
-            value = self.__sequence[row]
-            return value
+            # the full value, as it ends up in the sequence
+            return float(self.__sequence[row])
 
     def setData(self, index, value, role=QtCore.Qt.EditRole):
         if role == QtCore.Qt.EditRole:
@@ -0,0 +1,54 @@
+"""Module containing the relay of live updates into the Qt thread
+
+a publisher (see live) is filled by the thread running a sequence. The
+relay takes the latest update from it with a timer, in the Qt thread, and
+emits it as a signal. Updates are thereby coalesced to at most 'rate' per
+second, however fast the sequence runs, and the running thread never
+waits for the GUI.
+
+Classes:
+    LiveRelay: emits the updates of a publisher in the Qt thread
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+from PyQt5 import QtCore
+from PyQt5.QtCore import pyqtSignal
+
+import logging
+
+logger = logging.getLogger("measureSequences.qlive")
+logger.addHandler(logging.NullHandler())
+
+
+class LiveRelay(QtCore.QObject):
+    """emits the updates of a publisher in the Qt thread
+
+    source: object with a non-blocking take(), returning the latest
+        update, or None if there is nothing new (e.g. PositionPublisher,
+        LiveDataFeed)
+    rate: maximum number of updates emitted per second
+    """
+
+    sig_update = pyqtSignal(object)
+
+    def __init__(self, source, rate: float = 10, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(max(int(1000 / rate), 1))
+        self._timer.timeout.connect(self.relay)
+
+    def start(self) -> None:
+        self._timer.start()
+
+    def stop(self) -> None:
+        """stop relaying, after emitting the last update"""
+        self._timer.stop()
+        self.relay()
+
+    def relay(self) -> None:
+        update = self.source.take()
+        if update is not None:
+            self.sig_update.emit(update)
@@ -0,0 +1,234 @@
+"""Module containing a lazily populated tree model of a parsed sequence
+
+the tree follows the nesting of the parsed commands (scans contain their
+commands), instead of encoding it as indentation in a flat list. Rows are
+only created when they are needed: the top level is fetched in batches
+while scrolling, the children of a scan when it is expanded, and the
+displayed text is built when it is drawn. Opening a sequence of any length
+therefore takes constant time, and memory proportional to what was shown.
+
+the command being executed can be marked (set_current), it is highlighted,
+and the scans containing it are shown in bold.
+
+Classes:
+    SequenceTreeModel: QAbstractItemModel over the parsed commands
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+from PyQt5 import QtCore
+from PyQt5 import QtGui
+
+import logging
+
+logger = logging.getLogger("measureSequences.qtreemodel")
+logger.addHandler(logging.NullHandler())
+
+
+class _Node:
+    """a fetched row of the tree, children are created by fetchMore"""
+
+    __slots__ = ("entry", "parent", "row", "children")
+
+    def __init__(self, entry: dict, parent, row: int):
+        self.entry = entry
+        self.parent = parent
+        self.row = row
+        self.children = []
+
+    @property
+    def commands(self) -> list:
+        return self.entry.get("commands") or ()
+
+
+class SequenceTreeModel(QtCore.QAbstractItemModel):
+    """tree model over the parsed sequence (list of command dicts)
+
+    batch: number of rows created per fetchMore
+    """
+
+    current_background = QtGui.QColor(255, 230, 140)
+
+    def __init__(self, sequence: list = None, batch: int = 500, parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self._logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.batch = batch
+        self._root = _Node(dict(commands=[] if sequence is None else sequence), None, 0)
+        self._current = ()
+
+    @property
+    def sequence(self) -> list:
+        return self._root.entry["commands"]
+
+    def set_sequence(self, sequence: list) -> None:
+        """replace the displayed sequence, with a single model reset"""
+        self.beginResetModel()
+        self._root = _Node(dict(commands=sequence), None, 0)
+        self._current = ()
+        self.endResetModel()
+
+    def clear_all(self) -> None:
+        self.set_sequence([])
+
+    def extend(self, commands: list) -> None:
+        """append top-level commands, e.g. while a sequence is being read
+
+        the rows are fetched as usual, only the first batch is filled
+        right away, so that the view shows the beginning of the sequence
+        """
+        sequence = self._root.entry["commands"]
+        if not isinstance(sequence, list):
+            sequence = self._root.entry["commands"] = list(sequence)
+        sequence.extend(commands)
+        if len(self._root.children) < self.batch:
+            self.fetchMore(QtCore.QModelIndex())
+
+    def replace_rows(self, first: int, removed: int, commands: list) -> None:
+        """replace the top-level commands sequence[first:first + removed]
+
+        only fetched rows are removed and inserted, all other rows (and
+        the expanded scans among them) are kept
+        """
+        sequence = self._root.entry["commands"]
+        if not isinstance(sequence, list):
+            sequence = self._root.entry["commands"] = list(sequence)
+        sequence[first : first + removed] = commands
+        children = self._root.children
+        root = QtCore.QModelIndex()
+        last = min(first + removed, len(children)) - 1
+        if first <= last:
+            self.beginRemoveRows(root, first, last)
+            del children[first : last + 1]
+            self.endRemoveRows()
+        if commands and first < len(children):
+            # within the fetched rows, the new ones need to be fetched too
+            self.beginInsertRows(root, first, first + len(commands) - 1)
+            children[first:first] = [
+                _Node(entry, self._root, row)
+                for row, entry in enumerate(commands, start=first)
+            ]
+            self.endInsertRows()
+        for row in range(first, len(children)):
+            children[row].row = row
+
+    def _node(self, index) -> _Node:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def _attached(self, node: _Node) -> bool:
+        """whether node is (still) part of the tree"""
+        while node.parent is not None:
+            siblings = node.parent.children
+            if node.row >= len(siblings) or siblings[node.row] is not node:
+                return False
+            node = node.parent
+        return node is self._root
+
+    def set_current(self, path) -> QtCore.QModelIndex:
+        """mark the command at path (row on every nesting level) as current
+
+        the rows on the way are fetched if necessary, path None (or a path
+        which does not exist) removes the mark
+        returns: the index of the current command (invalid if there is none)
+        """
+        nodes = []
+        node = self._root
+        for row in path or ():
+            while len(node.children) <= row < len(node.commands):
+                self.fetchMore(self._index(node))
+            if not 0 <= row < len(node.children):
+                nodes = []
+                break
+            node = node.children[row]
+            nodes.append(node)
+        previous, self._current = self._current, tuple(nodes)
+        roles = [QtCore.Qt.BackgroundRole, QtCore.Qt.FontRole]
+        for changed in set(previous).symmetric_difference(nodes):
+            if self._attached(changed):
+                index = self._index(changed)
+                self.dataChanged.emit(index, index, roles)
+        return self._index(nodes[-1]) if nodes else QtCore.QModelIndex()
+
+    def _index(self, node: _Node) -> QtCore.QModelIndex:
+        if node is self._root:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    # -------------------  structure -------------------------------------
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is self._root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        return bool(self._node(parent).commands)
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return len(node.children) < len(node.commands)
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        first = len(node.children)
+        last = min(first + self.batch, len(node.commands)) - 1
+        if last < first:
+            return
+        self.beginInsertRows(parent, first, last)
+        node.children.extend(
+            _Node(node.commands[row], node, row) for row in range(first, last + 1)
+        )
+        self.endInsertRows()
+
+    # -------------------  content ---------------------------------------
+
+    def data(self, index, role):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        entry = node.entry
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            # the nesting is shown by the tree, not by indentation
+            return entry.get("DisplayText", entry.get("typ", "")).strip()
+        if role == QtCore.Qt.UserRole:
+            return entry
+        if role == QtCore.Qt.BackgroundRole:
+            if self._current and node is self._current[-1]:
+                return QtGui.QBrush(self.current_background)
+        if role == QtCore.Qt.FontRole:
+            if node in self._current[:-1]:
+                font = QtGui.QFont()
+                font.setBold(True)
+                return font
+        return None
+
+    @staticmethod
+    def headerData(section, orientation, role):
+        if role == QtCore.Qt.DisplayRole:
+            if orientation == QtCore.Qt.Horizontal:
+                return "Sequence"
+            return "{}".format(section + 1)
+        return None
+
+    @staticmethod
+    def flags(index):
+        if not index.isValid():
+            return QtCore.Qt.ItemIsEnabled
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
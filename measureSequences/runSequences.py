@@ -3,10 +3,13 @@
 Classes:
     Sequence_runner
 
+Functions:
+    value_reached: whether a value lies within a threshold of the target
+    mapping_tofunc: values spaced uniformly in a function of the values
+
 Author: bklebel (Benjamin Klebel)
 
 """
-import time
 import threading
 import numpy as np
 
@@ -27,6 +30,20 @@ except ImportError:
 from .Sequence_parsing import Sequence_parser
 from .util import ExceptionHandling
 from .util import BreakCondition
+from .util import handle_exception
+from .util import ExceptionCounters
+from .util import no_exception_wrapping
+from .util import abstract_hook
+from .caching import ReadingCache
+from .caching import SetpointCache
+from .metrics import RunnerMetrics
+from .metrics import MetricsExporter
+from .clock import RealClock
+from .settling import SettleDetector
+from .approach import ApproachPlanner
+from .adaptive import AdaptiveGrid
+from .conditions import StopConditions
+from .preflight import check_sequence
 
 
 # ################## necessary for python measuring scripts  ###################
@@ -46,12 +63,26 @@ class WrappingExceptionHandlingMetaClass(type):
     def __new__(meta, class_name, bases, classDict):
         newClassDict = {}
         for attributeName, attribute in classDict.items():
-            if isinstance(attribute, FunctionType):
+            if isinstance(attribute, FunctionType) and getattr(
+                attribute, "exception_wrapping", True
+            ):
                 attribute = ExceptionHandling(attribute)
             newClassDict[attributeName] = attribute
         return type.__new__(meta, class_name, bases, newClassDict)
 
 
+def value_reached(value, target, threshold: float) -> bool:
+    """check whether a value lies within threshold of the target
+
+    values which cannot be subtracted (e.g. chamber states)
+    need to be equal to the target
+    """
+    try:
+        return abs(value - target) <= threshold
+    except TypeError:
+        return value == target
+
+
 def mapping_tofunc(func, start: float, end: float, Nsteps: int) -> "type(np.array())":
     """Map a function behaviour to an arbitrary Sequence
 
@@ -65,10 +96,10 @@ def mapping_tofunc(func, start: float, end: float, Nsteps: int) -> "type(np.arra
     nbase[0] + ((nbase[-1]-nbase[0])/(cbase[-1]-cbase[0]))*(cbase - cbase[0])
     returns numpy array with the corresponding functional behaviour
     """
-    if Nsteps == 1:
+    if Nsteps < 2:
         raise AssertionError("mapping_tofunc: Nsteps must be >= 2!")
     # make base 'grid'
-    base = np.linspace(1, 100, Nsteps)
+    base = np.linspace(1, 100, int(Nsteps))
     # make calculated base, which represents the respective function
     cbase = func(base)
     # apply the correct mapping to the intended interval
@@ -80,7 +111,40 @@ class Sequence_runner(
     # WrappingExceptionHandlingMetaClass("Sequence_runner_wrapping", (object,), {})
     metaclass=WrappingExceptionHandlingMetaClass,
 ):
-    """docstring for Sequence_runner"""
+    """docstring for Sequence_runner
+
+    with 'preflight_mandatory' (the default), running() checks the
+    sequence beforehand and refuses to run it if the check finds errors,
+    e.g. commands whose hooks or parameters do not fit this runner
+    subclasses which relied on running such sequences anyway
+    need to pass preflight_mandatory=False
+    """
+
+    # methods executing the sequence entries, by their 'typ'
+    # 'Shutdown' and 'remark' are dispatched separately
+    # 'res_scan_excitation' has yet to be implemented!
+    command_methods = {
+        "Wait": "execute_waiting",
+        "beep": "execute_beep",
+        "chain sequence": "execute_chain_sequence",
+        "sequence_message": "_execute_sequence_message",
+        "exec python multiple": "execute_python",
+        "exec python": "execute_python_single",
+        "scan_T": "execute_scan_T",
+        "scan_H": "execute_scan_H",
+        "scan_time": "execute_scan_time",
+        "scan_position": "execute_scan_P",
+        "chamber_operation": "execute_chamber",
+        "set_T": "execute_set_Temperature",
+        "set_Field": "execute_set_Field",
+        "set_P": "execute_set_Position",
+        "set_Position": "execute_set_Position",
+        "res_change_datafile": "execute_res_change_datafile",
+        "res_datafilecomment": "execute_res_datafilecomment",
+        "res_measure": "execute_res_measure",
+        "res_scan_excitation": None,
+        "EOS": None,
+    }
 
     def __init__(
         self,
@@ -90,6 +154,15 @@ class Sequence_runner(
         isPaused=None,
         thresholds_waiting: dict = None,
         python_default_path: str = "",
+        readings_max_age: dict = None,
+        setpoint_tolerances: dict = None,
+        metrics: RunnerMetrics = None,
+        metrics_file: str = None,
+        metrics_interval: float = 60,
+        preflight_mandatory: bool = True,
+        clock=None,
+        settle_criteria: dict = None,
+        approach_settings: dict = None,
         **kwargs,
     ) -> None:
         super().__init__(**kwargs)
@@ -100,15 +173,56 @@ class Sequence_runner(
         self._isPaused = False if isPaused is None else isPaused
         self.sequence = sequence
         self.lock = threading.Lock() if lock is None else lock
+        self.clock = RealClock() if clock is None else clock
         if thresholds_waiting is None:
             self.thresholds_waiting = dict(Temp=0.1, Field=0.1, Position=1)
         else:
             self.thresholds_waiting = thresholds_waiting
+        if readings_max_age is None:
+            # below the shortest poll interval (0.1 s in wait_for), so that
+            # waiting never gets a reading of the previous poll
+            readings_max_age = dict(Temp=0.05, Field=0.05, Position=0.05, Chamber=0.05)
+        self.readings = ReadingCache(
+            max_age=readings_max_age, clock=self.clock.monotonic
+        )
+        if setpoint_tolerances is None:
+            setpoint_tolerances = dict(Temp=0, Field=0, Position=0)
+        self.setpoints = SetpointCache(
+            tolerances=setpoint_tolerances, clock=self.clock.time
+        )
+        if metrics is None:
+            metrics = RunnerMetrics(clock=self.clock.perf_counter)
+        self.metrics = metrics
+        # exceptions handled while running, see util.ExceptionCounters
+        self.exception_counters = ExceptionCounters(
+            clock=self.clock.time, timer=self.metrics.clock
+        )
+        self._entry_duration = 0.0
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.preflight_mandatory = preflight_mandatory
+        self.settling = SettleDetector(
+            criteria=settle_criteria, clock=self.clock.monotonic
+        )
+        self.approach_planner = ApproachPlanner(settings=approach_settings)
 
         # self.mainthread = mainthread
 
         # self.temp_VTI_offset = 5
-        self.subrunner = None
+        # program counter: index of the current entry on every nesting level
+        # of the (chained) sequence currently being executed
+        self._path = []
+        self._entries = []
+        self._chained_files = []
+        # execution hooks, see add_hook()
+        self._hooks = dict(
+            command_start=[],
+            command_end=[],
+            wait_start=[],
+            wait_end=[],
+            scan_iteration=[],
+            measured=[],
+        )
 
         self.datafile = ""
         self.scan_time_force = False
@@ -119,44 +233,99 @@ class Sequence_runner(
         self._setpoint_field = None
         self._setpoint_pos = None
         self._setpoint_field_EndMode = None
+        # merged values of the last execute_res_measure
+        self.last_measured = {}
         self._setpoint_chamber = None
 
     def running(self) -> str:
-        """run the given sequence"""
+        """run the given sequence
+
+        unless disabled by 'preflight_mandatory', the sequence is checked
+        beforehand, and not run at all if it contains errors
+        the exception counters are reset, they count this run only
+        """
+        self.exception_counters.reset()
+
+        if self.preflight_mandatory:
+            report = self.preflight()
+            if not report.ok:
+                self.message_to_user(
+                    "The sequence did not pass the pre-flight check:\n"
+                    + report.summary()
+                )
+                return "Preflight check failed!"
 
+        exporter = None
+        if self.metrics_file:
+            exporter = MetricsExporter(
+                self.metrics, self.metrics_file, interval=self.metrics_interval
+            )
+            exporter.start()
         with self.lock:
             try:
                 self.executing_commands(self.sequence)
             except BreakCondition:
                 return "Sequence Aborted!"
+            finally:
+                if exporter is not None:
+                    exporter.stop()
         return "Sequence Finished!"
 
+    @no_exception_wrapping
+    def preflight(self, sequence: list = None):
+        """check whether this runner can execute the sequence
+
+        returns: PreflightReport, see preflight.check_sequence
+        """
+        report = check_sequence(self, sequence)
+        for path, message in report.errors:
+            self._logger.error(f"preflight: {path}: {message}")
+        for path, message in report.warnings:
+            self._logger.warning(f"preflight: {path}: {message}")
+        return report
+
+    @no_exception_wrapping
     def executing_commands(self, commands: list) -> None:
         """execute all entries of the commands list"""
-        for entry in commands:
-            try:
-                self.execute_sequence_entry(entry)
-            except NotImplementedError as e:
-                self.message_to_user(
-                    f"An error occured: {e}. Did you maybe"
-                    + " try to call a function/method which"
-                    + " needs to be manually overriden?"
-                )
-            # except AttributeError as e:
-            #     self.message_to_user(f'An error occured: {e}. Did you maybe' +
-            #                          ' try to call a function/method which' +
-            #                          ' needs to be manually injected?')
-            # except TypeError as e:
-            #     self.message_to_user(f'An error occured: {e}. Did you maybe' +
-            #                          ' try to call a function/method which' +
-            #                          ' needs to be manually injected?')
-
+        self._path.append(0)
+        self._entries.append(None)
+        try:
+            for index, entry in enumerate(commands):
+                self._path[-1] = index
+                self._entries[-1] = entry
+                try:
+                    self.execute_sequence_entry(entry)
+                except BreakCondition:
+                    raise
+                except NotImplementedError as e:
+                    self.message_to_user(
+                        f"An error occured: {e}. Did you maybe"
+                        + " try to call a function/method which"
+                        + " needs to be manually overriden?"
+                    )
+                except Exception as e:
+                    handle_exception(
+                        self, self.execute_sequence_entry, e, self._entry_duration
+                    )
+                # except AttributeError as e:
+                #     self.message_to_user(f'An error occured: {e}. Did you maybe' +
+                #                          ' try to call a function/method which' +
+                #                          ' needs to be manually injected?')
+                # except TypeError as e:
+                #     self.message_to_user(f'An error occured: {e}. Did you maybe' +
+                #                          ' try to call a function/method which' +
+                #                          ' needs to be manually injected?')
+        finally:
+            self._path.pop()
+            self._entries.pop()
+
+    @no_exception_wrapping
     def check_running(self) -> None:
         """check for the _isRunning flag, raise Exception if
         the Sequence_runner was stopped
         """
         while self._isPaused:
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
             if not self._isRunning:
                 raise BreakCondition
         if not self._isRunning:
@@ -166,72 +335,139 @@ class Sequence_runner(
         """stop the sequence execution by setting self._isRunning to False"""
         self._isRunning = False
         logger.info("Sequence was aborted")
-        if self.subrunner:
-            self.subrunner.stop()
 
     def pause(self) -> None:
         """stop the sequence execution by setting self._isRunning to False"""
         self._isPaused = True
         logger.info("Sequence was paused")
-        if self.subrunner:
-            self.subrunner.pause()
 
     def continue_(self) -> None:
         """stop the sequence execution by setting self._isRunning to False"""
         self._isPaused = False
         logger.info("Sequence was continued")
-        if self.subrunner:
-            self.subrunner.continue_()
 
+    @property
+    def chained_files(self) -> tuple:
+        """files of the chained sequences currently being executed"""
+        return tuple(self._chained_files)
+
+    def readings_snapshot(self) -> dict:
+        """return the most recent instrument readings, with their age
+
+        this does not access any instrument, it is therefore safe to
+        be called from any thread (e.g. for monitoring/GUI purposes)
+        returns: dict, quantity: dict(value=value, age=age in seconds)
+        """
+        return self.readings.snapshot()
+
+    def add_hook(self, event: str, callback) -> None:
+        """register a callback for an execution event
+
+        callbacks are called with keyword arguments only, from the thread
+        executing the sequence, they should therefore return quickly.
+        All timestamps are taken from self.clock.monotonic().
+        events:
+            'command_start': before an entry of a list of commands is executed
+                command, path, index, timestamp
+            'command_end': after an entry was executed (also if it failed)
+                command, path, index, t_start, t_end
+            'wait_start': before waiting (wait_for and execute_waiting)
+                kind, command, path, index, timestamp
+            'wait_end': after waiting
+                kind, command, path, index, t_start, t_end
+            'scan_iteration': before the commands of a scan point are executed
+                command, path, index, point, value, timestamp
+            'measured': after the values of execute_res_measure were stored
+                data, datafile, timestamp (self.clock.time())
+
+        'command' is the sequence entry, 'path' is a tuple with the
+        index on every nesting level (within the current, possibly chained
+        sequence), 'index' the index within the innermost list of commands.
+        For 'scan_iteration', 'command' is the scan, 'point' the index
+        of the scan point and 'value' its setpoint (or time, for time scans)
+        """
+        self._hooks[event].append(callback)
+
+    def remove_hook(self, event: str, callback) -> None:
+        """remove a callback previously registered with add_hook()"""
+        self._hooks[event].remove(callback)
+
+    @no_exception_wrapping
+    def _run_hooks(self, event: str, **kwargs) -> None:
+        """call all callbacks registered for the event"""
+        for callback in tuple(self._hooks[event]):
+            try:
+                callback(**kwargs)
+            except Exception as e:
+                self._logger.error(f"execution hook for {event} failed: {e!r}")
+
+    @no_exception_wrapping
+    def _call_hook(self, name: str, **kwargs):
+        """call the instrument hook 'name', recording its latency"""
+        start = self.metrics.clock()
+        try:
+            return getattr(self, name)(**kwargs)
+        finally:
+            self.metrics.observe_hook(name, self.metrics.clock() - start)
+
+    def invalidate_setpoints(self, *quantities) -> None:
+        """forget the commanded instrument state and cached readings
+
+        to be called after the instruments were changed outside of
+        this runner, e.g. by manual intervention
+        quantities: 'Temp', 'Field', 'EndMode', 'Position'
+            if none are given, everything is invalidated
+        """
+        self.setpoints.invalidate(*quantities)
+        self.readings.invalidate(*quantities)
+
+    @no_exception_wrapping
     def execute_sequence_entry(self, entry: dict) -> None:
         """execute the one entry of a list of commands"""
         self.check_running()
         logger.info(f"executing command: {entry}")
+        hooked = self._hooks["command_start"] or self._hooks["command_end"]
+        if hooked:
+            path = tuple(self._path)
+            t_start = self.clock.monotonic()
+            self._run_hooks(
+                "command_start",
+                command=entry,
+                path=path,
+                index=path[-1],
+                timestamp=t_start,
+            )
+        start = self.metrics.clock()
+        try:
+            self._execute_sequence_entry(entry)
+        finally:
+            # kept for the exception counters, in case the entry failed
+            self._entry_duration = self.metrics.clock() - start
+            self.metrics.observe_command(entry["typ"], self._entry_duration)
+            if hooked:
+                self._run_hooks(
+                    "command_end",
+                    command=entry,
+                    path=path,
+                    index=path[-1],
+                    t_start=t_start,
+                    t_end=self.clock.monotonic(),
+                )
 
-        if entry["typ"] == "Shutdown":
-            self.Shutdown()
-        if entry["typ"] == "Wait":
-            self.execute_waiting(**entry)
-        if entry["typ"] == "beep":
-            self.execute_beep(**entry)
-        if entry["typ"] == "chain sequence":
-            self.execute_chain_sequence(**entry)
-        if entry["typ"] == "remark":
+    @no_exception_wrapping
+    def _execute_sequence_entry(self, entry: dict) -> None:
+        """dispatch one entry of a list of commands to its execute method"""
+
+        typ = entry["typ"]
+        if typ == "Shutdown":
+            self._call_hook("Shutdown")
+            self.invalidate_setpoints()
+        elif typ == "remark":
             self.execute_remark(entry["text"])
-        if entry["typ"] == "sequence_message":
-            self._execute_sequence_message(**entry)
-        if entry["typ"] == "exec python multiple":
-            self.execute_python(**entry)
-        if entry["typ"] == "exec python":
-            self.execute_python_single(**entry)
-
-        if entry["typ"] == "scan_T":
-            self.execute_scan_T(**entry)
-        if entry["typ"] == "scan_H":
-            self.execute_scan_H(**entry)
-        if entry["typ"] == "scan_time":
-            self.execute_scan_time(**entry)
-        if entry["typ"] == "scan_position":
-            self.execute_scan_P(**entry)
-
-        if entry["typ"] == "chamber_operation":
-            self.execute_chamber(**entry)
-        if entry["typ"] == "set_T":
-            self.execute_set_Temperature(**entry)
-        if entry["typ"] == "set_Field":
-            self.execute_set_Field(**entry)
-        if entry["typ"] == "set_Position":
-            self.execute_set_Position(**entry)
-
-        if entry["typ"] == "res_change_datafile":
-            self.execute_res_change_datafile(**entry)
-        if entry["typ"] == "res_datafilecomment":
-            self.execute_res_datafilecomment(**entry)
-        if entry["typ"] == "res_measure":
-            self.execute_res_measure(**entry)
-        if entry["typ"] == "res_scan_excitation":
-            # has yet to be implemented!
-            pass
+        else:
+            method = self.command_methods.get(typ)
+            if method is not None:
+                getattr(self, method)(**entry)
 
     def execute_chamber(self, operation: str, **kwargs) -> None:
         """execute the specified chamber operation"""
@@ -268,37 +504,46 @@ class Sequence_runner(
 
         returns: None
         """
+        hooked = self._hooks["wait_start"] or self._hooks["wait_end"]
+        if hooked:
+            t_start = self._wait_started("execute_waiting")
         if Temp:
-            self.checkStable_Temp(
-                temp=self._setpoint_temp, direction=0, ApproachMode="Fast"
+            self._call_hook(
+                "checkStable_Temp",
+                temp=self._setpoint_temp,
+                direction=0,
+                ApproachMode="Fast",
             )
             # self.wait_for(
             #     target=self._setpoint_temp,
             #     getfunc=self.getTemperature,
             #     threshold=self.thresholds_waiting["Temp"],
             # )
+        # the ramp to the setpoint may take arbitrarily long,
+        # waiting only ends once the value is settled
         if Field:
-            self.wait_for(
-                target=self._setpoint_field,
-                getfunc=self.getField,
-                threshold=self.thresholds_waiting["Field"],
+            self.wait_settled(
+                "Field", target=self._setpoint_field, getfunc=self._getField, timeout=0
             )
         if Position:
-            self.wait_for(
+            self.wait_settled(
+                "Position",
                 target=self._setpoint_pos,
-                getfunc=self.getPosition,
-                threshold=self.thresholds_waiting["Position"],
+                getfunc=self._getPosition,
+                timeout=0,
             )
         if Chamber:
             self.wait_for(
-                target=self._setpoint_chamber, getfunc=self.getChamber, threshold=0
+                target=self._setpoint_chamber, getfunc=self._getChamber, threshold=0
             )
 
-        delay_start = 0
-        delay_step = 0.01
-        while (delay_start < Delay) & self._isRunning:
-            time.sleep(delay_step)
-            delay_start += delay_step
+        start = self.metrics.clock()
+        self.clock.wait_until(
+            self.clock.monotonic() + Delay, keep_waiting=lambda: self._isRunning
+        )
+        self.metrics.add_phase("waiting", self.metrics.clock() - start)
+        if hooked:
+            self._wait_ended("execute_waiting", t_start)
 
     def execute_beep(self, length: float, frequency: float, **kwargs) -> None:
         """beep for a certain time at a certain frequency
@@ -323,6 +568,7 @@ class Sequence_runner(
                 "no easily controllable beep function on mac available"
             )
 
+    @no_exception_wrapping
     def wait_for(
         self, getfunc, target, threshold=0.1, additional_condition=True, **kwargs
     ) -> None:
@@ -334,36 +580,243 @@ class Sequence_runner(
         quite general check, more specific checks are advised, and might
         be introduced at a later time
         """
-        value_now = getfunc()
-
-        while (abs(value_now - target) > threshold) & additional_condition:
-            # check for break condition
-            self.check_running()
-            # check for value
+        hooked = self._hooks["wait_start"] or self._hooks["wait_end"]
+        if hooked:
+            t_start = self._wait_started("wait_for")
+        start = self.metrics.clock()
+        try:
             value_now = getfunc()
-            # sleep
-            time.sleep(0.1)
 
-    def execute_chain_sequence(self, new_file_seq: str, **kwargs) -> None:
-        """execute everything from a specified sequence"""
-
-        print(new_file_seq[:-1])
-        parser = Sequence_parser(sequence_file=new_file_seq[:-1])
-        commands = parser.data
-
-        self.subrunner = self.__class__(
-            sequence=commands,
-            isRunning=self._isRunning,
-            isPaused=self._isPaused,
-            thresholds_waiting=self.thresholds_waiting,
-            lock=threading.Lock(),
+            while (
+                not value_reached(value_now, target, threshold)
+            ) & additional_condition:
+                # check for break condition
+                self.check_running()
+                # check for value
+                value_now = getfunc()
+                # sleep
+                self.clock.sleep(0.1)
+        finally:
+            self.metrics.add_phase("waiting", self.metrics.clock() - start)
+            if hooked:
+                self._wait_ended("wait_for", t_start)
+
+    @no_exception_wrapping
+    def wait_settled(
+        self,
+        quantity: str,
+        target: float,
+        getfunc,
+        approach: bool = False,
+        ramp_time: float = 0.0,
+        timeout: float = None,
+    ) -> bool:
+        """poll getfunc until the quantity is settled at the target
+
+        stability is judged by self.settling (see settling.SettleDetector)
+        from the readings over a sliding window, instead of a fixed delay
+        approach: only wait until the latest reading lies within the
+            approach distance (for intermediate steps of an approach)
+        ramp_time: expected time in seconds to ramp to the target, the
+            timeout only starts counting after it
+        timeout: seconds after the ramp to give up settling, defaults to
+            the timeout of the settling criteria, 0: wait until settled
+        returns: False if the settling timed out, True otherwise
+        """
+        hooked = self._hooks["wait_start"] or self._hooks["wait_end"]
+        if hooked:
+            t_start = self._wait_started("wait_settled")
+        settings = self.settling.criteria[quantity]
+        criteria = self.settling.criteria_for(quantity, target)
+        if timeout is None:
+            timeout = settings["timeout"]
+        start = self.metrics.clock()
+        deadline = self.clock.monotonic() + ramp_time + timeout
+        try:
+            while True:
+                self.check_running()
+                value = getfunc()
+                now = self.clock.monotonic()
+                self.settling.add(quantity, value, now)
+                if approach:
+                    if abs(value - target) <= criteria["approach"]:
+                        return True
+                elif self.settling.settled(quantity, target, now):
+                    return True
+                if timeout and now >= deadline:
+                    self._logger.warning(
+                        f"{quantity} did not settle at {target} within "
+                        + f"{timeout} s after the ramp ({ramp_time} s), "
+                        + "continuing"
+                    )
+                    return False
+                self.clock.sleep(settings["poll"])
+        finally:
+            self.metrics.add_phase("settling", self.metrics.clock() - start)
+            if hooked:
+                self._wait_ended("wait_settled", t_start)
+
+    @no_exception_wrapping
+    def approach(
+        self, quantity: str, target: float, setfunc, getfunc, SweepRate: float = None
+    ) -> None:
+        """approach the target in sub-steps, without overshooting it
+
+        the approach starts from the last setpoint (or, if it is unknown,
+        from the current reading), the sub-steps are planned by
+        self.approach_planner (see approach.ApproachPlanner)
+        intermediate steps only need to be reached, the last one
+        needs to be settled
+        """
+        start, _ = self.setpoints.get(quantity)
+        if start is None:
+            start = getfunc()
+        plan = self.approach_planner.plan(quantity, start, target, rate=SweepRate)
+        self._logger.debug(
+            f"approaching {quantity} {start} -> {target} in {len(plan)} steps, "
+            + f"planned ramp time {plan.ramp_time} s"
         )
+        for step, (t, ramp_time) in enumerate(
+            zip(plan, plan.step_ramp_times()), start=1
+        ):
+            setfunc(t)
+            # the next sub-step is only sent once the ramp reached this one,
+            # the timeout of every step starts after its ramp
+            self.wait_settled(
+                quantity,
+                target=t,
+                getfunc=getfunc,
+                approach=step < len(plan),
+                ramp_time=ramp_time,
+            )
 
-        done = self.subrunner.running()
-        if done == "Aborted":
-            raise BreakCondition
-        if done == "Sequence finished!":
-            self.subrunner = None
+    @no_exception_wrapping
+    def _wait_started(self, kind: str) -> float:
+        """run the wait_start hooks, return the starting timestamp"""
+        t_start = self.clock.monotonic()
+        self._run_hooks(
+            "wait_start",
+            kind=kind,
+            command=self._entries[-1] if self._entries else None,
+            path=tuple(self._path),
+            index=self._path[-1] if self._path else None,
+            timestamp=t_start,
+        )
+        return t_start
+
+    @no_exception_wrapping
+    def _wait_ended(self, kind: str, t_start: float) -> None:
+        """run the wait_end hooks"""
+        self._run_hooks(
+            "wait_end",
+            kind=kind,
+            command=self._entries[-1] if self._entries else None,
+            path=tuple(self._path),
+            index=self._path[-1] if self._path else None,
+            t_start=t_start,
+            t_end=self.clock.monotonic(),
+        )
+
+    @no_exception_wrapping
+    def _execute_scan_point(
+        self, point: int, value, commands: list, conditions: StopConditions = None
+    ) -> bool:
+        """execute the commands for one point of a scan
+
+        conditions: stop conditions, evaluated after the commands, with the
+            values measured by them (none if nothing was measured)
+        returns: True if a stop condition is met, and the scan should end
+        """
+        measured = self.last_measured
+        if self._hooks["scan_iteration"]:
+            self._run_hooks(
+                "scan_iteration",
+                command=self._entries[-1] if self._entries else None,
+                path=tuple(self._path),
+                index=self._path[-1] if self._path else None,
+                point=point,
+                value=value,
+                timestamp=self.clock.monotonic(),
+            )
+        self.executing_commands(commands)
+        if self.last_measured is measured:
+            # a measurement of a previous point must not end this scan
+            measured = {}
+        else:
+            measured = self.last_measured
+        return self._stop_condition_met(conditions, value, measured)
+
+    @no_exception_wrapping
+    def _stop_condition_met(
+        self, conditions: StopConditions, value, measured: dict
+    ) -> bool:
+        """evaluate the stop conditions of a scan after the point at value
+
+        measured: the values measured at this point
+        """
+        if conditions:
+            fired = conditions.check(measured, value)
+            if fired is not None:
+                self._logger.info(
+                    f"stop condition {fired!r} met at {value}, ending the scan"
+                )
+                return True
+        return False
+
+    @no_exception_wrapping
+    def _scan_points(
+        self, quantity: str, values, adaptive: dict = None, sweep: bool = False
+    ):
+        """iterate over the points of a scan
+
+        if adaptive is given, the points are refined by the values measured
+        at every point (see adaptive.AdaptiveGrid), the points which were
+        used are logged at the end
+        sweep: the scan is a Sweep, which cannot go back to refine
+            an interval, adaptive settings are ignored
+        """
+        if adaptive and sweep:
+            self._logger.warning(
+                f"{quantity} Sweeps cannot be refined adaptively, "
+                + "scanning the coarse grid"
+            )
+        if not adaptive or sweep:
+            yield from values
+            return
+        grid = AdaptiveGrid(values, **adaptive)
+        try:
+            for value in grid:
+                measured = self.last_measured
+                yield value
+                if self.last_measured is not measured:
+                    grid.record(value, self.last_measured)
+        finally:
+            self._logger.info(
+                f"adaptive {quantity} scan, {grid.inserted} points inserted, "
+                + f"points used: {grid.used}"
+            )
+
+    def execute_chain_sequence(self, new_file_seq: str, **kwargs) -> None:
+        """execute everything from a specified sequence
+
+        the chained sequence is executed by this very runner, sharing
+        the instruments, datafile, setpoint state and the running/paused
+        state (and thereby cancellation) with the mother-sequence.
+        It only gets its own program counter, which is restored afterwards,
+        so the mother-sequence continues after the chain command
+        """
+        sequence_file = new_file_seq[:-1]
+        self._logger.info(f"chaining sequence: {sequence_file}")
+        parser = Sequence_parser(sequence_file=sequence_file)
+
+        path_mother, entries_mother = self._path, self._entries
+        self._path, self._entries = [], []
+        self._chained_files.append(sequence_file)
+        try:
+            self.executing_commands(parser.data)
+        finally:
+            self._chained_files.pop()
+            self._path, self._entries = path_mother, entries_mother
 
     def execute_python_single(self, file: str, **kwargs) -> None:
         """execute python code directly, changable during runtime
@@ -394,25 +847,33 @@ class Sequence_runner(
         self.executing_commands(commands)
 
     def execute_scan_time(
-        self, time_total: float, Nsteps: int, SpacingCode: str, commands: list, **kwargs
+        self,
+        time_total: float,
+        Nsteps: int,
+        SpacingCode: str,
+        commands: list,
+        stop_conditions: list = None,
+        **kwargs,
     ) -> None:
         """execute a Time scan
-        The intervals t between starting to invoke all commands in the list
-        are:
+        The times t (after starting the scan) at which all commands in the list
+        are invoked are:
         if self.scan_time_force is False:
-            t = max(set interval time, duration of all actions in command list),
-            where 'set interval time' is the time given
+            t = max(set time, end of the previous invocation of the commands),
+            where 'set time' is the time given
                 by the scan_time functionality
 
-            and 'duration of all actions in command list' refers to
-                the time it takes to conduct everything which is defined
-                in the list of commands given
+            i.e. if conducting everything which is defined in the list of
+                commands takes longer than the interval, the next invocation
+                is started right away
         else:
             exactly the set interval times
             However, in this case, all commands are executed in a
                 different thread, to ensure all are correctly started
                 TODO: test whether this actually works
+        stop_conditions: expressions ending the scan, see conditions.py
         """
+        conditions = StopConditions(stop_conditions)
 
         if SpacingCode == "uniform":
             times = mapping_tofunc(lambda x: x, 0, time_total, Nsteps)
@@ -421,24 +882,25 @@ class Sequence_runner(
             times = mapping_tofunc(np.log, 0, time_total, Nsteps)
 
         if np.isclose(time_total, 0):
+            point = 0
             while self._isRunning:
-                self.executing_commands(commands)
+                if self._execute_scan_point(point, 0, commands, conditions):
+                    return
+                point += 1
             self.check_running()
 
         if self.scan_time_force is False:
-            for t in times[1:]:
-                # start timer thread
-                timer = threading.Timer(t, lambda: 0)
-                timer.start()
-
+            time_start = self.clock.monotonic()
+            for point, t in enumerate(times[1:]):
                 # execute command
-                self.executing_commands(commands)
+                if self._execute_scan_point(point, t, commands, conditions):
+                    break
 
-                # join timer thread
-                while timer.isAlive():
-                    self.check_running()
-                    time.sleep(0.01)
-                # timer.join()
+                # wait for the next point to be due
+                self.clock.wait_until(
+                    time_start + t, keep_waiting=lambda: self._isRunning
+                )
+                self.check_running()
         else:
             # Experimental!
             # commands and stuff needs to be threadsafe!
@@ -446,16 +908,22 @@ class Sequence_runner(
             # in one of the commands....
 
             timerlist = []
-            for t in times:
+
+            def execute_point(point, value):
+                if self._execute_scan_point(point, value, commands, conditions):
+                    for x in timerlist:
+                        x.cancel()
+
+            for point, t in enumerate(times):
                 timerlist.append(
-                    threading.Timer(
-                        t, self.executing_commands, kwargs=dict(commands=commands)
+                    self.clock.timer(
+                        t, execute_point, kwargs=dict(point=point, value=t)
                     )
                 )
                 timerlist[-1].start()
 
-            while any(x.isAlive() for x in timerlist):
-                time.sleep(0.5)
+            while any(x.is_alive() for x in timerlist):
+                self.clock.sleep(0.5)
                 try:
                     self.check_running()
                 except BreakCondition:
@@ -474,9 +942,17 @@ class Sequence_runner(
         ApproachMode: str,
         commands: list,
         EndMode: str,
+        adaptive: dict = None,
+        stop_conditions: list = None,
         **kwargs,
     ) -> None:
-        """execute a Field scan"""
+        """execute a Field scan
+
+        adaptive: settings to refine the scan by the measured values,
+            see adaptive.AdaptiveGrid
+        stop_conditions: expressions ending the scan, see conditions.py
+        """
+        conditions = StopConditions(stop_conditions)
 
         if SpacingCode == "uniform":
             fields = mapping_tofunc(lambda x: x, start, end, Nsteps)
@@ -494,35 +970,31 @@ class Sequence_runner(
             fields = mapping_tofunc(lambda x: x ** 0.5, start, end, Nsteps)
 
         if ApproachMode == "Linear":
-            for field in fields:
+            for ct, field in enumerate(self._scan_points("Field", fields, adaptive)):
                 self._setpoint_field = field
                 self._setField(field=field, EndMode=EndMode)
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, field, commands, conditions):
+                    break
 
         if ApproachMode == "No O'Shoot":
-            for ct, field in enumerate(fields):
-                first = fields[0] if ct == 0 else fields[ct - 1]
-                approachFields = mapping_tofunc(
-                    np.log, start=first, end=field, Nsteps=10
+            for ct, field in enumerate(self._scan_points("Field", fields, adaptive)):
+                self.approach(
+                    "Field",
+                    target=field,
+                    setfunc=lambda t: self._setField(field=t, EndMode="driven"),
+                    getfunc=self._getField,
+                    SweepRate=SweepRate,
                 )
-                for t in approachFields:
-                    self._setField(field=t, EndMode="driven")
-                    # self._setpoint_field = t
-                    # self.checkStable_Temp(Temp=t,
-                    #                       direction=np.sign(temp - first),
-                    #                       ApproachMode='Fast')
-
-                    self.execute_waiting(Field=True, Delay=10)
-                # self.checkStable_Temp(
-                # Temp=temp, direction=0, ApproachMode=ApproachMode)
                 # self._setFieldEndMode(EndMode=EndMode)
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, field, commands, conditions):
+                    break
 
         if ApproachMode == "Oscillate":
             raise NotImplementedError("oscillating field ApproachMode")
 
         if ApproachMode == "Sweep":
-            self.scan_H_programSweep(
+            self._call_hook(
+                "scan_H_programSweep",
                 start=start,
                 end=end,
                 Nsteps=Nsteps,
@@ -531,12 +1003,20 @@ class Sequence_runner(
                 SpacingCode=SpacingCode,
                 EndMode=EndMode,
             )
-            for ct, field in enumerate(fields):
-                first = fields[0] if ct == 0 else fields[ct - 1]
-                self.checkField(
-                    field=field, direction=np.sign(field - first), ApproachMode="Sweep"
+            self.setpoints.invalidate("Field", "EndMode")
+            previous = fields[0]
+            for ct, field in enumerate(
+                self._scan_points("Field", fields, adaptive, sweep=True)
+            ):
+                self._call_hook(
+                    "checkField",
+                    field=field,
+                    direction=np.sign(field - previous),
+                    ApproachMode="Sweep",
                 )
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, field, commands, conditions):
+                    break
+                previous = field
 
         self._setFieldEndMode(EndMode=EndMode)
 
@@ -550,9 +1030,17 @@ class Sequence_runner(
         ApproachMode: str,
         commands: list,
         temperatures_forced=None,
+        adaptive: dict = None,
+        stop_conditions: list = None,
         **kwargs,
     ) -> None:
-        """perform a temperature scan with given parameters"""
+        """perform a temperature scan with given parameters
+
+        adaptive: settings to refine the scan by the measured values,
+            see adaptive.AdaptiveGrid
+        stop_conditions: expressions ending the scan, see conditions.py
+        """
+        conditions = StopConditions(stop_conditions)
 
         if temperatures_forced:
             temperatures = temperatures_forced
@@ -569,39 +1057,47 @@ class Sequence_runner(
 
         # approaching very slowly:
         if ApproachMode == "No O'Shoot":
-            for temp in temperatures:
-                approachTemps = mapping_tofunc(
-                    np.log, start=temperatures[0], end=temp, Nsteps=10
+            for ct, temp in enumerate(
+                self._scan_points("Temp", temperatures, adaptive)
+            ):
+                self.approach(
+                    "Temp",
+                    target=temp,
+                    setfunc=self._setTemperature,
+                    getfunc=self._getTemperature,
+                    SweepRate=SweepRate,
+                )
+                self._call_hook(
+                    "checkStable_Temp",
+                    temp=temp,
+                    direction=0,
+                    ApproachMode=ApproachMode,
                 )
-                for t in approachTemps:
-                    self._setTemperature(t)
-                    self.checkStable_Temp(
-                        temp=t,
-                        direction=np.sign(temperatures[-1] - temperatures[0]),
-                        ApproachMode="Fast",
-                    )
-
-                    self.execute_waiting(Temp=True, Delay=10)
-                self.checkStable_Temp(temp=temp, direction=0, ApproachMode=ApproachMode)
 
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, temp, commands, conditions):
+                    break
 
         # approaching rather fast:
         if ApproachMode == "Fast":
-            for temp in temperatures:
+            for ct, temp in enumerate(
+                self._scan_points("Temp", temperatures, adaptive)
+            ):
 
                 self._setTemperature(temp)
-                self.checkStable_Temp(
+                self._call_hook(
+                    "checkStable_Temp",
                     temp=temp,
                     direction=np.sign(temperatures[-1] - temperatures[0]),
                     ApproachMode=ApproachMode,
                 )
 
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, temp, commands, conditions):
+                    break
 
         # sweeping through the values:
         if ApproachMode == "Sweep":
-            self.scan_T_programSweep(
+            self._call_hook(
+                "scan_T_programSweep",
                 start=start,
                 end=end,
                 Nsteps=Nsteps,
@@ -609,28 +1105,35 @@ class Sequence_runner(
                 SweepRate=SweepRate,
                 SpacingCode=SpacingCode,
             )
+            self.setpoints.invalidate("Temp")
+
+            """
+            in case the last temperature has been reached,
+            but additional steps had been scheduled, discard
+            the additional steps (i.e. superfluous cycles)
+            and continue with any next command
+            """
+            conditions.add(
+                lambda namespace: self._call_hook(
+                    "checkStable_Temp",
+                    temp=temperatures[-1],
+                    direction=0,
+                    ApproachMode="Fast",
+                    timeout=0.1,
+                ),
+                name="last temperature reached",
+            )
+            for ct, temp in enumerate(
+                self._scan_points("Temp", temperatures, adaptive, sweep=True)
+            ):
 
-            for temp in temperatures:
-
-                self.checkStable_Temp(
+                self._call_hook(
+                    "checkStable_Temp",
                     temp=temp,
                     direction=np.sign(temperatures[-1] - temperatures[0]),
                     ApproachMode="Sweep",
                 )
-                self.executing_commands(commands)
-
-                """
-                in case the last temperature has been reached,
-                but additional steps had been scheduled, discard
-                the additional steps (i.e. superfluous cycles)
-                and continue with any next command
-                """
-                if self.checkStable_Temp(
-                    temp=temperatures[-1],
-                    direction=0,
-                    ApproachMode="Fast",
-                    timeout=0.1,
-                ):
+                if self._execute_scan_point(ct, temp, commands, conditions):
                     break
 
     def execute_scan_P(
@@ -641,36 +1144,48 @@ class Sequence_runner(
         speedindex: int,
         ApproachMode: str,
         commands: list,
+        stop_conditions: list = None,
         **kwargs,
     ) -> None:
-        """perform a position scan with the given parameters"""
+        """perform a position scan with the given parameters
+
+        stop_conditions: expressions ending the scan, see conditions.py
+        """
+        conditions = StopConditions(stop_conditions)
 
         positions = mapping_tofunc(lambda x: x, start, end, Nsteps)
 
         if ApproachMode == "Pause":
-            for pos in positions:
-                self.setPosition(position=pos, speedindex=speedindex)
+            for ct, pos in enumerate(positions):
+                self._setPosition(position=pos, speedindex=speedindex)
                 self.wait_for(
                     target=pos,
-                    getfunc=self.getPosition,
+                    getfunc=self._getPosition,
                     threshold=self.thresholds_waiting["Position"],
                 )
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, pos, commands, conditions):
+                    break
 
         if ApproachMode == "Sweep":
-            self.scan_P_programSweep(
+            self._call_hook(
+                "scan_P_programSweep",
                 start=start,
                 end=end,
                 Nsteps=Nsteps,
                 positions=positions,
                 speedindex=speedindex,
             )
+            self.setpoints.invalidate("Position")
             for ct, pos in enumerate(positions):
                 first = positions[0] if ct == 0 else positions[ct - 1]
-                self.checkPosition(
-                    position=pos, direction=np.sign(pos - first), ApproachMode="Sweep"
+                self._call_hook(
+                    "checkPosition",
+                    position=pos,
+                    direction=np.sign(pos - first),
+                    ApproachMode="Sweep",
                 )
-                self.executing_commands(commands)
+                if self._execute_scan_point(ct, pos, commands, conditions):
+                    break
 
     def execute_set_Temperature(
         self, Temp: float, ApproachMode: str, SweepRate: float, **kwargs
@@ -688,7 +1203,7 @@ class Sequence_runner(
             self._setTemperature(temperature=Temp)
         elif ApproachMode == "No O'Shoot":
             self.execute_scan_T(
-                start=self.getTemperature(),
+                start=self._getTemperature(),
                 end=Temp,
                 Nsteps=2,
                 SweepRate=SweepRate,
@@ -714,11 +1229,11 @@ class Sequence_runner(
         Nsteps in the SweepRate mode is set to 2, implying
             the current field to be step 1 of 2
         """
-        if ApproachMode == "Fast":
+        if ApproachMode in ("Fast", "Linear"):
             self._setField(field=Field, EndMode=EndMode)
         elif ApproachMode == "No O'Shoot":
             self.execute_scan_H(
-                start=self.getField(),
+                start=self._getField(),
                 end=Field,
                 Nsteps=2,
                 fields=None,
@@ -735,7 +1250,7 @@ class Sequence_runner(
         """execute the set Position command"""
 
         if Mode == "move to position":
-            self.setPosition(position=position, speedindex=speedindex)
+            self._setPosition(position=position, speedindex=speedindex)
 
         if Mode == "move to index and define":
             raise NotImplementedError(
@@ -761,7 +1276,9 @@ class Sequence_runner(
 
         for _ in range(reading_count):
             values_measured.append(
-                self.res_measure(dataflags=dataflags, bridge_conf=bridge_conf)
+                self._call_hook(
+                    "res_measure", dataflags=dataflags, bridge_conf=bridge_conf
+                )
             )
 
         keys_corrupted = []
@@ -785,18 +1302,28 @@ class Sequence_runner(
                 values_merged["median"][key] = np.median(values_transposed[key])
                 values_merged["stddev"][key] = np.std(values_transposed[key])
 
-        self.measuring_store_data(data=values_merged, datafile=self.datafile)
+        self.last_measured = values_merged
+        self._call_hook(
+            "measuring_store_data", data=values_merged, datafile=self.datafile
+        )
+        if self._hooks["measured"]:
+            self._run_hooks(
+                "measured",
+                data=values_merged,
+                datafile=self.datafile,
+                timestamp=self.clock.time(),
+            )
 
     def execute_res_datafilecomment(self, comment: str, **kwargs) -> None:
         """execute the resistivity: datafile-comment command"""
-        self.res_datafilecomment(comment=comment, datafile=self.datafile)
+        self._call_hook("res_datafilecomment", comment=comment, datafile=self.datafile)
 
     def execute_res_change_datafile(
         self, new_file_data: str, mode: str, **kwargs
     ) -> None:
         """execute the resistivity: datafile-comment command"""
         self.datafile = new_file_data
-        self.res_change_datafile(datafile=new_file_data, mode=mode)
+        self._call_hook("res_change_datafile", datafile=new_file_data, mode=mode)
 
     def execute_remark(self, remark: str, **kwargs) -> None:
         """use the given remark
@@ -823,7 +1350,7 @@ class Sequence_runner(
         should be overridden for advanced options!
         """
         self.message_to_user(f"sequence message: {message_type}: {message_direct}")
-        super().execute_sequence_message(
+        self.execute_sequence_message(
             timeout_waiting_min=timeout_waiting_min,
             message_direct=message_direct,
             email_receiver=email_receiver,
@@ -838,6 +1365,7 @@ class Sequence_runner(
         """semi-Abstract Method -- override for email functionality"""
         self._logger.info("Sequence message: {}".format(kwargs))
 
+    @abstract_hook
     def message_to_user(self, message: str) -> None:
         """deliver a message to a user in some way
 
@@ -848,6 +1376,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def scan_T_programSweep(
         self,
         start: float,
@@ -866,6 +1395,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def scan_H_programSweep(
         self,
         start: float,
@@ -885,6 +1415,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def scan_P_programSweep(
         self,
         start: float,
@@ -907,8 +1438,13 @@ class Sequence_runner(
         if EndMode is None:
             EndMode = self._setpoint_field_EndMode
         self._setpoint_field = field
-        self.setField(field=field, EndMode=EndMode)
+        if self.setpoints.is_redundant("Field", field, EndMode):
+            return
+        self._call_hook("setField", field=field, EndMode=EndMode)
+        self.setpoints.commanded("Field", field, EndMode)
+        self.setpoints.commanded("EndMode", EndMode)
 
+    @abstract_hook
     def setField(self, field: float, EndMode: str = None) -> None:
         """
         Abstract Method
@@ -922,9 +1458,16 @@ class Sequence_runner(
     def _setFieldEndMode(self, EndMode: str) -> bool:
 
         self._setpoint_field_EndMode = EndMode
+        if self.setpoints.is_redundant("EndMode", EndMode):
+            return
         # skipcq: PYL-W0235
-        self.setFieldEndMode(EndMode=EndMode)
+        self._call_hook("setFieldEndMode", EndMode=EndMode)
+        self.setpoints.commanded("EndMode", EndMode)
+        field, _ = self.setpoints.get("Field")
+        if field is not None:
+            self.setpoints.commanded("Field", field, EndMode)
 
+    @abstract_hook
     def setFieldEndMode(self, EndMode: str) -> bool:
         """Method to be overridden by a child class
         return bool stating success or failure (optional)
@@ -935,9 +1478,13 @@ class Sequence_runner(
 
     def _setTemperature(self, temperature: float) -> None:
         self._setpoint_temp = temperature
+        if self.setpoints.is_redundant("Temp", temperature):
+            return
         # skipcq: PYL-W0235
-        self.setTemperature(temperature=temperature)
+        self._call_hook("setTemperature", temperature=temperature)
+        self.setpoints.commanded("Temp", temperature)
 
+    @abstract_hook
     def setTemperature(self, temperature: float) -> None:
         """
         Abstract Method
@@ -949,6 +1496,11 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @no_exception_wrapping
+    def _getTemperature(self) -> float:
+        return self.readings.get("Temp", lambda: self._call_hook("getTemperature"))
+
+    @abstract_hook
     def getTemperature(self) -> float:
         """Read the temperature
 
@@ -962,8 +1514,12 @@ class Sequence_runner(
 
     def _setPosition(self, position: float, speedindex: int) -> None:
         self._setpoint_pos = position
-        self.setPosition(position=position, speedindex=speedindex)
+        if self.setpoints.is_redundant("Position", position):
+            return
+        self._call_hook("setPosition", position=position, speedindex=speedindex)
+        self.setpoints.commanded("Position", position)
 
+    @abstract_hook
     def setPosition(self, position: float, speedindex: int) -> None:
         """
         Abstract Method
@@ -975,6 +1531,11 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @no_exception_wrapping
+    def _getPosition(self) -> float:
+        return self.readings.get("Position", lambda: self._call_hook("getPosition"))
+
+    @abstract_hook
     def getPosition(self) -> float:
         """
         Abstract Method
@@ -986,6 +1547,11 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @no_exception_wrapping
+    def _getField(self) -> float:
+        return self.readings.get("Field", lambda: self._call_hook("getField"))
+
+    @abstract_hook
     def getField(self) -> float:
         """Read the Field
 
@@ -997,6 +1563,11 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @no_exception_wrapping
+    def _getChamber(self):
+        return self.readings.get("Chamber", lambda: self._call_hook("getChamber"))
+
+    @abstract_hook
     def getChamber(self):
         """Read the Chamber status
 
@@ -1008,6 +1579,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def checkStable_Temp(
         self,
         temp: float,
@@ -1050,6 +1622,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def checkField(
         self, field: float, direction: int = 0, ApproachMode: str = "Sweep"
     ) -> bool:
@@ -1077,6 +1650,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def checkPosition(
         self, position: float, direction: int = 0, ApproachMode: str = "Sweep"
     ) -> bool:
@@ -1104,6 +1678,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def Shutdown(self) -> None:
         """Shut down instruments to a safe standby-configuration"""
         raise NotImplementedError(
@@ -1116,22 +1691,24 @@ class Sequence_runner(
         must block until the chamber is purged
         """
         self._setpoint_chamber = "purged"
-        self.chamber_purge()
+        self._call_hook("chamber_purge")
 
+    @abstract_hook
     def chamber_purge(self) -> bool:
         raise NotImplementedError(
             "To use this function, it needs to be manually implemented!"
         )
 
-    def chamber_vent(self) -> bool:
+    def _chamber_vent(self) -> bool:
         """vent the chamber
 
         must block until the chamber is vented
         """
         self._setpoint_chamber = "vented"
-        self.chamber_vent()
+        self._call_hook("chamber_vent")
 
-    def _chamber_vent(self) -> bool:
+    @abstract_hook
+    def chamber_vent(self) -> bool:
         raise NotImplementedError(
             "To use this function, it needs to be manually implemented!"
         )
@@ -1142,8 +1719,9 @@ class Sequence_runner(
         must block until the chamber is sealed
         """
         self._setpoint_chamber = "sealed"
-        self.chamber_seal()
+        self._call_hook("chamber_seal")
 
+    @abstract_hook
     def chamber_seal(self) -> bool:
         raise NotImplementedError(
             "To use this function, it needs to be manually implemented!"
@@ -1159,12 +1737,13 @@ class Sequence_runner(
         if action == "pumping":
             self._setpoint_chamber = "continuous pumping"
             # skipcq: PYL-W0235
-            self.chamber_continuous(action=action)
+            self._call_hook("chamber_continuous", action=action)
         if action == "venting":
             self._setpoint_chamber = "continuous venting"
             # skipcq: PYL-W0235
-            self.chamber_continuous(action=action)
+            self._call_hook("chamber_continuous", action=action)
 
+    @abstract_hook
     def chamber_continuous(self, action) -> bool:
         raise NotImplementedError(
             "To use this function, it needs to be manually implemented!"
@@ -1177,13 +1756,15 @@ class Sequence_runner(
         """
         self._setpoint_chamber = "high-vacuum"
         # skipcq: PYL-W0235
-        self.chamber_high_vacuum()
+        self._call_hook("chamber_high_vacuum")
 
+    @abstract_hook
     def chamber_high_vacuum(self) -> bool:
         raise NotImplementedError(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def res_measure(self, dataflags: dict, bridge_conf: dict) -> dict:
         """Measure resistivity
         Must be overridden!
@@ -1194,6 +1775,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def measuring_store_data(self, data: dict, datafile: str) -> None:
         """Store measured data
         Must be overridden!
@@ -1202,6 +1784,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def res_datafilecomment(self, comment: str, datafile: str) -> None:
         """write a comment to the datafile
         Must be overridden!
@@ -1210,6 +1793,7 @@ class Sequence_runner(
             "To use this function, it needs to be manually implemented!"
         )
 
+    @abstract_hook
     def res_change_datafile(self, datafile: str, mode: str) -> None:
         """write a comment to the datafile
         Must be overridden!
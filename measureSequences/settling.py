@@ -0,0 +1,167 @@
+"""Module containing a statistical settle detector
+
+instead of waiting for fixed delays, or comparing a single reading to a
+threshold, recent readings of every quantity are kept in a ring buffer.
+A quantity is settled at a target, if over a sliding window
+    the mean lies within 'distance' of the target
+    the fitted slope is smaller than 'slope' (units per second)
+    the standard deviation around the fit is smaller than 'std'
+the criteria can be configured per quantity, and per range of the target
+
+Classes:
+    SettleDetector: ring buffers and stability criteria per quantity
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger("measureSequences.settling")
+logger.addHandler(logging.NullHandler())
+
+
+# per quantity:
+#   window: length of the sliding window in seconds
+#   min_samples: minimum number of readings within the window
+#   poll: seconds between readings while waiting
+#   timeout: seconds after which waiting is given up (0: never)
+#   ranges: (upper bound of |target|, criteria), sorted by the bound,
+#       criteria: distance, slope (per second), std, and approach: the
+#       distance within which an intermediate (approach) step is reached
+SETTLE_CRITERIA_DEFAULT = dict(
+    Temp=dict(
+        window=30.0,
+        min_samples=5,
+        poll=1.0,
+        timeout=1800.0,
+        ranges=(
+            (10.0, dict(distance=0.01, slope=2e-4, std=5e-3, approach=0.05)),
+            (100.0, dict(distance=0.05, slope=1e-3, std=0.02, approach=0.2)),
+            (float("inf"), dict(distance=0.2, slope=3e-3, std=0.05, approach=0.5)),
+        ),
+    ),
+    Field=dict(
+        window=5.0,
+        min_samples=3,
+        poll=0.5,
+        timeout=600.0,
+        ranges=(
+            (float("inf"), dict(distance=1e-3, slope=1e-4, std=5e-4, approach=5e-3)),
+        ),
+    ),
+    Position=dict(
+        window=2.0,
+        min_samples=3,
+        poll=0.2,
+        timeout=300.0,
+        ranges=((float("inf"), dict(distance=0.5, slope=0.1, std=0.1, approach=1.0)),),
+    ),
+)
+
+
+class SettleDetector:
+    """Thread-safe ring buffers of readings, with stability criteria
+
+    criteria: dict, per quantity overrides of SETTLE_CRITERIA_DEFAULT
+        (keys which are not given are taken from the defaults)
+    maxlen: length of the ring buffer per quantity
+    clock: function returning the current (monotonic) time
+    """
+
+    def __init__(self, criteria: dict = None, maxlen: int = 1000, clock=time.monotonic):
+        super().__init__()
+        self.criteria = {
+            quantity: dict(values)
+            for quantity, values in SETTLE_CRITERIA_DEFAULT.items()
+        }
+        for quantity, values in (criteria or {}).items():
+            self.criteria.setdefault(quantity, {}).update(values)
+        self.maxlen = maxlen
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buffers = {}
+
+    def add(self, quantity: str, value: float, timestamp: float = None) -> None:
+        """store a reading"""
+        if timestamp is None:
+            timestamp = self.clock()
+        with self._lock:
+            try:
+                buffer = self._buffers[quantity]
+            except KeyError:
+                buffer = self._buffers[quantity] = deque(maxlen=self.maxlen)
+            buffer.append((timestamp, value))
+
+    def clear(self, *quantities) -> None:
+        """discard the readings, of all quantities if none is given"""
+        with self._lock:
+            if not quantities:
+                self._buffers.clear()
+            for quantity in quantities:
+                self._buffers.pop(quantity, None)
+
+    def criteria_for(self, quantity: str, target: float) -> dict:
+        """the criteria applicable for a target value of a quantity"""
+        for bound, criteria in self.criteria[quantity]["ranges"]:
+            if abs(target) <= bound:
+                return criteria
+        return self.criteria[quantity]["ranges"][-1][1]
+
+    def status(self, quantity: str, target: float, now: float = None) -> dict:
+        """statistics over the current window
+
+        returns: dict(samples, distance, slope, std, settled, arrived)
+            'arrived': the latest reading is within the approach distance
+        """
+        if now is None:
+            now = self.clock()
+        settings = self.criteria[quantity]
+        criteria = self.criteria_for(quantity, target)
+        start = now - settings["window"]
+        with self._lock:
+            buffer = self._buffers.get(quantity, ())
+            samples = [sample for sample in buffer if sample[0] >= start]
+            covered = bool(buffer) and buffer[0][0] <= start
+        status = dict(
+            samples=len(samples),
+            distance=None,
+            slope=None,
+            std=None,
+            settled=False,
+            arrived=False,
+        )
+        if not samples:
+            return status
+        status["arrived"] = abs(samples[-1][1] - target) <= criteria["approach"]
+        if len(samples) < max(settings["min_samples"], 2):
+            return status
+        times = np.array([sample[0] for sample in samples])
+        values = np.array([sample[1] for sample in samples], dtype=float)
+        # least squares fit of a straight line
+        times = times - times.mean()
+        mean = values.mean()
+        variance = np.dot(times, times)
+        slope = np.dot(times, values - mean) / variance if variance > 0 else 0.0
+        residuals = values - mean - slope * times
+        status["distance"] = abs(mean - target)
+        status["slope"] = abs(slope)
+        status["std"] = residuals.std()
+        status["settled"] = bool(
+            covered
+            and status["distance"] <= criteria["distance"]
+            and status["slope"] <= criteria["slope"]
+            and status["std"] <= criteria["std"]
+        )
+        return status
+
+    def settled(self, quantity: str, target: float, now: float = None) -> bool:
+        return self.status(quantity, target, now)["settled"]
+
+    def arrived(self, quantity: str, target: float, now: float = None) -> bool:
+        return self.status(quantity, target, now)["arrived"]
@@ -0,0 +1,479 @@
+"""Module containing a simulated PPMS backend for the Sequence_runner
+
+in contrast to the Dummy, the instruments are modelled physically:
+    temperature: the controller setpoint ramps with the SweepRate,
+        the sample follows it with a first-order thermal lag
+    field: the magnet ramps with the SweepRate, limited to a maximum rate
+        and field, changing to/from persistent mode takes the switch time
+    position: the rotator moves with a speed given by the speedindex
+    chamber: operations take time, during which the chamber is in a
+        transitional state
+    resistance: synthetic R(T, H) with a superconducting transition,
+        a normal state resistance and gaussian noise from a seeded generator
+everything is driven by the clock of the runner (default: ManualClock),
+runs are therefore reproducible and do not need to take real time
+
+Classes:
+    PPMS_Model: the simulated instruments
+    Sequence_simulator: Sequence_runner using a PPMS_Model
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import logging
+
+import numpy as np
+
+from .runSequences import Sequence_runner
+from .estimator import Ramp
+from .clock import ManualClock
+
+logger = logging.getLogger("measureSequences.simulation")
+logger.addHandler(logging.NullHandler())
+
+
+# transitional and final state and duration in seconds of chamber operations
+# final states correspond to the chamber setpoints of the Sequence_runner
+CHAMBER_OPERATIONS = dict(
+    seal=("sealing", "sealed", 5.0),
+    purge=("purging", "purged", 300.0),
+    vent=("venting", "vented", 60.0),
+    pumping=("continuous pumping", "continuous pumping", 0.0),
+    venting=("continuous venting", "continuous venting", 0.0),
+    high_vacuum=("pumping to high-vacuum", "high-vacuum", 600.0),
+)
+
+
+class PPMS_Model:
+    """simulated PPMS instruments
+
+    all methods take the current time 'now' (in seconds, monotonic),
+    the state is evaluated lazily whenever it is needed
+
+    parameters (all optional):
+        T_initial, H_initial, P_initial: initial temperature, field, position
+        tau: time constant of the thermal lag in seconds
+        T_rate_max: maximum rate of the temperature setpoint in K/min
+        H_rate_max: maximum ramp rate of the magnet in T/min
+        H_max: maximum field in T
+        persistent_switch: time to open/close the persistent switch in s
+        P_speed: rotator speed at speedindex 0 in degree/s, the speed at
+            speedindex n is P_speed / (n + 1)
+        chamber_times: dict, overrides durations in CHAMBER_OPERATIONS
+        Tc0: critical temperature at zero field in K
+        Hc2: upper critical field at zero temperature in T
+        width: width of the superconducting transition in K
+        R0, A, B: normal state resistance R0 + A*T^2 + B*H^2 in Ohm
+        noise: relative standard deviation of the resistance
+        seed: seed of the random generator
+    """
+
+    def __init__(
+        self,
+        T_initial: float = 300.0,
+        H_initial: float = 0.0,
+        P_initial: float = 0.0,
+        tau: float = 60.0,
+        T_rate_max: float = 20.0,
+        H_rate_max: float = 0.6,
+        H_max: float = 9.0,
+        persistent_switch: float = 30.0,
+        P_speed: float = 5.0,
+        chamber_times: dict = None,
+        Tc0: float = 7.2,
+        Hc2: float = 4.0,
+        width: float = 0.1,
+        R0: float = 1.0,
+        A: float = 1e-4,
+        B: float = 1e-2,
+        noise: float = 1e-3,
+        seed: int = 0,
+    ):
+        super().__init__()
+        self.tau = tau
+        self.T_rate_max = T_rate_max
+        self.H_rate_max = H_rate_max
+        self.H_max = H_max
+        self.persistent_switch = persistent_switch
+        self.P_speed = P_speed
+        self.chamber_times = {
+            operation: times[2] for operation, times in CHAMBER_OPERATIONS.items()
+        }
+        self.chamber_times.update(chamber_times or {})
+        self.Tc0 = Tc0
+        self.Hc2 = Hc2
+        self.width = width
+        self.R0 = R0
+        self.A = A
+        self.B = B
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+        self.T_setpoint = Ramp(T_initial, 0.0)
+        self._T = T_initial
+        self._T_time = 0.0
+        self.field = Ramp(H_initial, 0.0)
+        self.persistent = False
+        self.position = Ramp(P_initial, 0.0)
+        self.chamber = ("sealed", "sealed", 0.0)
+
+    # ------------------------- temperature --------------------------------
+
+    def set_temperature(self, now: float, temperature: float, rate: float) -> None:
+        """ramp the setpoint to temperature with rate in K/min"""
+        self._update_temperature(now)
+        self.T_setpoint.ramp(now, (temperature, min(rate, self.T_rate_max) / 60))
+
+    def sweep_temperature(
+        self, now: float, start: float, end: float, rate: float
+    ) -> None:
+        """go to start as fast as possible, then sweep to end with rate"""
+        self._update_temperature(now)
+        self.T_setpoint.ramp(
+            now, (start, self.T_rate_max / 60), (end, min(rate, self.T_rate_max) / 60)
+        )
+
+    def temperature(self, now: float) -> float:
+        self._update_temperature(now)
+        return self._T
+
+    def _update_temperature(self, now: float) -> None:
+        """integrate dT/dt = (setpoint(t) - T) / tau up to now
+
+        on every linear segment of the setpoint, the solution is exact
+        """
+        t = self._T_time
+        if now <= t:
+            return
+        T = self._T
+        setpoint = self.T_setpoint
+        times = [p[0] for p in setpoint.points if t < p[0] < now]
+        for t1 in times + [now]:
+            s0, s1 = setpoint.value(t), setpoint.value(t1)
+            rate = (s1 - s0) / (t1 - t)
+            decay = np.exp(-(t1 - t) / self.tau)
+            T = s1 - rate * self.tau + (T - s0 + rate * self.tau) * decay
+            t = t1
+        self._T, self._T_time = T, now
+
+    # ------------------------- field --------------------------------------
+
+    def set_field(self, now: float, field: float, rate: float, EndMode: str) -> None:
+        """ramp the magnet to field with rate in T/min"""
+        if abs(field) > self.H_max:
+            raise ValueError(f"field {field} T exceeds the maximum of {self.H_max} T")
+        self.field.ramp(now)
+        if self.persistent:
+            self.field.delay(self.persistent_switch)
+        self.field.extend(field, min(rate, self.H_rate_max) / 60)
+        self.persistent = EndMode == "persistent"
+        if self.persistent:
+            self.field.delay(self.persistent_switch)
+
+    def sweep_field(
+        self, now: float, start: float, end: float, rate: float, EndMode: str
+    ) -> None:
+        """go to start with the maximum rate, then sweep to end with rate"""
+        self.set_field(now, start, self.H_rate_max, "driven")
+        self.field.extend(end, min(rate, self.H_rate_max) / 60)
+        self.persistent = EndMode == "persistent"
+        if self.persistent:
+            self.field.delay(self.persistent_switch)
+
+    def set_field_mode(self, now: float, EndMode: str) -> None:
+        persistent = EndMode == "persistent"
+        if persistent != self.persistent:
+            if now > self.field.end:
+                self.field.ramp(now)
+            self.field.delay(self.persistent_switch)
+            self.persistent = persistent
+
+    def magnet(self, now: float) -> float:
+        return self.field.value(now)
+
+    def field_settled(self, now: float) -> float:
+        """time at which the magnet (and the persistent switch) is settled"""
+        return max(self.field.end, now)
+
+    # ------------------------- position -----------------------------------
+
+    def set_position(self, now: float, position: float, speedindex: int) -> None:
+        self.position.ramp(now, (position, self.P_speed / (int(speedindex) + 1)))
+
+    def sweep_position(
+        self, now: float, start: float, end: float, speedindex: int
+    ) -> None:
+        self.position.ramp(
+            now, (start, self.P_speed), (end, self.P_speed / (int(speedindex) + 1))
+        )
+
+    def rotator(self, now: float) -> float:
+        return self.position.value(now)
+
+    # ------------------------- chamber ------------------------------------
+
+    def chamber_operation(self, now: float, operation: str) -> float:
+        """start a chamber operation, return the time it is finished"""
+        transition, final, _ = CHAMBER_OPERATIONS[operation]
+        done = now + self.chamber_times[operation]
+        self.chamber = (transition, final, done)
+        return done
+
+    def chamber_state(self, now: float) -> str:
+        transition, final, done = self.chamber
+        return final if now >= done else transition
+
+    # ------------------------- resistance ---------------------------------
+
+    def resistance(self, T: float, H: float, Tc_offset: float = 0.0) -> float:
+        """synthetic resistance R(T, H) including noise"""
+        Tc = (self.Tc0 + Tc_offset) * max(1 - (abs(H) / self.Hc2) ** 2, 0)
+        R_normal = self.R0 + self.A * T**2 + self.B * H**2
+        R = R_normal * 0.5 * (1 + np.tanh((T - Tc) / self.width))
+        return R * (1 + self.noise * self.rng.standard_normal())
+
+
+class Sequence_simulator(Sequence_runner):
+    """Sequence_runner running on simulated PPMS instruments
+
+    all waiting (for temperatures, fields, positions, chamber operations)
+    is done by polling the model and sleeping on the clock of the runner,
+    exactly as it would be done with real instruments
+
+    model: PPMS_Model, created with default parameters if not given
+    poll_interval: seconds between polling the model while waiting
+    stable_time: seconds the temperature needs to stay within the
+        threshold to be considered stable
+    reading_time: seconds a single reading of res_measure takes
+    rates: dict, rates used if a command does not specify a SweepRate
+        Temp in K/min, Field in T/min
+
+    the stored data is kept in self.data, messages in self.messages
+    """
+
+    def __init__(
+        self,
+        sequence: list,
+        model: PPMS_Model = None,
+        poll_interval: float = 1.0,
+        stable_time: float = 30.0,
+        reading_time: float = 0.5,
+        rates: dict = None,
+        **kwargs,
+    ):
+        if kwargs.get("clock") is None:
+            kwargs["clock"] = ManualClock()
+        super().__init__(sequence=sequence, **kwargs)
+        self.model = PPMS_Model() if model is None else model
+        self.poll_interval = poll_interval
+        self.stable_time = stable_time
+        self.reading_time = reading_time
+        self.rates = dict(Temp=10.0, Field=0.5)
+        self.rates.update(rates or {})
+        self.data = []
+        self.messages = []
+
+    def _rate(self, quantity: str) -> float:
+        """SweepRate of the currently executed command, or the default"""
+        entry = self._entries[-1] if self._entries else None
+        rate = entry.get("SweepRate") if entry is not None else None
+        return rate if rate else self.rates[quantity]
+
+    def _poll(self, condition, timeout: float = 0) -> bool:
+        """sleep on the clock until condition() is True
+
+        timeout: give up after timeout seconds (0: wait forever)
+        returns: whether the condition was met
+        """
+        start = self.clock.monotonic()
+        while not condition():
+            self.check_running()
+            if timeout:
+                remaining = start + timeout - self.clock.monotonic()
+                if remaining <= 0:
+                    return False
+                self.clock.sleep(min(self.poll_interval, remaining))
+            else:
+                self.clock.sleep(self.poll_interval)
+        return True
+
+    def _sleep_until(self, deadline: float) -> None:
+        self.clock.wait_until(deadline, keep_waiting=lambda: self._isRunning)
+        self.check_running()
+
+    @staticmethod
+    def _passed(value: float, target: float, direction, threshold: float) -> bool:
+        """whether value reached target, or passed it in direction"""
+        if direction > 0 and value >= target:
+            return True
+        if direction < 0 and value <= target:
+            return True
+        return abs(value - target) <= threshold
+
+    # ------------------------- temperature --------------------------------
+
+    def setTemperature(self, temperature: float) -> None:
+        self.model.set_temperature(
+            self.clock.monotonic(), temperature, self._rate("Temp")
+        )
+
+    def getTemperature(self) -> float:
+        return self.model.temperature(self.clock.monotonic())
+
+    def checkStable_Temp(
+        self,
+        temp: float,
+        direction: int = 0,
+        ApproachMode: str = "Sweep",
+        timeout=0,
+        **kwargs,
+    ) -> bool:
+        threshold = self.thresholds_waiting["Temp"]
+        if ApproachMode == "Sweep":
+            return self._poll(
+                lambda: self._passed(self.getTemperature(), temp, direction, threshold),
+                timeout=timeout,
+            )
+        if timeout:
+            return self._poll(
+                lambda: abs(self.getTemperature() - temp) <= threshold,
+                timeout=timeout,
+            )
+        within_since = [None]
+
+        def stable():
+            now = self.clock.monotonic()
+            if abs(self.model.temperature(now) - temp) > threshold:
+                within_since[0] = None
+                return False
+            if within_since[0] is None:
+                within_since[0] = now
+            return now - within_since[0] >= self.stable_time
+
+        return self._poll(stable)
+
+    def scan_T_programSweep(
+        self, start: float, end: float, SweepRate: float, **kwargs
+    ) -> None:
+        self.model.set_temperature(self.clock.monotonic(), start, self.model.T_rate_max)
+        # the sweep only starts once the start temperature is stable,
+        # the sample lags behind a running sweep
+        self.checkStable_Temp(temp=start, direction=0, ApproachMode="Fast")
+        self.model.sweep_temperature(self.clock.monotonic(), start, end, SweepRate)
+
+    # ------------------------- field --------------------------------------
+
+    def setField(self, field: float, EndMode: str = None) -> None:
+        self.model.set_field(
+            self.clock.monotonic(), field, self._rate("Field"), EndMode
+        )
+
+    def setFieldEndMode(self, EndMode: str) -> bool:
+        self.model.set_field_mode(self.clock.monotonic(), EndMode)
+        self._sleep_until(self.model.field_settled(self.clock.monotonic()))
+        return True
+
+    def getField(self) -> float:
+        return self.model.magnet(self.clock.monotonic())
+
+    def checkField(
+        self, field: float, direction: int = 0, ApproachMode: str = "Sweep"
+    ) -> bool:
+        threshold = self.thresholds_waiting["Field"]
+        return self._poll(
+            lambda: self._passed(self.getField(), field, direction, threshold)
+        )
+
+    def scan_H_programSweep(
+        self, start: float, end: float, SweepRate: float, EndMode: str, **kwargs
+    ) -> None:
+        self.model.sweep_field(self.clock.monotonic(), start, end, SweepRate, EndMode)
+
+    # ------------------------- position -----------------------------------
+
+    def setPosition(self, position: float, speedindex: int) -> None:
+        self.model.set_position(self.clock.monotonic(), position, speedindex)
+
+    def getPosition(self) -> float:
+        return self.model.rotator(self.clock.monotonic())
+
+    def checkPosition(
+        self, position: float, direction: int = 0, ApproachMode: str = "Sweep"
+    ) -> bool:
+        threshold = self.thresholds_waiting["Position"]
+        return self._poll(
+            lambda: self._passed(self.getPosition(), position, direction, threshold)
+        )
+
+    def scan_P_programSweep(
+        self, start: float, end: float, speedindex: int, **kwargs
+    ) -> None:
+        self.model.sweep_position(self.clock.monotonic(), start, end, speedindex)
+
+    # ------------------------- chamber ------------------------------------
+
+    def getChamber(self) -> str:
+        return self.model.chamber_state(self.clock.monotonic())
+
+    def _chamber(self, operation: str) -> bool:
+        self._sleep_until(
+            self.model.chamber_operation(self.clock.monotonic(), operation)
+        )
+        return True
+
+    def chamber_purge(self) -> bool:
+        return self._chamber("purge")
+
+    def chamber_vent(self) -> bool:
+        return self._chamber("vent")
+
+    def chamber_seal(self) -> bool:
+        return self._chamber("seal")
+
+    def chamber_continuous(self, action) -> bool:
+        return self._chamber(action)
+
+    def chamber_high_vacuum(self) -> bool:
+        return self._chamber("high_vacuum")
+
+    # ------------------------- measuring ----------------------------------
+
+    def res_measure(self, dataflags: dict, bridge_conf: dict) -> dict:
+        self.clock.sleep(self.reading_time)
+        now = self.clock.monotonic()
+        T = self.model.temperature(now)
+        H = self.model.magnet(now)
+        return dict(
+            res1=self.model.resistance(T, H),
+            exc1=10,
+            res2=self.model.resistance(T, H, Tc_offset=-0.5),
+            exc2=10,
+            Temp=T,
+            Field=H,
+            Position=self.model.rotator(now),
+        )
+
+    def measuring_store_data(self, data: dict, datafile: str) -> None:
+        self.data.append(dict(time=self.clock.time(), datafile=datafile, data=data))
+
+    def res_datafilecomment(self, comment: str, datafile: str) -> None:
+        self.data.append(
+            dict(time=self.clock.time(), datafile=datafile, comment=comment)
+        )
+
+    def res_change_datafile(self, datafile: str, mode: str) -> None:
+        pass
+
+    # ------------------------- others -------------------------------------
+
+    def Shutdown(self) -> None:
+        self.setField(field=0, EndMode="driven")
+        self.setTemperature(temperature=300)
+
+    def execute_beep(self, length: float, frequency: float, **kwargs) -> None:
+        self.clock.sleep(length)
+
+    def message_to_user(self, message: str) -> None:
+        self._logger.info(message)
+        self.messages.append((self.clock.time(), message))
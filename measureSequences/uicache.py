@@ -0,0 +1,142 @@
+"""Module containing the cache of compiled Qt Designer .ui files
+
+parsing a .ui file with loadUi interprets its XML every time a window is
+created. Instead, every .ui file is compiled once (with PyQt5.uic) into a
+python module, which is cached and imported from then on. A cached module
+is recompiled whenever its .ui file is newer.
+
+Compiled modules are stored next to the .ui files (in __uicache__), or, if
+that directory is not writable (e.g. an installed package), in the cache
+directory of the user. They can be created ahead of time, e.g. when
+building/installing the package:
+
+    python -m measureSequences.uicache
+
+Functions:
+    ui_file: path of a .ui file in the configurations of this package
+    load_ui: drop-in replacement for PyQt5.uic.loadUi, using the cache
+    compile_all: compile all .ui files of the package
+
+Author: bklebel (Benjamin Klebel)
+
+"""
+
+import os
+import hashlib
+import threading
+import importlib.util
+import logging
+
+import pkg_resources
+from PyQt5 import uic
+
+logger = logging.getLogger("measureSequences.uicache")
+logger.addHandler(logging.NullHandler())
+
+
+CACHE_DIRECTORY_USER = os.path.join(
+    os.path.expanduser("~"), ".cache", "measureSequences", "ui"
+)
+
+_modules = {}
+_lock = threading.Lock()
+
+
+def ui_file(name: str) -> str:
+    """path of a .ui file in the configurations of this package"""
+    return pkg_resources.resource_filename(__name__, "configurations/" + name)
+
+
+def _cache_candidates(ui_path: str) -> list:
+    """paths the compiled module of ui_path may be stored at, by preference"""
+    directory, name = os.path.split(ui_path)
+    stem = os.path.splitext(name)[0]
+    digest = hashlib.sha1(ui_path.encode()).hexdigest()[:10]
+    return [
+        os.path.join(directory, "__uicache__", stem + ".py"),
+        os.path.join(CACHE_DIRECTORY_USER, f"{stem}_{digest}.py"),
+    ]
+
+
+def _is_current(py_path: str, ui_path: str) -> bool:
+    try:
+        return os.path.getmtime(py_path) >= os.path.getmtime(ui_path)
+    except OSError:
+        return False
+
+
+def _compile(ui_path: str) -> str:
+    """compile ui_path to the first writable cache location, return its path"""
+    for py_path in _cache_candidates(ui_path):
+        try:
+            os.makedirs(os.path.dirname(py_path), exist_ok=True)
+            with open(py_path + ".tmp", "w", encoding="utf-8") as f:
+                uic.compileUi(ui_path, f)
+            os.replace(py_path + ".tmp", py_path)
+        except OSError as e:
+            logger.debug(f"cannot cache {ui_path} as {py_path}: {e}")
+            continue
+        logger.debug(f"compiled {ui_path} to {py_path}")
+        return py_path
+    return None
+
+
+def _ui_class(ui_path: str):
+    """the compiled Ui_ class of ui_path (compiled if necessary)"""
+    ui_path = os.path.abspath(ui_path)
+    with _lock:
+        try:
+            return _modules[ui_path]
+        except KeyError:
+            pass
+        for py_path in _cache_candidates(ui_path):
+            if _is_current(py_path, ui_path):
+                break
+        else:
+            py_path = _compile(ui_path)
+            if py_path is None:
+                return None
+        spec = importlib.util.spec_from_file_location(
+            "measureSequences._ui_" + hashlib.sha1(py_path.encode()).hexdigest(),
+            py_path,
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        ui_class = next(
+            value for name, value in vars(module).items() if name.startswith("Ui_")
+        )
+        _modules[ui_path] = ui_class
+        return ui_class
+
+
+def load_ui(ui_path: str, widget) -> None:
+    """set up widget from a .ui file, like PyQt5.uic.loadUi(ui_path, widget)
+
+    the child widgets become attributes of widget, slots are connected by
+    name. Falls back to loadUi if the file cannot be compiled and cached.
+    """
+    ui_class = _ui_class(ui_path)
+    if ui_class is None:
+        uic.loadUi(ui_path, widget)
+        return
+    ui = ui_class()
+    ui.setupUi(widget)
+    for name, value in vars(ui).items():
+        setattr(widget, name, value)
+
+
+def compile_all() -> list:
+    """compile all .ui files of the package, return the compiled paths"""
+    directory = ui_file("")
+    compiled = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".ui"):
+            py_path = _compile(os.path.join(directory, name))
+            if py_path is not None:
+                compiled.append(py_path)
+    return compiled
+
+
+if __name__ == "__main__":
+    for path in compile_all():
+        print(path)
@@ -16,8 +16,18 @@ Functions:
         returns the sequence and the number of steps
         could be shortened by use of np.linspace
 
+    ExceptionHandling
+        decorator logging exceptions instead of propagating them,
+        BreakCondition is always propagated
+    no_exception_wrapping
+        decorator to exclude a method from being wrapped in ExceptionHandling
+        by the WrappingExceptionHandlingMetaClass
+    abstract_hook
+        decorator to mark a method which needs to be overridden
+
 Classes:
 
+    ExceptionCounters: counts of exceptions caught by ExceptionHandling
     Window_ui: a window class, which loads the UI definitions from a spcified .ui file,
         emits a signal upon closing
     Author(s):
@@ -26,9 +36,13 @@ Classes:
 
 from PyQt5.QtCore import pyqtSignal
 from PyQt5 import QtWidgets
-from PyQt5.uic import loadUi
+
+from .uicache import load_ui
 
 import functools
+import threading
+import time
+import numpy as np
 
 # import inspect
 import logging
@@ -55,106 +69,184 @@ def ExceptionSignal(thread, func, e_type, err):
     return string, errmessage
 
 
+# names used in the log messages, for the exception types which are expected
+# to occur, all others are logged as critical
+EXCEPTION_NAMES = {
+    AssertionError: "Assertion",
+    TypeError: "Type",
+    KeyError: "Key",
+    IndexError: "Index",
+    ValueError: "Value",
+    AttributeError: "Attribute",
+    NotImplementedError: "NotImplemented",
+    OSError: "OSError",
+    NameError: "Name",
+}
+
+
+class ExceptionCounters:
+    """Thread-safe count of the exceptions caught by ExceptionHandling
+
+    counted per (class name, function name, exception type), together with
+    the time (clock, e.g. time.time()) of the first and the last
+    occurrence, and the total time in seconds (measured with timer) spent
+    in the handled sections until they failed
+
+    instances holding their own counters as 'exception_counters' (e.g.
+    every Sequence_runner) are counted there, all others in the module
+    level exception_counters
+    """
+
+    def __init__(self, clock=time.time, timer=time.perf_counter):
+        super().__init__()
+        self.clock = clock
+        self.timer = timer
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, key: tuple, duration: float = 0.0) -> int:
+        """count one occurrence, which failed after duration seconds
+
+        returns: the number of occurrences so far
+        """
+        now = self.clock()
+        with self._lock:
+            try:
+                counter = self._counters[key]
+            except KeyError:
+                counter = self._counters[key] = dict(
+                    count=0, first=now, last=now, time=0.0
+                )
+            counter["count"] += 1
+            counter["last"] = now
+            counter["time"] += duration
+            return counter["count"]
+
+    def snapshot(self) -> dict:
+        """return the counters, keys are 'class.function: exception type'"""
+        with self._lock:
+            return {
+                "{}.{}: {}".format(*key): dict(counter)
+                for key, counter in self._counters.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+exception_counters = ExceptionCounters()
+
+
+def handle_exception(instance, func, e: Exception, duration: float = 0.0) -> None:
+    """log an exception which occurred in the method func of instance
+
+    the full traceback is only logged at the first occurrence of the
+    same exception type in the same method, afterwards only the
+    message and the number of occurrences
+    duration: seconds spent in func until the exception occurred
+    """
+    e_type = next(
+        (EXCEPTION_NAMES[t] for t in type(e).__mro__ if t in EXCEPTION_NAMES),
+        "SOMETHING",
+    )
+    s, errmessage = ExceptionSignal(instance, func, e_type, e)
+    if (
+        isinstance(e, AttributeError)
+        and isinstance(errmessage, str)
+        and errmessage.startswith("'super' object")
+    ):
+        instance._logger.error(
+            "if you want to use the method -- %s -- \n\t you will have to implement it yourself!",
+            func.__name__,
+        )
+        raise BreakCondition("Function not implemented!")
+
+    counters = getattr(instance, "exception_counters", exception_counters)
+    count = counters.record(
+        (instance.__class__.__name__, func.__name__, type(e).__name__), duration
+    )
+    log = instance._logger.error if e_type != "SOMETHING" else instance._logger.critical
+    if count == 1:
+        log(s)
+        instance._logger.exception(e)
+    else:
+        log("{} (occurred {} times)".format(s, count))
+
+
 def ExceptionHandling(func):
+    """log exceptions raised in the method func, instead of propagating them
+
+    BreakCondition (stopping a sequence) always propagates
+    """
+
     @functools.wraps(func)
     def wrapper_ExceptionHandling(*args, **kwargs):
-        # if inspect.isclass(type(args[0])):
-        # thread = args[0]
+        timer = getattr(args[0], "exception_counters", exception_counters).timer
+        start = timer()
         try:
             return func(*args, **kwargs)
-        except AssertionError as e:
-            s, _ = ExceptionSignal(args[0], func, "Assertion", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except TypeError as e:
-            s, _ = ExceptionSignal(args[0], func, "Type", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except KeyError as e:
-            s, _ = ExceptionSignal(args[0], func, "Key", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except IndexError as e:
-            s, _ = ExceptionSignal(args[0], func, "Index", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except ValueError as e:
-            s, _ = ExceptionSignal(args[0], func, "Value", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except AttributeError as e:
-            s, errmessage = ExceptionSignal(args[0], func, "Attribute", e)
-            if errmessage.startswith("'super' object"):
-                args[0]._logger.error('if you want to use the method -- %s -- \n\t you will have to implement it yourself!', func.__name__)
-                raise BreakCondition('Function not implemented!')
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except NotImplementedError as e:
-            s, _ = ExceptionSignal(args[0], func, "NotImplemented", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-            # e.args = [str(e)]
-
-        except OSError as e:
-            s, _ = ExceptionSignal(args[0], func, "OSError", e)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
-        except NameError as e:
-            s, _ = ExceptionSignal(args[0], func, "Name", e)
-            # thread.logger.exception(s)
-            args[0]._logger.error(s)
-            args[0]._logger.exception(e)
-
+        except BreakCondition:
+            raise
         except Exception as e:
-            s, _ = ExceptionSignal(args[0], func, "SOMETHING", e)
-            args[0]._logger.critical(s)
-            args[0]._logger.exception(e)
+            handle_exception(args[0], func, e, timer() - start)
 
+    return wrapper_ExceptionHandling
 
-        # else:
-        #     args[0]._logger.warning('There is a bug!! ' + func.__name__)
 
-    return wrapper_ExceptionHandling
+def no_exception_wrapping(func):
+    """mark a method to be left alone by the WrappingExceptionHandlingMetaClass
+
+    for methods on hot paths, which do not need (or must not have)
+    their exceptions to be caught and logged
+    """
+    func.exception_wrapping = False
+    return func
+
+
+def abstract_hook(func):
+    """mark a method as a hook which needs to be overridden (or injected)
+
+    used to check whether a sequence can be run by a certain runner class,
+    the mark is preserved through ExceptionHandling (functools.wraps)
+    """
+    func.abstract_hook = True
+    return func
 
 
 def ScanningN(start, end, N):
-    """utility function for building linspaced number-sequences"""
+    """utility function for building linspaced number-sequences
+
+    returns: numpy array of the N values, stepsize
+
+    the values are accumulated step by step, as they always were,
+    the last one may therefore differ from end by rounding
+    """
     # N += 1
     stepsize = abs(end - start) / (N - 1)
     stepsize = abs(stepsize) if start < end else -abs(stepsize)
-    seq = []
-    for __ in range(int(N)):
-        seq.append(start)
-        start += stepsize
-    return seq, stepsize
+    # cumsum adds sequentially, exactly like the former loop
+    seq = np.cumsum(np.append(float(start), np.full(max(int(N) - 1, 0), stepsize)))
+    return seq[: int(N)], stepsize
 
 
 def ScanningSize(start, end, parameter):
-    """utility function for building linspaced number-sequences"""
+    """utility function for building linspaced number-sequences
+
+    returns: numpy array of the values from start (excluding end), number
+
+    the values are accumulated step by step, as they always were: due to
+    rounding, the last value may lie just below end (e.g. 0 to 1 in steps
+    of 0.1 gives 11 values, the last being 0.9999999999999999)
+    without a step, or between equal values, there are no values
+    """
+    if parameter == 0 or start == end:
+        return np.array([], dtype=float), 0
     stepsize = abs(parameter) if start < end else -abs(parameter)
-    seq = []
-    if start < end:
-        while start < end:
-            seq.append(start)
-            start += stepsize
-    else:
-        while start > end:
-            seq.append(start)
-            start += stepsize
+    # cumsum adds sequentially, exactly like the former loop
+    count = int(np.ceil(abs((end - start) / stepsize))) + 2
+    seq = np.cumsum(np.append(float(start), np.full(count - 1, stepsize)))
+    seq = seq[seq < end] if start < end else seq[seq > end]
     N = len(seq)
     return seq, N
 
@@ -171,7 +263,7 @@ class Window_ui(QtWidgets.QWidget):
             del kwargs["lock"]
         super().__init__(**kwargs)
         if ui_file is not None:
-            loadUi(ui_file, self)
+            load_ui(ui_file, self)
 
     def closeEvent(self, event):
         # do stuff
@@ -0,0 +1,127 @@
+"""tests for the adaptive refinement of scans (adaptive.py)"""
+
+import numpy as np
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.adaptive import AdaptiveGrid
+from measureSequences.preflight import check_sequence
+from measureSequences.simulation import PPMS_Model
+
+MEASURE = dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+
+
+def step(x: float) -> float:
+    """a transition at 7.2, linear background"""
+    return (1.0 if x > 7.2 else 0.0) + 0.01 * x
+
+
+def run_grid(grid: AdaptiveGrid, func) -> list:
+    points = []
+    for value in grid:
+        points.append(value)
+        grid.record(value, dict(mean=dict(res1=func(value))))
+    return points
+
+
+@pytest.mark.parametrize(
+    "grid, seen", [([12, 9.5, 7, 4.5, 2], 3), ([2, 4.5, 7, 9.5, 12], 4)]
+)
+def test_steep_interval_is_refined_in_scan_direction(grid, seen):
+    """the step lies between 9.5 and 7, it is seen after seen points"""
+    points = run_grid(AdaptiveGrid(grid, channel="res1", max_insert=4), step)
+    assert points[:seen] == grid[:seen]
+    assert [x for x in points if x in grid] == grid
+    inserted = [x for x in points if x not in grid]
+    assert all(7 < x < 9.5 for x in inserted)
+    # the scan goes back right away, and fills the interval in its direction
+    assert points[seen] in inserted
+    first = [x for x in inserted if x in (7.5, 8, 8.5, 9)]
+    assert first == sorted(first, reverse=grid[0] > grid[-1])
+    assert len(first) == 4
+    # the refined intervals are refined further
+    assert any(7.2 - 0.3 < x < 7.2 + 0.3 for x in inserted[4:])
+
+
+def test_refinement_respects_budget_and_min_spacing():
+    grid = AdaptiveGrid([12, 9.5, 7, 4.5, 2], channel="res1", budget=3, max_insert=10)
+    points = run_grid(grid, step)
+    assert grid.inserted == 3
+    assert len(points) == 8
+    spaced = AdaptiveGrid(
+        [12, 9.5, 7, 4.5, 2], channel="res1", min_spacing=1.0, max_insert=10
+    )
+    points = run_grid(spaced, step)
+    assert np.min(np.abs(np.diff(sorted(points)))) >= 1.0 - 1e-9
+
+
+def test_flat_measurement_is_not_refined():
+    grid = AdaptiveGrid(np.linspace(2, 12, 6), channel="res1")
+    points = run_grid(grid, lambda x: 0.01 * x)
+    assert grid.inserted == 0
+    assert points == list(np.linspace(2, 12, 6))
+
+
+def test_missing_channel_is_ignored():
+    grid = AdaptiveGrid([1, 2, 3], channel="res2")
+    points = run_grid(grid, step)
+    assert points == [1, 2, 3]
+    assert grid.measured == []
+
+
+def test_adaptive_temperature_scan_refines_the_transition():
+    """the transition at Tc=7.2 K lies between the coarse points 9.5 and 7"""
+    sequence = [
+        dict(
+            typ="scan_T",
+            start=12,
+            end=2,
+            Nsteps=5,
+            SweepRate=5,
+            SpacingCode="uniform",
+            ApproachMode="Fast",
+            commands=[MEASURE],
+            adaptive=dict(channel="res1", budget=6),
+        )
+    ]
+    runner = Sequence_simulator(sequence, model=PPMS_Model(Tc0=7.2, noise=1e-4))
+    setpoints = []
+    original = runner.setTemperature
+
+    def setTemperature(temperature):
+        setpoints.append(temperature)
+        original(temperature)
+
+    runner.setTemperature = setTemperature
+    assert runner.running() == "Sequence Finished!"
+    inserted = setpoints[3:-2]
+    assert setpoints[:3] == [12, 9.5, 7] and setpoints[-2:] == [4.5, 2]
+    assert len(inserted) == 6
+    assert all(7 < temperature < 9.5 for temperature in inserted)
+    resistances = [point["data"]["mean"]["res1"] for point in runner.data]
+    assert sum(0.1 < r < 0.99 for r in resistances) >= 2
+
+
+def test_sweeps_are_not_refined():
+    sequence = [
+        dict(
+            typ="scan_H",
+            start=0,
+            end=4,
+            Nsteps=5,
+            SweepRate=0.5,
+            SpacingCode="uniform",
+            ApproachMode="Sweep",
+            EndMode="driven",
+            commands=[MEASURE],
+            adaptive=dict(channel="res1"),
+        )
+    ]
+    report = check_sequence(Sequence_simulator, sequence)
+    assert "Sweeps cannot go back" in report.errors[0][1]
+    runner = Sequence_simulator(sequence, preflight_mandatory=False)
+    runner.model.set_temperature(0, 5, 20)
+    assert runner.running() == "Sequence Finished!"
+    fields = [point["data"]["mean"]["Field"] for point in runner.data]
+    assert fields == sorted(fields)
+    assert len(fields) == 5
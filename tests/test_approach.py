@@ -0,0 +1,46 @@
+"""tests for the approach planner of the "No O'Shoot" mode (approach.py)"""
+
+import numpy as np
+import pytest
+
+from measureSequences.approach import ApproachPlanner
+
+
+def test_steps_approach_the_target_monotonically():
+    plan = ApproachPlanner().plan("Temp", 300, 10, rate=10)
+    steps = np.asarray(plan.steps)
+    assert steps[-1] == 10
+    assert np.all(np.diff(np.append(300, steps)) < 0)
+    # the remaining distance halves with every step
+    remaining = steps[:-1] - 10
+    assert remaining[1:] / remaining[:-1] == pytest.approx(0.5)
+
+
+def test_last_step_stays_within_the_margin():
+    planner = ApproachPlanner()
+    settings = planner.settings["Temp"]
+    plan = planner.plan("Temp", 2, 12)
+    last_step = abs(plan.steps[-1] - plan.steps[-2])
+    assert last_step * settings["overshoot"] <= settings["margin"]
+    assert plan.steps[0] < plan.steps[-1]
+
+
+def test_small_distance_is_a_single_step():
+    plan = ApproachPlanner().plan("Field", 1.0, 1.0005)
+    assert list(plan.steps) == [1.0005]
+
+
+def test_number_of_steps_is_limited():
+    planner = ApproachPlanner(settings=dict(Temp=dict(max_steps=3)))
+    plan = planner.plan("Temp", 300, 2)
+    assert len(plan) == 3
+    assert plan.steps[-1] == 2
+
+
+def test_ramp_times_add_up_to_the_planned_ramp_time():
+    plan = ApproachPlanner().plan("Field", 0, 9, rate=0.5)
+    assert plan.ramp_time == pytest.approx(18 * 60)
+    assert plan.step_ramp_times().sum() == pytest.approx(plan.ramp_time)
+    without_rate = ApproachPlanner().plan("Field", 0, 9)
+    assert without_rate.ramp_time is None
+    assert not without_rate.step_ramp_times().any()
@@ -0,0 +1,162 @@
+"""tests for the reading and setpoint caches (caching.py)"""
+
+import threading
+
+import pytest
+
+from measureSequences.caching import ReadingCache
+from measureSequences.caching import SetpointCache
+from measureSequences.clock import ManualClock
+
+
+class Instrument:
+    """counts its reads, returns the number of the read"""
+
+    def __init__(self):
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        return self.reads
+
+
+def test_reading_served_from_cache_while_young():
+    clock = ManualClock()
+    cache = ReadingCache(max_age=dict(Temp=0.1), clock=clock.monotonic)
+    instrument = Instrument()
+    assert cache.get("Temp", instrument.read) == 1
+    clock.advance(0.05)
+    assert cache.get("Temp", instrument.read) == 1
+    assert instrument.reads == 1
+
+
+def test_reading_as_old_as_max_age_is_read_anew():
+    """polling with the period max_age gets a fresh reading every time"""
+    clock = ManualClock()
+    # exactly representable, no rounding of the accumulated time
+    cache = ReadingCache(max_age=dict(Temp=0.125), clock=clock.monotonic)
+    instrument = Instrument()
+    values = []
+    for _ in range(5):
+        values.append(cache.get("Temp", instrument.read))
+        clock.advance(0.125)
+    assert values == [1, 2, 3, 4, 5]
+
+
+def test_max_age_zero_always_reads():
+    clock = ManualClock()
+    cache = ReadingCache(clock=clock.monotonic)
+    instrument = Instrument()
+    assert [cache.get("Field", instrument.read) for _ in range(3)] == [1, 2, 3]
+
+
+def test_failed_read_is_not_cached():
+    clock = ManualClock()
+    cache = ReadingCache(max_age=dict(Temp=10), clock=clock.monotonic)
+
+    def failing():
+        raise OSError("instrument not responding")
+
+    with pytest.raises(OSError):
+        cache.get("Temp", failing)
+    assert cache.get("Temp", lambda: 4.2) == 4.2
+
+
+def test_concurrent_reads_are_coalesced():
+    cache = ReadingCache()
+    started = threading.Event()
+    release = threading.Event()
+    reads = []
+
+    def slow_read():
+        reads.append(1)
+        started.set()
+        release.wait(5)
+        return 1.5
+
+    results = []
+    owner = threading.Thread(
+        target=lambda: results.append(cache.get("Temp", slow_read))
+    )
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(
+        target=lambda: results.append(cache.get("Temp", slow_read))
+    )
+    waiter.start()
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == [1.5, 1.5]
+    assert len(reads) == 1
+
+
+def test_invalidate_forces_a_read():
+    clock = ManualClock()
+    cache = ReadingCache(max_age=dict(Temp=10), clock=clock.monotonic)
+    instrument = Instrument()
+    cache.get("Temp", instrument.read)
+    cache.invalidate("Temp")
+    assert cache.get("Temp", instrument.read) == 2
+
+
+def test_setpoint_redundant_within_tolerance_and_same_mode():
+    cache = SetpointCache(tolerances=dict(Field=1e-4))
+    assert not cache.is_redundant("Field", 1.0, "persistent")
+    cache.commanded("Field", 1.0, "persistent")
+    assert cache.is_redundant("Field", 1.00005, "persistent")
+    assert not cache.is_redundant("Field", 1.001, "persistent")
+    assert not cache.is_redundant("Field", 1.0, "driven")
+    assert cache.skipped_count == dict(Field=1)
+
+
+def test_setpoint_invalidate():
+    cache = SetpointCache()
+    cache.commanded("Temp", 10)
+    cache.invalidate()
+    assert cache.get("Temp") == (None, None)
+    assert not cache.is_redundant("Temp", 10)
+
+
+def test_runner_polls_get_fresh_readings():
+    """the default maximum age is below the poll interval of wait_for"""
+    from measureSequences import Sequence_simulator
+
+    runner = Sequence_simulator([])
+    reads = []
+
+    def getChamber():
+        reads.append(runner.clock.monotonic())
+        return "sealed" if len(reads) >= 10 else "purging"
+
+    runner.getChamber = getChamber
+    runner.wait_for(target="sealed", getfunc=runner._getChamber, threshold=0)
+    # a fresh reading at every poll (every 0.1 s), none is skipped
+    intervals = [t1 - t0 for t0, t1 in zip(reads, reads[1:])]
+    assert max(intervals) == pytest.approx(0.1)
+
+
+def test_runner_skips_redundant_setpoints():
+    from measureSequences import Sequence_simulator
+
+    sequence = [
+        dict(typ="set_T", Temp=10, SweepRate=10, ApproachMode="Fast"),
+        dict(typ="set_T", Temp=10, SweepRate=10, ApproachMode="Fast"),
+        dict(typ="set_T", Temp=12, SweepRate=10, ApproachMode="Fast"),
+    ]
+    runner = Sequence_simulator(sequence)
+    sent = []
+    setTemperature = runner.setTemperature
+    runner.setTemperature = lambda temperature: (
+        sent.append(temperature),
+        setTemperature(temperature),
+    )
+    assert runner.running() == "Sequence Finished!"
+    assert sent == [10, 12]
+    assert runner.setpoints.skipped_count == dict(Temp=1)
+
+    # after an invalidation, the same setpoint is sent again
+    runner.invalidate_setpoints()
+    runner.sequence = sequence[:1]
+    runner.running()
+    assert sent == [10, 12, 10]
@@ -0,0 +1,88 @@
+"""tests for the virtual clock (clock.py)"""
+
+import pytest
+
+from measureSequences.clock import ManualClock
+
+
+def test_sleep_advances_without_real_time():
+    clock = ManualClock(start=5.0, epoch=1000.0)
+    clock.sleep(3600)
+    assert clock.monotonic() == 5.0 + 3600
+    assert clock.time() == 1000.0 + 5.0 + 3600
+
+
+def test_timers_fire_in_order_of_their_deadlines():
+    clock = ManualClock()
+    fired = []
+    for interval in (3, 1, 2):
+        clock.timer(
+            interval, lambda i: fired.append((i, clock.monotonic())), args=[interval]
+        ).start()
+    cancelled = clock.timer(1.5, fired.append, args=["cancelled"])
+    cancelled.start()
+    cancelled.cancel()
+    clock.advance(10)
+    assert fired == [(1, 1), (2, 2), (3, 3)]
+    assert clock.monotonic() == 10
+
+
+def test_wait_until_stops_when_told():
+    clock = ManualClock()
+    state = dict(running=True)
+    clock.timer(2, state.update, kwargs=dict(running=False)).start()
+    assert not clock.wait_until(10, keep_waiting=lambda: state["running"])
+    assert clock.monotonic() == 2
+
+
+def test_timers_due_while_a_timer_fires_are_deferred():
+    """a timer sleeping on the clock is not interrupted by other timers"""
+    clock = ManualClock()
+    events = []
+
+    def slow(name):
+        events.append(("start", name, clock.monotonic()))
+        clock.sleep(5)
+        events.append(("end", name, clock.monotonic()))
+
+    for interval, name in ((1, "a"), (2, "b"), (3, "c")):
+        clock.timer(interval, slow, args=[name]).start()
+    clock.advance(1)
+    # b and c became due while a was firing, they fire after it returned
+    assert events == [
+        ("start", "a", 1),
+        ("end", "a", 6),
+        ("start", "b", 6),
+        ("end", "b", 11),
+        ("start", "c", 11),
+        ("end", "c", 16),
+    ]
+    assert clock.monotonic() == 16
+
+
+def test_forced_time_scan_with_slow_points():
+    """points taking longer than their interval are executed one after another"""
+    from measureSequences import Sequence_simulator
+
+    sequence = [
+        dict(
+            typ="scan_time",
+            time_total=4,
+            Nsteps=5,
+            SpacingCode="uniform",
+            commands=[
+                dict(typ="res_measure", dataflags={}, reading_count=4, bridge_conf={})
+            ],
+        )
+    ]
+    runner = Sequence_simulator(sequence, reading_time=0.5)
+    runner.scan_time_force = True
+    paths = []
+    runner.add_hook("measured", lambda **kwargs: paths.append(tuple(runner._path)))
+    assert runner.running() == "Sequence Finished!"
+    assert len(runner.data) == 5
+    times = [point["time"] - runner.clock.epoch for point in runner.data]
+    # every point takes 2 s, which is longer than the interval of 1 s
+    assert times == pytest.approx([2, 4, 6, 8, 10])
+    assert paths == [(0, 0)] * 5
+    assert runner._path == []
@@ -0,0 +1,79 @@
+"""tests for the stop conditions of scans (conditions.py)"""
+
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.conditions import StopConditions
+from measureSequences.conditions import compile_condition
+
+MEASURE = dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+
+
+def merged(**mean):
+    return dict(mean=mean, median=dict(mean), stddev={}, non_numeric={})
+
+
+def test_first_condition_met_is_returned():
+    conditions = StopConditions(["res1 < 0.01", "value > 2 and res2 > 1"])
+    assert conditions.check(merged(res1=1, res2=2), value=1) is None
+    assert conditions.check(merged(res1=1, res2=2), value=3) == "value > 2 and res2 > 1"
+    assert conditions.check(merged(res1=0, res2=2), value=3) == "res1 < 0.01"
+
+
+def test_missing_names_count_as_false():
+    conditions = StopConditions(["res1 < 0.01", "median['res2'] > 1"])
+    assert conditions.check({}, value=1) is None
+    assert not StopConditions()
+
+
+def test_callable_conditions():
+    conditions = StopConditions()
+    conditions.add(lambda namespace: namespace["value"] > 5, name="beyond")
+    assert conditions
+    assert conditions.check({}, value=6) == "beyond"
+
+
+def test_invalid_expression_raises():
+    with pytest.raises(SyntaxError):
+        compile_condition("res1 <")
+
+
+def scan_time(commands, stop_conditions):
+    return dict(
+        typ="scan_time",
+        time_total=4,
+        Nsteps=5,
+        SpacingCode="uniform",
+        commands=commands,
+        stop_conditions=stop_conditions,
+    )
+
+
+def count_points(runner) -> list:
+    points = []
+    runner.add_hook("scan_iteration", lambda **kwargs: points.append(kwargs["point"]))
+    return points
+
+
+def test_scan_ends_when_condition_is_met():
+    # at 300 K, res1 is about 10 Ohm
+    runner = Sequence_simulator([scan_time([MEASURE], ["res1 > 5"])])
+    points = count_points(runner)
+    assert runner.running() == "Sequence Finished!"
+    assert points == [0]
+
+
+def test_measurement_before_the_scan_does_not_end_it():
+    runner = Sequence_simulator(
+        [MEASURE, scan_time([dict(typ="Wait", Delay=0)], ["res1 > 5"])]
+    )
+    points = count_points(runner)
+    assert runner.running() == "Sequence Finished!"
+    assert points == [0, 1, 2, 3]
+
+
+def test_conditions_on_the_scan_value_only():
+    runner = Sequence_simulator([scan_time([], ["value >= 2"])])
+    points = count_points(runner)
+    runner.running()
+    assert points == [0, 1]
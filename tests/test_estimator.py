@@ -0,0 +1,114 @@
+"""tests for the duration estimator (estimator.py)"""
+
+import pytest
+
+from measureSequences.estimator import Sequence_estimator
+from measureSequences.runSequences import Sequence_runner
+
+MEASURE = dict(
+    typ="res_measure",
+    dataflags={},
+    reading_count=2,
+    bridge_conf={},
+)
+
+
+def scan_T(commands, **kwargs):
+    entry = dict(
+        typ="scan_T",
+        start=10,
+        end=2,
+        Nsteps=5,
+        SweepRate=2,
+        SpacingCode="uniform",
+        ApproachMode="Fast",
+        commands=commands,
+    )
+    entry.update(kwargs)
+    return entry
+
+
+class FullEstimator(Sequence_estimator):
+    """executes the commands at every point of a scan"""
+
+    def _execute_scan_point(self, *args, **kwargs):
+        return Sequence_runner._execute_scan_point(self, *args, **kwargs)
+
+
+def test_replayed_scan_matches_full_execution():
+    body = [MEASURE, dict(typ="Wait", Delay=3)]
+    sequence = [
+        scan_T(body),
+        scan_T(
+            [
+                dict(
+                    typ="scan_time",
+                    time_total=10,
+                    Nsteps=3,
+                    SpacingCode="uniform",
+                    commands=[MEASURE],
+                )
+            ],
+            ApproachMode="Sweep",
+            start=2,
+            end=10,
+        ),
+    ]
+    replayed = Sequence_estimator(sequence).estimate()
+    full = FullEstimator(sequence).estimate()
+    assert replayed.result == full.result == "Sequence Finished!"
+    assert replayed.total == pytest.approx(full.total)
+    assert replayed.total > 0
+    for typ, times in full.commands.items():
+        assert replayed.commands[typ]["count"] == times["count"]
+        assert replayed.commands[typ]["inclusive"] == pytest.approx(times["inclusive"])
+
+
+def test_measurement_durations_add_up():
+    estimator = Sequence_estimator([MEASURE], durations=dict(reading=2.0, store=1.0))
+    report = estimator.estimate()
+    assert report.total == pytest.approx(2 * 2.0 + 1.0)
+
+
+def test_scans_on_measured_values_are_reported_as_bound():
+    adaptive = dict(channel="res1", budget=4)
+    report = Sequence_estimator(
+        [
+            scan_T([MEASURE], stop_conditions=["res1 < 1"]),
+            scan_T([MEASURE], adaptive=adaptive),
+        ]
+    ).estimate()
+    assert report.result == "Sequence Finished!"
+    assert len(report.warnings) == 2
+    assert "upper bound" in report.warnings[0]
+    assert "lower bound (up to 4 more points)" in report.warnings[1]
+
+
+def test_nested_scan_on_measured_values_is_reported_once():
+    inner = dict(
+        typ="scan_time",
+        time_total=10,
+        Nsteps=3,
+        SpacingCode="uniform",
+        commands=[MEASURE],
+        stop_conditions=["res1 < 1"],
+    )
+    report = Sequence_estimator([scan_T([inner])]).estimate()
+    assert len(report.warnings) == 1
+    assert report.commands["scan_time"]["count"] == 5
+
+
+def test_endless_time_scan_is_counted_once():
+    report = Sequence_estimator(
+        [
+            dict(
+                typ="scan_time",
+                time_total=0,
+                Nsteps=3,
+                SpacingCode="uniform",
+                commands=[MEASURE],
+            )
+        ]
+    ).estimate()
+    assert report.commands["res_measure"]["count"] == 1
+    assert "counted once" in report.warnings[0]
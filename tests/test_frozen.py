@@ -0,0 +1,93 @@
+"""tests for the immutable containers of parsed sequences (frozen.py)"""
+
+import copy
+import json
+import pickle
+
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.Sequence_parsing import Sequence_parser
+from measureSequences.frozen import FrozenEntry
+from measureSequences.frozen import FrozenSequence
+from measureSequences.frozen import freeze
+from measureSequences.frozen import thaw
+
+SEQUENCE = [
+    dict(typ="remark", text="start"),
+    dict(
+        typ="scan_time",
+        time_total=2,
+        Nsteps=3,
+        SpacingCode="uniform",
+        commands=[
+            dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+        ],
+    ),
+]
+
+
+def test_freeze_is_recursive_and_equal_to_the_original():
+    frozen = freeze(SEQUENCE)
+    assert isinstance(frozen, FrozenSequence)
+    assert isinstance(frozen[1], FrozenEntry)
+    assert isinstance(frozen[1]["commands"], FrozenSequence)
+    assert frozen == SEQUENCE
+    assert freeze(frozen) is frozen
+
+
+def test_frozen_containers_cannot_be_changed():
+    frozen = freeze(SEQUENCE)
+    with pytest.raises(TypeError, match="thaw"):
+        frozen[0]["text"] = "changed"
+    with pytest.raises(TypeError):
+        frozen[1].update(Nsteps=5)
+    with pytest.raises(TypeError):
+        frozen[1]["commands"][0].pop("typ")
+    with pytest.raises(TypeError):
+        frozen[0] = None
+
+
+def test_copies_are_shared_thaw_is_private():
+    frozen = freeze(SEQUENCE)
+    assert copy.deepcopy(frozen) is frozen
+    assert copy.copy(frozen[1]) is frozen[1]
+    thawed = thaw(frozen)
+    assert type(thawed) is list and type(thawed[1]["commands"][0]) is dict
+    thawed[1]["Nsteps"] = 5
+    assert frozen[1]["Nsteps"] == 3
+    assert thaw(frozen) == SEQUENCE
+
+
+def test_frozen_sequences_serialise_like_plain_ones():
+    frozen = freeze(SEQUENCE)
+    assert json.loads(json.dumps(frozen)) == SEQUENCE
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+
+def test_saving_writes_plain_lists_and_dicts(tmp_path):
+    sequence_file = tmp_path / "sequence.seq"
+    sequence_file.write_text("REM remark\nWAITFOR 5 0 1 0 0 0\n")
+    parser = Sequence_parser(sequence_file=str(sequence_file))
+    parser.data = freeze(parser.data)
+    parser.saving()
+    with open(tmp_path / "sequence.pkl", "rb") as f:
+        loaded = pickle.load(f)
+    assert type(loaded) is list and type(loaded[1]) is dict
+    assert loaded[1]["typ"] == "Wait"
+    assert loaded == parser.data
+    with open(tmp_path / "sequence.json") as f:
+        assert json.load(f) == parser.data
+
+
+def test_runner_executes_frozen_sequences():
+    runner = Sequence_simulator(freeze(SEQUENCE))
+    assert runner.running() == "Sequence Finished!"
+    assert len(runner.data) == 2
+
+
+def test_slices_of_frozen_sequences_are_frozen():
+    frozen = freeze(SEQUENCE)
+    assert isinstance(frozen[::-1], FrozenSequence)
+    assert frozen[::-1] == SEQUENCE[::-1]
+    assert frozen[1:] == SEQUENCE[1:]
@@ -0,0 +1,158 @@
+"""tests for the live views of a running sequence (live.py, qlive.py)"""
+
+import numpy as np
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.live import LiveDataFeed
+from measureSequences.live import MinMaxBuffer
+from measureSequences.live import PositionPublisher
+from measureSequences.live import describe_position
+
+MEASURE = dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+
+
+def scan_T(commands, Nsteps=3):
+    return dict(
+        typ="scan_T",
+        start=10,
+        end=6,
+        Nsteps=Nsteps,
+        SweepRate=5,
+        SpacingCode="uniform",
+        ApproachMode="Fast",
+        commands=commands,
+    )
+
+
+def test_position_follows_the_scan_points():
+    runner = Sequence_simulator([MEASURE, scan_T([MEASURE])])
+    publisher = PositionPublisher(runner)
+    publisher.attach()
+    positions = []
+    runner.add_hook("measured", lambda **kwargs: positions.append(publisher.take()))
+    assert runner.running() == "Sequence Finished!"
+    assert [position["path"] for position in positions] == [(0,)] + [(1, 0)] * 3
+    assert positions[0]["scans"] == ()
+    assert [position["scans"] for position in positions[1:]] == [
+        (((1,), point, value),) for point, value in enumerate([10, 8, 6])
+    ]
+    assert all(position["length"] == 2 for position in positions)
+    # the position is published before the measurement of the command
+    assert positions[1]["measured"] is runner.data[0]["data"]
+    assert describe_position(positions[2]) == "command 2/2, point 2 (8)"
+    # the end of the scan was published last, without its points
+    last = publisher.take()
+    assert last["path"] == (1,)
+    assert last["scans"] == ()
+    assert last["measured"] is runner.data[-1]["data"]
+
+
+def test_updates_are_coalesced_until_taken():
+    runner = Sequence_simulator([MEASURE] * 5)
+    publisher = PositionPublisher(runner)
+    publisher.attach()
+    assert publisher.take() is None
+    assert runner.running() == "Sequence Finished!"
+    assert publisher.take()["path"] == (4,)
+    assert publisher.take() is None
+
+
+def test_detached_publisher_leaves_no_hooks():
+    runner = Sequence_simulator([scan_T([MEASURE])])
+    publisher = PositionPublisher(runner)
+    publisher.attach()
+    publisher.attach()
+    publisher.detach()
+    assert not any(runner._hooks.values())
+    assert runner.running() == "Sequence Finished!"
+    assert publisher.take() is None
+
+
+def test_relay_emits_the_latest_position():
+    pytest.importorskip("PyQt5.QtWidgets")
+    from PyQt5 import QtCore
+    from measureSequences.qlive import LiveRelay
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    runner = Sequence_simulator([MEASURE, scan_T([MEASURE], Nsteps=2)])
+    publisher = PositionPublisher(runner)
+    publisher.attach()
+    relay = LiveRelay(publisher, rate=20)
+    emitted = []
+    relay.sig_update.connect(emitted.append)
+    relay.relay()
+    assert emitted == []
+    assert runner.running() == "Sequence Finished!"
+    relay.start()
+    relay.stop()
+    app.processEvents()
+    assert len(emitted) == 1
+    assert emitted[0]["path"] == (1,)
+
+
+def test_buffer_keeps_min_max_of_the_whole_run():
+    values = np.sin(np.arange(1000) / 7.0)
+    buffer = MinMaxBuffer(size=10)
+    for x, y in enumerate(values):
+        buffer.add(float(x), y)
+        assert buffer.count <= 10
+    buckets = buffer.buckets()
+    # 1000 values: the span doubled until 10 buckets cover them
+    assert buffer.span == 128
+    assert buffer.generation == 7
+    assert buffer.count == 7
+    for x, low, high in zip(buckets["x"], buckets["low"], buckets["high"]):
+        chunk = values[int(x) : int(x) + buffer.span]
+        assert low == chunk.min()
+        assert high == chunk.max()
+    x, low, high = buckets["partial"]
+    assert x == buffer.count * buffer.span
+    assert low == values[int(x) :].min()
+    assert high == values[int(x) :].max()
+
+
+def test_feed_publishes_deltas_and_resets():
+    runner = Sequence_simulator(
+        [
+            dict(
+                typ="scan_time",
+                time_total=19,
+                Nsteps=20,
+                SpacingCode="uniform",
+                commands=[MEASURE],
+            )
+        ]
+    )
+    feed = LiveDataFeed(runner, size=8)
+    feed.attach()
+    deltas = []
+    runner.add_hook("measured", lambda **kwargs: deltas.append(feed.take()))
+    assert runner.running() == "Sequence Finished!"
+    assert feed.take() is None
+    temperatures = [point["data"]["mean"]["Temp"] for point in runner.data]
+    # rebuild the buckets from the deltas, as a plot would
+    low = []
+    for delta in deltas:
+        temp = delta["Temp"]
+        if temp["reset"]:
+            low = []
+        low.extend(temp["low"])
+    buffer = feed.buffers["Temp"]
+    assert buffer.generation == 2
+    assert sum(delta["Temp"]["reset"] for delta in deltas) == 3
+    assert low == list(buffer.low[: buffer.count])
+    assert low == [min(temperatures[i : i + 4]) for i in range(0, 16, 4)]
+    assert all(len(delta["Temp"]["x"]) <= 8 for delta in deltas)
+    feed.detach()
+    assert feed._measured not in runner._hooks["measured"]
+
+
+def test_feed_skips_values_which_are_not_finite():
+    feed = LiveDataFeed(Sequence_simulator([]))
+    feed._measured(
+        data=dict(mean=dict(a=1.0, b=float("nan"), c="text", d=None)), timestamp=0.0
+    )
+    assert set(feed.take()) == {"a"}
+    feed._measured(data=dict(median=dict(a=2.0)), timestamp=1.0)
+    assert feed.take() is None
@@ -0,0 +1,146 @@
+"""tests for the binary file format of parsed sequences (mseq.py)"""
+
+import pickle
+import struct
+
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences import mseq
+from measureSequences.Sequence_parsing import Sequence_parser
+from measureSequences.frozen import FrozenEntry
+from measureSequences.frozen import freeze
+from measureSequences.frozen import thaw
+
+RES = "RES 255 {} 2 100 1000 0 0 95 2 100 1000 0 0 95 0 1 10 0 0 9 0 1 10 1 1 9\n"
+
+LINES = [
+    "REM start\n",
+    "TMP TEMP 10 5 0\n",
+    "SCANT 300 2 2 5 0 0\n",
+    RES.format(1),
+    "SCANH 0 5 0.5 3 0 0 0\n",
+    RES.format(2),
+    "ENDSCAN EOS\n",
+    "ENDSCAN EOS\n",
+    "WAITFOR 5 0 1 0 0 0\n",
+    "REM end\n",
+]
+
+VALUES = [
+    dict(
+        typ="values",
+        none=None,
+        true=True,
+        false=False,
+        int=3,
+        big=2**62,
+        float=2.5,
+        zero=0.0,
+        negative_zero=-0.0,
+        text="Ω µ ✓",
+        empty="",
+        floats=[1.0, 2.5, -3.0],
+        mixed=[1, 2.0, "three", None],
+        nested=dict(inner=dict(list=[], dict={})),
+    ),
+    dict(typ="values", int=3, float=2.5, text="Ω µ ✓"),
+]
+
+
+def assert_same(loaded, original):
+    """equal, with the same types of scalars, and frozen containers"""
+    assert len(loaded) == len(original)
+    for mine, theirs in zip(loaded, original):
+        if isinstance(theirs, dict):
+            assert isinstance(mine, FrozenEntry)
+            assert list(mine) == list(theirs)
+            assert_same(list(mine.values()), list(theirs.values()))
+        elif isinstance(theirs, list):
+            assert_same(mine, theirs)
+        else:
+            assert type(mine) is type(theirs)
+            assert repr(mine) == repr(theirs)
+
+
+@pytest.fixture
+def parsed(tmp_path):
+    sequence_file = tmp_path / "sequence.seq"
+    sequence_file.write_text("".join(LINES))
+    return Sequence_parser(sequence_file=str(sequence_file))
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_parsed_sequence_round_trip(tmp_path, parsed, lazy):
+    path = str(tmp_path / "sequence.mseq")
+    mseq.dump(parsed.data, path)
+    loaded = mseq.load(path, lazy=lazy)
+    assert loaded == parsed.data
+    assert_same(loaded, parsed.data)
+    assert thaw(loaded) == parsed.data
+    assert (
+        loaded[2]["commands"][1]["commands"][0]
+        == parsed.data[2]["commands"][1]["commands"][0]
+    )
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_values_round_trip(tmp_path, lazy):
+    path = str(tmp_path / "values.mseq")
+    mseq.dump(freeze(VALUES), path)
+    loaded = mseq.load(path, lazy=lazy)
+    assert_same(loaded, VALUES)
+    assert repr(loaded[0]["negative_zero"]) == "-0.0"
+    # repeated values are decoded once, and shared
+    assert loaded[0]["text"] is loaded[1]["text"]
+    assert loaded[-1]["int"] == 3 and loaded[-1] == VALUES[-1]
+    assert loaded[::-1] == VALUES[::-1]
+    with pytest.raises(IndexError):
+        loaded[2]
+
+
+def test_values_which_cannot_be_stored(tmp_path):
+    with pytest.raises(TypeError, match="cannot store"):
+        mseq.dump([dict(typ="set", values={1, 2})], str(tmp_path / "set.mseq"))
+
+
+def test_saving_writes_a_loadable_mseq_file(parsed):
+    parsed.saving()
+    with open(parsed.sequence_file_p, "rb") as f:
+        pickled = pickle.load(f)
+    assert mseq.load(parsed.sequence_file_mseq) == pickled
+    assert mseq.load(parsed.sequence_file_mseq, lazy=False) == pickled
+
+
+def test_other_files_and_versions_are_refused(tmp_path, parsed):
+    path = tmp_path / "sequence.mseq"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError, match="not a sequence file"):
+        mseq.load(str(path), lazy=False)
+    mseq.dump(parsed.data, str(path))
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<H", data, 4, mseq.VERSION + 1)
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="format version"):
+        mseq.load(str(path))
+
+
+def test_runner_executes_a_mapped_sequence(tmp_path):
+    sequence = [
+        dict(
+            typ="scan_time",
+            time_total=2,
+            Nsteps=3,
+            SpacingCode="uniform",
+            commands=[
+                dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+            ],
+        )
+    ]
+    path = str(tmp_path / "sequence.mseq")
+    mseq.dump(sequence, path)
+    runner = Sequence_simulator(mseq.load(path))
+    assert runner.running() == "Sequence Finished!"
+    plain = Sequence_simulator(sequence)
+    assert plain.running() == "Sequence Finished!"
+    assert len(runner.data) == len(plain.data) > 0
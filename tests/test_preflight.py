@@ -0,0 +1,85 @@
+"""tests for the pre-flight check of sequences (preflight.py)"""
+
+from measureSequences import Sequence_runner
+from measureSequences import Sequence_simulator
+from measureSequences.preflight import check_sequence
+
+
+def scan_T(**kwargs):
+    entry = dict(
+        typ="scan_T",
+        start=10,
+        end=2,
+        Nsteps=5,
+        SweepRate=2,
+        SpacingCode="uniform",
+        ApproachMode="Fast",
+        commands=[],
+    )
+    entry.update(kwargs)
+    return entry
+
+
+def test_valid_sequence_passes():
+    report = check_sequence(Sequence_simulator, [scan_T()])
+    assert report.ok, report.summary()
+    assert report.operations["scan_T"]["setpoints"] == 5
+
+
+def test_unknown_command_and_parameters_are_errors():
+    report = check_sequence(
+        Sequence_simulator, [dict(typ="no such command"), scan_T(Nsteps=1)]
+    )
+    messages = [message for _, message in report.errors]
+    assert any("unknown command type" in message for message in messages)
+    assert any("Nsteps must be >= 2" in message for message in messages)
+
+
+def test_adaptive_budget_counts_as_points():
+    report = check_sequence(
+        Sequence_simulator, [scan_T(adaptive=dict(channel="res1", budget=3))]
+    )
+    assert report.ok, report.summary()
+    assert report.operations["scan_T"]["setpoints"] == 8
+
+
+def test_adaptive_budget_of_wrong_type_is_reported():
+    for adaptive in (
+        dict(channel="res1", budget="3"),
+        dict(channel="res1", budget=None),
+        dict(channel="res1", min_spacing=[1]),
+    ):
+        report = check_sequence(Sequence_simulator, [scan_T(adaptive=adaptive)])
+        assert not report.ok
+        assert "must be numbers" in report.errors[0][1]
+
+
+def test_negative_adaptive_budget_is_reported():
+    report = check_sequence(
+        Sequence_simulator, [scan_T(adaptive=dict(channel="res1", budget=-1))]
+    )
+    assert "must be >= 0" in report.errors[0][1]
+
+
+def test_invalid_stop_condition_is_reported():
+    report = check_sequence(Sequence_simulator, [scan_T(stop_conditions=["res1 <"])])
+    assert "invalid stop condition" in report.errors[0][1]
+
+
+def test_missing_hooks_are_reported():
+    report = check_sequence(Sequence_runner, [scan_T()])
+    assert {"setTemperature", "checkStable_Temp"} <= report.hooks_missing
+
+
+def test_running_refuses_sequence_with_errors():
+    runner = Sequence_simulator([scan_T(Nsteps=1)])
+    assert runner.running() == "Preflight check failed!"
+    assert "pre-flight check" in runner.messages[0][1]
+    assert runner.data == []
+
+
+def test_running_without_mandatory_preflight():
+    runner = Sequence_simulator(
+        [dict(typ="no such command")], preflight_mandatory=False
+    )
+    assert runner.running() == "Sequence Finished!"
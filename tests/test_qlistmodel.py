@@ -0,0 +1,41 @@
+"""tests for the list model of the scan points (qlistmodel.ScanListModel)"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+from PyQt5 import QtCore  # noqa: E402
+
+from measureSequences.qlistmodel import ScanListModel  # noqa: E402
+
+
+class Receiver(QtCore.QObject):
+    sig_updateScanListModel = QtCore.pyqtSignal(dict)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_points_are_displayed_with_their_full_value(app):
+    receiver = Receiver()
+    model = ScanListModel(receiver, start=0, end=1, Nsteps=0, SizeSteps=0.1)
+    assert model.rowCount() == 11
+    last = model.index(10)
+    # accumulated steps of 0.1 do not end exactly on 1
+    assert model.data(last, QtCore.Qt.DisplayRole) == 0.9999999999999999
+    assert model.data(last, QtCore.Qt.EditRole) == 0.9999999999999999
+    assert model.pass_data()[10] == 0.9999999999999999
+
+
+def test_points_follow_the_scan_settings(app):
+    receiver = Receiver()
+    model = ScanListModel(receiver, start=0, end=0, Nsteps=0, SizeSteps=0)
+    assert model.rowCount() == 0
+    receiver.sig_updateScanListModel.emit(dict(start=2, end=4, Nsteps=3, SizeSteps=0))
+    values = [model.data(model.index(row), QtCore.Qt.DisplayRole) for row in range(3)]
+    assert values == [2.0, 3.0, 4.0]
@@ -0,0 +1,109 @@
+"""tests for reparsing changed sequence files (Sequence_parser.reparse_sequence)"""
+
+import random
+
+import pytest
+
+from measureSequences.Sequence_parsing import Sequence_parser
+
+RES = "RES 255 {} 2 100 1000 0 0 95 2 100 1000 0 0 95 0 1 10 0 0 9 0 1 10 1 1 9\n"
+
+LINES = [
+    "REM start\n",
+    "TMP TEMP 10 5 0\n",
+    "SCANT 300 2 2 5 0 0\n",
+    RES.format(1),
+    "SCANH 0 5 0.5 3 0 0 0\n",
+    RES.format(2),
+    "ENDSCAN EOS\n",
+    "ENDSCAN EOS\n",
+    "WAITFOR 5 0 1 0 0 0\n",
+    "REM middle\n",
+    "SCANT 10 2 2 3 0 0\n",
+    "REM inside\n",
+    "ENDSCAN EOS\n",
+    "TMP TEMP 20 5 0\n",
+    "REM end\n",
+]
+
+
+def write(path, lines):
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def reparse_and_compare(path, old_lines, new_lines):
+    """reparse after changing the file, compare with a complete parse
+
+    files which cannot be parsed (e.g. a scan without ENDSCAN) fail alike
+    """
+    write(path, old_lines)
+    parser = Sequence_parser(sequence_file=str(path))
+    old_data = list(parser.data)
+    write(path, new_lines)
+    try:
+        fresh = Sequence_parser(sequence_file=str(path))
+    except IndexError:
+        with pytest.raises(IndexError):
+            parser.reparse_sequence()
+        return "failed"
+    result = parser.reparse_sequence()
+    assert parser.data == fresh.data
+    assert parser.textsequence == fresh.textsequence
+    assert parser.spans == fresh.spans
+    assert parser.lines == fresh.lines
+    if result is None:
+        assert old_data == fresh.data
+    else:
+        first, removed, commands = result
+        assert old_data[:first] + commands + old_data[first + removed :] == fresh.data
+    return result
+
+
+EDITS = dict(
+    unchanged=lambda lines: lines,
+    change_first=lambda lines: ["REM changed\n"] + lines[1:],
+    change_last=lambda lines: lines[:-1] + ["REM changed\n"],
+    change_nested=lambda lines: lines[:5] + [RES.format(3)] + lines[6:],
+    change_scan=lambda lines: lines[:4] + ["SCANH 0 5 0.5 4 0 0 0\n"] + lines[5:],
+    insert_middle=lambda lines: lines[:9] + ["REM new\n", "REM new\n"] + lines[9:],
+    delete_middle=lambda lines: lines[:8] + lines[10:],
+    append=lambda lines: lines + ["REM appended\n"],
+    move_endscan=lambda lines: lines[:12] + lines[13:14] + lines[12:13] + lines[14:],
+    unnest=lambda lines: lines[:2] + lines[8:],
+    empty=lambda lines: [],
+)
+
+
+@pytest.mark.parametrize("edit", sorted(EDITS))
+def test_reparse_matches_a_complete_parse(tmp_path, edit):
+    result = reparse_and_compare(tmp_path / "sequence.seq", LINES, EDITS[edit](LINES))
+    if edit == "unchanged":
+        assert result is None
+
+
+def test_reparse_of_a_single_change_only_replaces_that_command(tmp_path):
+    new = LINES[:9] + ["WAITFOR 6 0 1 0 0 0\n"] + LINES[10:]
+    first, removed, commands = reparse_and_compare(tmp_path / "s.seq", LINES, new)
+    assert (removed, len(commands)) == (1, 1)
+    assert commands[0]["typ"] == "Wait"
+
+
+def test_reparse_of_random_edits(tmp_path):
+    rng = random.Random(0)
+    lines = list(LINES)
+    results = []
+    for _ in range(200):
+        new = list(lines)
+        position = rng.randrange(len(new) + 1)
+        action = rng.choice(("insert", "delete", "replace"))
+        if action != "insert" and position < len(new):
+            del new[position]
+        if action != "delete":
+            new.insert(position, rng.choice(LINES))
+        result = reparse_and_compare(tmp_path / "sequence.seq", lines, new)
+        results.append(result)
+        if result != "failed":
+            lines = new
+    # most edits result in files which can be parsed
+    assert results.count("failed") < len(results) / 2
@@ -0,0 +1,64 @@
+"""tests for the scan points of the sequence editor (util.ScanningN/Size)"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt5.QtWidgets")
+
+from measureSequences.util import ScanningN  # noqa: E402
+from measureSequences.util import ScanningSize  # noqa: E402
+
+
+def n_loop(start, end, N):
+    """the former implementation, accumulating step by step"""
+    stepsize = abs(end - start) / (N - 1)
+    stepsize = abs(stepsize) if start < end else -abs(stepsize)
+    seq = []
+    for __ in range(int(N)):
+        seq.append(start)
+        start += stepsize
+    return seq, stepsize
+
+
+def size_loop(start, end, parameter):
+    """the former implementation, accumulating step by step"""
+    stepsize = abs(parameter) if start < end else -abs(parameter)
+    seq = []
+    if start < end:
+        while start < end:
+            seq.append(start)
+            start += stepsize
+    else:
+        while start > end:
+            seq.append(start)
+            start += stepsize
+    return seq, len(seq)
+
+
+@pytest.mark.parametrize(
+    "start, end, parameter",
+    [(0, 1, 0.1), (1, 0, 0.1), (2, 300, 0.7), (300, 2, 1.3), (-1.5, 2.25, 0.25)],
+)
+def test_size_keeps_the_former_values(start, end, parameter):
+    seq, N = ScanningSize(start, end, parameter)
+    expected, expected_N = size_loop(start, end, parameter)
+    assert N == expected_N
+    assert seq.tolist() == expected
+
+
+def test_size_without_step_or_range_is_empty():
+    for start, end, parameter in ((1, 1, 0.5), (0, 1, 0), (1, 0, 0.0)):
+        seq, N = ScanningSize(start, end, parameter)
+        assert N == 0 and len(seq) == 0
+
+
+@pytest.mark.parametrize(
+    "start, end, N",
+    [(0, 1, 11), (1, 0, 11), (2, 300, 97), (300, 2, 1000), (5, 5, 3), (0, 1, 0)],
+)
+def test_n_keeps_the_former_values(start, end, N):
+    seq, stepsize = ScanningN(start, end, N)
+    expected, expected_stepsize = n_loop(start, end, N)
+    assert stepsize == expected_stepsize
+    assert seq.tolist() == expected
+    assert isinstance(seq, np.ndarray)
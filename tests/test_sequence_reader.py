@@ -0,0 +1,60 @@
+"""regression checks for reading sequence files in the editor (SequenceReader)
+
+a file which cannot be parsed must end in sig_failed, instead of an
+exception escaping the worker thread (which aborts the process)
+"""
+
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+from PyQt5 import QtCore  # noqa: E402
+
+from measureSequences.Sequence_editor import Sequence_builder  # noqa: E402
+from measureSequences.Sequence_editor import SequenceReader  # noqa: E402
+from measureSequences.Sequence_parsing import Sequence_parser  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _read(sequence_file: str) -> list:
+    """read the file with a SequenceReader, return the emitted failures"""
+    failures = []
+    reader = SequenceReader(Sequence_parser(), sequence_file)
+    reader.sig_failed.connect(failures.append, QtCore.Qt.DirectConnection)
+    reader.start()
+    assert reader.wait(5000)
+    return failures
+
+
+def _read_in_builder(sequence_file: str) -> Sequence_builder:
+    """read the file in the editor, return it once reading ended"""
+    builder = Sequence_builder()
+    builder.initialize_sequence(sequence_file)
+    assert builder._reader.wait(5000)
+    # deliver the queued signals of the reader
+    QtWidgets.QApplication.processEvents()
+    return builder
+
+
+def test_missing_file(app, tmp_path):
+    sequence_file = str(tmp_path / "does_not_exist.seq")
+    assert len(_read(sequence_file)) == 1
+    builder = _read_in_builder(sequence_file)
+    assert len(builder.data) == 0
+    builder.close()
+
+
+def test_malformed_file(app, tmp_path):
+    sequence_file = tmp_path / "malformed.seq"
+    # unbalanced ENDSCAN, the parser raises an IndexError
+    sequence_file.write_text("REM a remark\nENDSCAN\n")
+    assert len(_read(str(sequence_file))) == 1
+    builder = _read_in_builder(str(sequence_file))
+    assert builder.windowTitle() == "malformed.seq"
+    builder.close()
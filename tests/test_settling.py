@@ -0,0 +1,89 @@
+"""tests for settling (settling.py) and waiting on settled values"""
+
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.settling import SettleDetector
+
+MEASURE = dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+
+
+def test_settled_needs_a_full_window_of_stable_readings():
+    detector = SettleDetector(clock=lambda: 0.0)
+    for t in range(5):
+        detector.add("Field", 1.0, timestamp=float(t))
+    # window of 5 s is not covered yet
+    assert not detector.settled("Field", 1.0, now=4.0)
+    detector.add("Field", 1.0, timestamp=5.0)
+    assert detector.settled("Field", 1.0, now=5.0)
+    assert not detector.settled("Field", 1.01, now=5.0)
+
+
+def test_ramping_value_is_arrived_but_not_settled():
+    detector = SettleDetector()
+    for t in range(11):
+        detector.add("Field", 1.0 + 1e-3 * t, timestamp=float(t))
+    status = detector.status("Field", 1.01, now=10.0)
+    assert status["arrived"]
+    assert not status["settled"]
+    assert status["slope"] == pytest.approx(1e-3)
+
+
+def test_criteria_by_range_of_the_target():
+    detector = SettleDetector(criteria=dict(Temp=dict(timeout=0)))
+    assert detector.criteria_for("Temp", 2)["distance"] == 0.01
+    assert detector.criteria_for("Temp", 300)["distance"] == 0.2
+    assert detector.criteria["Temp"]["timeout"] == 0
+    assert detector.criteria["Temp"]["window"] == 30.0
+
+
+def test_wait_for_field_blocks_until_settled():
+    """a slow field ramp takes longer than the settle timeout"""
+    sequence = [
+        dict(
+            typ="set_Field",
+            Field=9,
+            EndMode="driven",
+            ApproachMode="Linear",
+            SweepRate=0.5,
+        ),
+        dict(typ="Wait", Field=True, Delay=0),
+        MEASURE,
+    ]
+    runner = Sequence_simulator(sequence)
+    assert runner.running() == "Sequence Finished!"
+    assert runner.data[0]["data"]["mean"]["Field"] == pytest.approx(9, abs=1e-3)
+    # 18 minutes of ramping, longer than the 600 s settle timeout
+    assert runner.clock.monotonic() >= 18 * 60
+
+
+def test_wait_settled_times_out_after_the_ramp():
+    runner = Sequence_simulator([])
+    runner.model.set_field(0, 9, 0.5, "driven")
+    assert not runner.wait_settled(
+        "Field", target=9, getfunc=runner._getField, timeout=60
+    )
+    assert runner.clock.monotonic() == pytest.approx(60, abs=1)
+    assert runner.wait_settled("Field", target=9, getfunc=runner._getField, timeout=0)
+    assert runner._getField() == pytest.approx(9, abs=1e-3)
+
+
+def test_approach_settles_at_the_target():
+    sequence = [
+        dict(
+            typ="scan_T",
+            start=300,
+            end=10,
+            Nsteps=2,
+            SweepRate=10,
+            SpacingCode="uniform",
+            ApproachMode="No O'Shoot",
+            commands=[MEASURE],
+        )
+    ]
+    runner = Sequence_simulator(sequence)
+    runner.model.set_temperature(0, 300, 10 / 60)
+    runner.clock.advance(3600)
+    assert runner.running() == "Sequence Finished!"
+    temperatures = [point["data"]["mean"]["Temp"] for point in runner.data]
+    assert temperatures == pytest.approx([300, 10], abs=0.05)
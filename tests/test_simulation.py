@@ -0,0 +1,38 @@
+"""tests for the simulated PPMS backend (simulation.py)"""
+
+import pytest
+
+from measureSequences import Sequence_simulator
+from measureSequences.simulation import PPMS_Model
+
+MEASURE = dict(typ="res_measure", dataflags={}, reading_count=1, bridge_conf={})
+
+
+def test_sample_follows_the_setpoint_with_a_lag():
+    model = PPMS_Model(T_initial=10, tau=60)
+    model.set_temperature(0, 20, 1)
+    # ramping with 1 K/min, the sample lags by rate * tau
+    assert model.temperature(600) == pytest.approx(20 - 1, abs=1e-3)
+    assert model.temperature(3600) == pytest.approx(20, abs=1e-3)
+
+
+def test_temperature_sweep_with_lagging_sample():
+    """the sweep starts once the start temperature is stable"""
+    sequence = [
+        dict(
+            typ="scan_T",
+            start=12,
+            end=2,
+            Nsteps=5,
+            SweepRate=1,
+            SpacingCode="uniform",
+            ApproachMode="Sweep",
+            commands=[MEASURE],
+        )
+    ]
+    runner = Sequence_simulator(sequence)
+    assert runner.running() == "Sequence Finished!"
+    temperatures = [point["data"]["mean"]["Temp"] for point in runner.data]
+    assert len(temperatures) == 5
+    assert temperatures == sorted(temperatures, reverse=True)
+    assert temperatures[0] == pytest.approx(12, abs=0.1)